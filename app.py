@@ -1,18 +1,24 @@
 # ----------------Face Value Audit Source Code----------------
-import os, re, time
+import os, re, time, random
 from urllib.parse import urlparse
 import requests
 import pandas as pd
+import numpy as np
 from bs4 import BeautifulSoup
 import streamlit as st
 from html import escape
-import asyncio
 import concurrent.futures
 from functools import lru_cache
 
 # For Report Generation
-import base64, json, hashlib
+import base64, json, hashlib, uuid
+import threading, zlib, sqlite3, contextvars, gzip, shutil, codecs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# False for the --bulk / --monitor command line and for plain imports: page UI is skipped then
+IN_STREAMLIT = get_script_run_ctx(suppress_warning=True) is not None
 
 # For PDF Export - using native Python libraries
 from io import BytesIO
@@ -34,6 +40,28 @@ try:
 except ImportError:
     HAS_CLAUDE = False
 
+# For validating structured LLM output
+try:
+    import jsonschema
+    HAS_JSONSCHEMA = True
+except ImportError:
+    HAS_JSONSCHEMA = False
+
+# For the columnar audit store
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Cross-process file locks (audit store compaction): fcntl on POSIX, msvcrt on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
 # Enhanced caching with LRU and memory management
 from functools import lru_cache
 import sys
@@ -74,62 +102,737 @@ class AdvancedLLMCache:
 # Initialize advanced cache
 _advanced_cache = AdvancedLLMCache(max_size=_cache_max_size)
 
-# Claude API helper function
-def call_claude_api(prompt: str, model: str = "claude-3-haiku-20240307", timeout: int = 30) -> str:
-    """Helper function to call Claude API with timeout"""
-    if not (HAS_CLAUDE and CLAUDE_API_KEY and claude_client):
-        return None
+def _report_claude_error(e: Exception):
+    error_msg = str(e)
+    if "authentication" in error_msg.lower() or "api_key" in error_msg.lower():
+        st.sidebar.error(f"🔑 Claude API Authentication Error: {error_msg[:150]}")
+    elif "rate_limit" in error_msg.lower() or "quota" in error_msg.lower():
+        st.sidebar.error(f"⏳ Claude API Rate Limited: {error_msg[:150]}")
+    elif "network" in error_msg.lower() or "connection" in error_msg.lower():
+        st.sidebar.error(f"🌐 Claude API Network Error: {error_msg[:150]}")
+    else:
+        st.sidebar.error(f"⚠️ Claude API Error: {error_msg[:150]}")
+
+# --- LLM resilience: retries with backoff, hedged requests ---
+# The SDK's own retries are disabled (max_retries=0 on the client) so that backoff, Retry-After,
+# hedging and the overall deadline are decided in one place.
+LLM_MAX_ATTEMPTS = int(os.getenv("FVA_LLM_MAX_ATTEMPTS", "4"))
+LLM_BACKOFF_BASE = 0.5       # seconds; full jitter over base * 2**attempt
+LLM_BACKOFF_CAP = 8.0
+LLM_HEDGE_ENABLED = os.getenv("FVA_LLM_HEDGE", "1") == "1"
+LLM_HEDGE_DEFAULT_DELAY = 4.0    # used until a prompt type has enough latency samples
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+class LLMLatencyTracker:
+    """Rolling per-label latency window; p90 drives the hedge delay"""
+    def __init__(self, window=200):
+        self.window = window
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record(self, label, seconds):
+        with self.lock:
+            buf = self.samples.setdefault(label, [])
+            buf.append(seconds)
+            if len(buf) > self.window:
+                del buf[0]
+
+    def p90(self, label):
+        with self.lock:
+            buf = sorted(self.samples.get(label, []))
+        if len(buf) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return buf[int(0.9 * (len(buf) - 1))]
+
+class LLMUsageTracker:
+    """Token totals per label, including prompt-cache writes and reads"""
+    FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+    def __init__(self):
+        self.totals = {}
+        self.lock = threading.Lock()
 
-    import signal
-    import functools
+    def record(self, label, usage):
+        if usage is None:
+            return
+        with self.lock:
+            row = self.totals.setdefault(label, dict.fromkeys(self.FIELDS + ("calls",), 0))
+            row["calls"] += 1
+            for field in self.FIELDS:
+                row[field] += getattr(usage, field, None) or 0
+
+    def summary(self, label=None) -> dict:
+        with self.lock:
+            rows = [self.totals[label]] if label else list(self.totals.values())
+            rows = [r for r in rows if r]
+        out = {field: sum(r[field] for r in rows) for field in self.FIELDS + ("calls",)}
+        prompt = out["input_tokens"] + out["cache_creation_input_tokens"] + out["cache_read_input_tokens"]
+        out["cache_hit_rate"] = round(out["cache_read_input_tokens"] / prompt, 3) if prompt else 0.0
+        return out
+
+# Token totals for the audit running in the current thread (set by run_audit); the process-wide
+# tracker in _get_llm_runtime() keeps the running totals across sessions
+_LLM_USAGE = contextvars.ContextVar("fva_llm_usage", default=None)
+# Failed structured calls (errors, timeouts, invalid output) in the current memoized analyzer run,
+# so a result built on a fallback is not pinned to the page (see memo_page_analysis)
+_LLM_FAILURES = contextvars.ContextVar("fva_llm_failures", default=None)
+
+def _note_llm_failure():
+    failures = _LLM_FAILURES.get()
+    if failures is not None:
+        failures.append(1)
+
+@st.cache_resource(show_spinner=False)
+def _get_llm_runtime():
+    """Latency and token stats, shared by all sessions"""
+    return {
+        "latency": LLMLatencyTracker(),
+        "usage": LLMUsageTracker(),
+    }
 
-    def timeout_handler(signum, frame):
-        raise TimeoutError("Claude API call timed out")
+def _llm_retryable(e: Exception) -> bool:
+    status = getattr(e, "status_code", None)
+    if status is not None:
+        return status in LLM_RETRYABLE_STATUS
+    if HAS_CLAUDE and isinstance(e, (anthropic.APIConnectionError, anthropic.APITimeoutError)):
+        return True
+    return isinstance(e, (TimeoutError, ConnectionError))
 
+def _llm_retry_after(e: Exception):
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
     try:
-        # Set timeout signal (only on Unix systems)
-        if hasattr(signal, 'SIGALRM'):
-            signal.signal(signal.SIGALRM, timeout_handler)
-            signal.alarm(timeout)
-
-        response = claude_client.messages.create(
-            model=model,
-            max_tokens=1024,
-            temperature=0.3,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        )
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+def _llm_backoff(attempt: int, e: Exception) -> float:
+    retry_after = _llm_retry_after(e)
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(LLM_BACKOFF_CAP, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+def llm_request(send, label: str, timeout: float = 30, hedge: bool = False):
+    """
+    Run send(request_timeout) -> response with retries on transient errors, all within `timeout`
+    seconds. With hedge=True, a duplicate request goes out once the first has taken longer than
+    the label's p90 latency and the first successful answer wins.
+    """
+    runtime = _get_llm_runtime()
+    deadline = time.monotonic() + timeout
+
+    def _timed(request_timeout):
+        t0 = time.monotonic()
+        response = send(request_timeout)
+        runtime["latency"].record(label, time.monotonic() - t0)
+        return response
+
+    def _attempt():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Claude API call timed out")
+        if not (hedge and LLM_HEDGE_ENABLED):
+            return _timed(remaining)
+        delay = runtime["latency"].p90(label) or LLM_HEDGE_DEFAULT_DELAY
+        # A pool per call: a shared pool saturates under concurrent sessions (queued hedges never
+        # fire), and its workers would carry whichever session's script context created them
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm-hedge",
+                                                     initializer=_script_ctx_initializer())
+        try:
+            first = pool.submit(_timed, remaining)
+            done, _ = concurrent.futures.wait([first], timeout=min(delay, remaining))
+            if done:
+                return first.result()
+            second = pool.submit(_timed, max(1.0, deadline - time.monotonic()))
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError("Claude API call timed out")
+                for fut in done:
+                    if fut.exception() is None:
+                        return fut.result()   # the loser finishes in the background and is dropped
+                    error = fut.exception()
+            raise error
+        finally:
+            pool.shutdown(wait=False)
+
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        try:
+            return _attempt()
+        except Exception as e:
+            if attempt == LLM_MAX_ATTEMPTS - 1 or not _llm_retryable(e):
+                raise
+            wait = _llm_backoff(attempt, e)
+            if time.monotonic() + wait >= deadline:
+                raise
+            time.sleep(wait)
+
+class IncrementalJSONParser:
+    """
+    Push parser for one JSON object arriving in chunks. Leading prose or a ```json fence is
+    skipped. Every scalar is reported as (dotted.path, value) the moment it is complete, and
+    `result` always holds the object assembled so far.
+    """
+    _DELIMS = set(",}] \t\r\n")
+
+    def __init__(self, on_field=None):
+        self.on_field = on_field
+        self.result = None
+        self.done = False
+        self._stack = []        # frames: [container, path, pending_key, expect]
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._buf = []
+        self._scalar = []
+
+    # -- public --
+    def feed(self, chunk: str):
+        """Consume a chunk; returns the list of (path, value) completed by it"""
+        completed = []
+        for ch in chunk or "":
+            if self.done:
+                break
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self.result = {}
+                    self._stack.append([self.result, (), None, "key"])
+                continue
+            if self._in_string:
+                self._string_char(ch, completed)
+            elif self._scalar and ch not in self._DELIMS:
+                self._scalar.append(ch)
+            else:
+                if self._scalar:
+                    self._finish_scalar(completed)
+                self._structural(ch, completed)
+        return completed
+
+    @property
+    def pending(self):
+        """(path, text_so_far) of a string value still streaming, else None"""
+        if not (self._in_string and self._stack and self._stack[-1][3] == "value_str"):
+            return None
+        try:
+            return self._value_path(), json.loads('"' + "".join(self._buf).rstrip("\\") + '"')
+        except ValueError:
+            return self._value_path(), "".join(self._buf)
+
+    # -- internals --
+    def _value_path(self):
+        container, path, key, _ = self._stack[-1]
+        full = path + ((key,) if isinstance(container, dict) else (len(container),))
+        return ".".join(str(p) for p in full)
+
+    def _string_char(self, ch, completed):
+        if self._escape:
+            self._escape = False
+            self._buf.append(ch)
+            return
+        if ch == "\\":
+            self._escape = True
+            self._buf.append(ch)
+            return
+        if ch != '"':
+            self._buf.append(ch)
+            return
+        self._in_string = False
+        text = json.loads('"' + "".join(self._buf) + '"')
+        self._buf = []
+        frame = self._stack[-1]
+        if frame[3] == "key_str":
+            frame[2] = text
+            frame[3] = "colon"
+        else:
+            self._assign(text, completed)
+
+    def _finish_scalar(self, completed):
+        token = "".join(self._scalar)
+        self._scalar = []
+        self._assign(json.loads(token), completed)
+
+    def _assign(self, value, completed):
+        frame = self._stack[-1]
+        container, path, key, _ = frame
+        if isinstance(container, dict):
+            container[key] = value
+            full = path + (key,)
+        else:
+            full = path + (len(container),)
+            container.append(value)
+        frame[3] = "comma"
+        if not isinstance(value, (dict, list)):
+            dotted = ".".join(str(p) for p in full)
+            completed.append((dotted, value))
+            if self.on_field:
+                self.on_field(dotted, value)
+
+    def _open(self, container):
+        frame = self._stack[-1]
+        parent, path, key, _ = frame
+        child_path = path + ((key,) if isinstance(parent, dict) else (len(parent),))
+        if isinstance(parent, dict):
+            parent[key] = container
+        else:
+            parent.append(container)
+        frame[3] = "comma"
+        self._stack.append([container, child_path, None, "key" if isinstance(container, dict) else "value"])
+
+    def _structural(self, ch, completed):
+        if ch in " \t\r\n":
+            return
+        frame = self._stack[-1]
+        expect = frame[3]
+        if ch in "}]":
+            self._stack.pop()
+            if not self._stack:
+                self.done = True
+            return
+        if ch == ",":
+            frame[3] = "key" if isinstance(frame[0], dict) else "value"
+            return
+        if ch == ":":
+            frame[3] = "value"
+            return
+        if ch == '"':
+            self._in_string = True
+            frame[3] = "key_str" if expect == "key" else "value_str"
+            return
+        if expect == "value":
+            if ch == "{":
+                self._open({})
+            elif ch == "[":
+                self._open([])
+            else:
+                self._scalar.append(ch)
+
+# --- Structured LLM output ---
+# Every helper declares a response schema; the model is forced to answer through a tool whose
+# input_schema is that schema, the input is validated, and a failed validation gets exactly one
+# repair turn that quotes the errors back. Soft limits (word counts, bullet counts) are trimmed
+# client-side rather than enforced, so they never cost a repair call.
+def _obj(props: dict, required=None) -> dict:
+    return {"type": "object", "properties": props,
+            "required": list(props) if required is None else required, "additionalProperties": False}
+
+def _text(description: str) -> dict:
+    return {"type": "string", "description": description}
+
+def _nullable(description: str, **extra) -> dict:
+    return {"type": ["string", "null"], "description": description + " (null if not found)", **extra}
+
+def _bullets(description: str) -> dict:
+    return {"type": "array", "items": {"type": "string"}, "minItems": 1, "description": description}
+
+# Short prompts on the prefill/report critical path: a duplicate request is cheap insurance
+LLM_HEDGED_SCHEMAS = {"practice_name", "address", "doctor_name", "email", "phone", "contact_fields",
+                      "appointment_channels", "insurance", "advice"}
+
+APPOINTMENT_SCORES = ["Phone-only", "Phone + Online Form", "Phone + Advanced System"]
+
+LLM_SCHEMAS = {
+    "practice_name": _obj({"practice_name": _nullable("Official practice name, 3-4 words, title case")}),
+    "address": _obj({"address": _nullable("Primary physical address: street, city, state, ZIP")}),
+    "doctor_name": _obj({"doctor_name": _nullable("Primary dentist with title, e.g. 'Dr. John Smith'")}),
+    "email": _obj({"email": _nullable("Main contact email", pattern=r"^[^@\s]+@[^@\s]+\.[A-Za-z]{2,}$")}),
+    "phone": _obj({"phone": _nullable("Main office phone number", pattern=r"^[+()\d\s.\-x]{7,}$")}),
+    "contact_fields": _obj({
+        "practice_name": _nullable("Official practice name, 3-4 words, title case"),
+        "address": _nullable("Primary physical address: street, city, state, ZIP"),
+        "email": _nullable("Main contact email", pattern=r"^[^@\s]+@[^@\s]+\.[A-Za-z]{2,}$"),
+        "phone": _nullable("Main office phone number", pattern=r"^[+()\d\s.\-x]{7,}$"),
+    }, required=[]),
+    "appointment_channels": _obj({
+        "channels": _text("How patients can book, max 5 words"),
+        "score": {"type": "string", "enum": APPOINTMENT_SCORES},
+    }),
+    "insurance": _obj({
+        "status": {"type": "string", "enum": ["accepts", "does_not_accept", "not_found"]},
+        "lines": {"type": "array", "items": {"type": "string"}, "description": "Up to 3 short sentences naming plans"},
+    }),
+    "site_analysis": _obj({
+        "marketing": _obj({
+            "content_quality": _text("Website content assessment"),
+            "visual_effectiveness": _text("Photo/video marketing assessment"),
+            "key_recommendations": _text("Top 3 marketing improvements"),
+            "advertising_advice": _text("Marketing tools recommendation"),
+            "visibility_insights": _bullets("3 actionable local-visibility actions, under 60 characters each"),
+        }, required=["content_quality", "key_recommendations", "advertising_advice", "visibility_insights"]),
+    }),
+    "marketing_signals": _obj({
+        "content_quality": _text("Assessment of website content effectiveness"),
+        "visual_appeal": _text("Analysis of photos/videos and visual elements"),
+        "seo_signals": _text("SEO optimization status and recommendations"),
+        "conversion_optimization": _text("How easy it is for patients to book appointments from the website"),
+        "patient_engagement": _text("How well the site engages potential patients"),
+        "marketing_tools": _text("Detected marketing/tracking tools analysis"),
+        "key_recommendations": _text("Top 3 actionable marketing improvements"),
+    }),
+    "recommendations": _obj({"recommendations": _bullets("Exactly 3 actions, max 15 words each, no bullet characters")}),
+    "review_analysis": _obj({
+        "sentiment": _text("Overall sentiment summary (1 line)"),
+        "positive_themes": _text("Top 3 positive themes, comma-separated"),
+        "negative_themes": _text("Top 3 negative concerns, comma-separated, or 'None detected'"),
+        "key_insights": _text("2-3 key insights for practice improvement"),
+        "advice": _text("Brief reputation management advice, 1 sentence"),
+    }),
+    "advice": _obj({"advice": _text("One recommendation, max 12 words")}),
+}
+
+# Fixed instructions go in a system prefix; the prompt carries only the per-practice data. Every
+# call sends the same prefix in the same order: all tool definitions (LLM_TOOLS), then
+# LLM_SHARED_SYSTEM (role, house rules and every task guide). Only the forced tool_choice and a
+# one-line task block differ, so a single cached prefix serves every schema. The prompt cache
+# needs at least the model's minimum (2048 tokens on Haiku, 1024 elsewhere), which the shared
+# prefix clears; _cacheable_prefix keeps cache_control off should it ever shrink below that.
+LLM_CACHE_MIN_TOKENS = {"claude-3-haiku": 2048, "claude-3-5-haiku": 2048, "claude-haiku": 2048}
+LLM_CHARS_PER_TOKEN = 4   # rough estimate, errs towards not marking short prefixes
+
+_LLM_HOUSE_RULES = """House rules for every task:
+- Answer only by calling the tool you are asked to call, and fill in every required field.
+- Use only the material in the message: the site digest, technical elements, Places data or
+  reviews. When a fact is not there, use null where the field allows it, otherwise say briefly
+  that it was not found. Never guess names, addresses, emails, phone numbers or insurance plans.
+- Copy contact details as the practice writes them. Addresses are "street, city, state ZIP" with
+  the two-letter state code; doctor names carry their title, e.g. "Dr. Jane Smith".
+- Recommendations are one specific action each, in the imperative ("Add online booking to the
+  homepage"), without bullet characters, numbering or markdown, and within the word or character
+  limit given in the field description. Prefer actions with the largest effect on new-patient
+  bookings: Google Business Profile, reviews, local SEO, online booking and clear calls to action.
+- Insurance answers name carriers exactly as listed (e.g. Delta Dental, Cigna, MetLife, Aetna,
+  Guardian) and separate in-network plans from "we file claims with" or financing language.
+- Booking channels are phone, online form, or a booking system (Zocdoc, LocalMed, NexHealth,
+  Calendly and similar widgets); only name a system that the material shows.
+- Write plain US English for a practice owner: no emojis, no hedging filler, no marketing jargon.
+  If the material is thin (site blocked, few reviews), say so in one short clause."""
+
+_CONSULTANT_ROLE = (
+    "You are an expert online marketing consultant specializing in US dental practices. "
+    "Your readers are practice owners and office managers: give specific, practical advice they "
+    "can act on this month, in plain language, without jargon or filler. Never invent facts that "
+    "are not supported by the material you are given; if something is missing, say so."
+)
+
+LLM_SYSTEM_PROMPTS = {
+    "site_analysis": """You will be given a practice name, its website URL, a section-labelled digest of the site and
+sometimes media counts. Analyze the practice's marketing and fill in ALL fields, including
+visual_effectiveness. Reviews are analyzed separately; do not comment on reputation.
+
+Requirements:
+1. visibility_insights: exactly 3 actionable points (e.g. "Implement local SEO with city + dentist keywords").
+2. Each point must be specific advice a dental practice can implement immediately.
+3. Focus on local SEO, Google Business Profile, online directories and website optimization.
+4. Keep bullet points under 60 characters each for clear display.""",
+
+    "marketing_signals": """You will be given a practice name, its website URL, a section-labelled digest of the site and its
+technical elements (image/video counts, script sources, meta tags). Assess the site's marketing
+effectiveness against dental practice best practices:
+- Patient testimonials and before/after photos
+- Clear calls to action (book appointment, call now)
+- Trust signals (certifications, awards, team photos)
+- Local SEO optimization
+- Mobile-friendliness
+- Service descriptions and benefits
+- Contact information prominence
+- Emergency dental care messaging
+
+Infer marketing and tracking tools from script sources (analytics, tag managers, ad pixels,
+chat widgets, online booking) and name the ones you recognize.""",
+
+    "review_analysis": """You will be given recent Google reviews for a dental practice, each with its star rating. Analyze
+them for dental-practice-specific themes such as:
+- Staff friendliness, professionalism
+- Pain management, comfort
+- Cleanliness, hygiene
+- Wait times, scheduling
+- Communication, explanations
+- Billing, insurance issues
+- Office environment
+- Treatment quality
+
+Weigh themes by how often they recur, not by how vivid a single review is. Close with one sentence
+of reputation management advice (responding to reviews, asking happy patients for reviews, fixing
+the most common complaint). Keep responses concise and actionable.""",
+}
+
+LLM_SHARED_SYSTEM = (
+    _CONSULTANT_ROLE + "\n\n" + _LLM_HOUSE_RULES + "\n\nTask guides (follow the one for the tool you are asked to call):"
+    + "".join(f"\n\n## record_{name}\n{guide}" for name, guide in LLM_SYSTEM_PROMPTS.items())
+)
+LLM_TOOLS = [{"name": f"record_{name}", "description": f"Record the {name.replace('_', ' ')} result.",
+              "input_schema": schema} for name, schema in LLM_SCHEMAS.items()]
+
+@lru_cache(maxsize=8)
+def _cacheable_prefix(model: str) -> bool:
+    """Whether tools + shared system are long enough for the model's prompt cache minimum"""
+    minimum = next((n for prefix, n in LLM_CACHE_MIN_TOKENS.items() if model.startswith(prefix)), 1024)
+    return (len(LLM_SHARED_SYSTEM) + len(json.dumps(LLM_TOOLS))) / LLM_CHARS_PER_TOKEN >= minimum
+
+def _schema_errors(instance, schema: dict) -> list:
+    if HAS_JSONSCHEMA:
+        validator = jsonschema.Draft7Validator(schema)
+        return [
+            f"{'/'.join(str(p) for p in err.absolute_path) or '(root)'}: {err.message}"
+            for err in sorted(validator.iter_errors(instance), key=lambda e: list(e.absolute_path))
+        ][:5]
+    if not isinstance(instance, dict):
+        return ["(root): expected an object"]
+    return [f"(root): '{k}' is a required property" for k in schema.get("required", []) if k not in instance]
+
+def _tool_input(message, tool_name: str):
+    for block in getattr(message, "content", None) or []:
+        if getattr(block, "type", None) == "tool_use" and block.name == tool_name:
+            return block
+    return None
 
-        # Cancel the alarm
-        if hasattr(signal, 'SIGALRM'):
-            signal.alarm(0)
+def call_claude_structured(prompt: str, schema_name: str, on_field=None, timeout: int = 30,
+                           model: str = "claude-3-haiku-20240307", max_tokens: int = 1024, hedge=None,
+                           system=None):
+    """
+    Ask for a reply that matches LLM_SCHEMAS[schema_name]. Returns the validated dict or None.
+    on_field(path, value) streams fields out of the tool input as they complete; hedge defaults
+    to on for the short, latency-critical prompts in LLM_HEDGED_SCHEMAS. `system` replaces the
+    per-call task line that follows the shared, cached prefix.
+    """
+    if not (HAS_CLAUDE and CLAUDE_API_KEY and claude_client):
+        return None
 
-        return response.content[0].text
+    schema = LLM_SCHEMAS[schema_name]
+    tool = next(t for t in LLM_TOOLS if t["name"] == f"record_{schema_name}")
+    messages = [{"role": "user", "content": prompt}]
+    request = dict(model=model, max_tokens=max_tokens, temperature=0.3, tools=LLM_TOOLS,
+                   tool_choice={"type": "tool", "name": tool["name"]})
+    shared = {"type": "text", "text": LLM_SHARED_SYSTEM}
+    if _cacheable_prefix(model):
+        shared["cache_control"] = {"type": "ephemeral"}   # covers LLM_TOOLS and the shared system text
+    if system is None:
+        system = f"Current task: call {tool['name']}" + (
+            ", following its task guide." if schema_name in LLM_SYSTEM_PROMPTS else ".")
+    request["system"] = [shared, {"type": "text", "text": system}]
+    if hedge is None:
+        hedge = schema_name in LLM_HEDGED_SCHEMAS
+
+    def _send(msgs, stream_fields, request_timeout):
+        if not stream_fields:
+            return claude_client.messages.create(messages=msgs, timeout=request_timeout, **request)
+        parser = IncrementalJSONParser(on_field=stream_fields)
+        with claude_client.messages.stream(messages=msgs, timeout=request_timeout, **request) as stream:
+            for event in stream:
+                delta = getattr(event, "delta", None)
+                if event.type == "content_block_delta" and getattr(delta, "type", None) == "input_json_delta":
+                    try:
+                        parser.feed(delta.partial_json)
+                    except ValueError:
+                        stream_fields = None   # keep reading; validation below decides
+            return stream.get_final_message()
+
+    batch = _LLM_BATCH.get()
+    try:
+        for attempt in range(2):
+            fields = on_field if attempt == 0 else None
+            if batch is not None:
+                # Bulk mode: answered from the current batch, or queued for the next one
+                message = batch.lookup(dict(messages=messages, **request),
+                                       dependent=schema_name in LLM_DEPENDENT_SCHEMAS)
+                if message is None:
+                    return None
+            else:
+                message = llm_request(
+                    lambda request_timeout, msgs=messages, f=fields: _send(msgs, f, request_timeout),
+                    label=schema_name, timeout=timeout,
+                    hedge=hedge and fields is None,   # streamed calls are retried, never duplicated
+                )
+            usage = getattr(message, "usage", None)
+            _get_llm_runtime()["usage"].record(schema_name, usage)
+            if _LLM_USAGE.get() is not None:
+                _LLM_USAGE.get().record(schema_name, usage)
+            block = _tool_input(message, tool["name"])
+            if block is None:
+                errors = ["no tool call in reply"]
+                if attempt == 0:
+                    messages = messages + [{"role": "user", "content": f"Answer only by calling {tool['name']}."}]
+                continue
+            errors = _schema_errors(block.input, schema)
+            if not errors:
+                return block.input
+            if attempt == 0:
+                # Single repair turn: show the model its own input and what was wrong with it
+                messages = messages + [
+                    {"role": "assistant", "content": [
+                        {"type": "tool_use", "id": block.id, "name": block.name, "input": block.input}]},
+                    {"role": "user", "content": [
+                        {"type": "tool_result", "tool_use_id": block.id, "is_error": True,
+                         "content": "Invalid input: " + "; ".join(errors) + f". Call {tool['name']} again with corrected input."}]},
+                ]
+                st.sidebar.write(f"🔧 Repairing {schema_name} output: {errors[0][:60]}")
+        st.sidebar.write(f"⚠️ {schema_name} output failed validation: {errors[0][:60]}")
+        _note_llm_failure()
+        return None
+    except LLMBatchPending:
+        return None
     except TimeoutError:
-        st.warning("⚠️ Claude API took too long. Skipping AI analysis...")
+        st.sidebar.write(f"⚠️ {schema_name} call timed out after retries")
+        _note_llm_failure()
         return None
     except Exception as e:
-        error_msg = str(e)
-        if "authentication" in error_msg.lower() or "api_key" in error_msg.lower():
-            st.sidebar.error(f"🔑 Claude API Authentication Error: {error_msg[:150]}")
-        elif "rate_limit" in error_msg.lower() or "quota" in error_msg.lower():
-            st.sidebar.error(f"⏳ Claude API Rate Limited: {error_msg[:150]}")
-        elif "network" in error_msg.lower() or "connection" in error_msg.lower():
-            st.sidebar.error(f"🌐 Claude API Network Error: {error_msg[:150]}")
-        else:
-            st.sidebar.error(f"⚠️ Claude API Error: {error_msg[:150]}")
+        _report_claude_error(e)
+        _note_llm_failure()
         return None
+
+# --- Message Batches (bulk mode) ---
+# In bulk mode the audits run in rounds. Each round replays every audit; structured LLM calls
+# are answered from the batch results gathered so far, and any request not seen before is queued
+# instead of sent. The queued requests go out as one Message Batch and the audits replay again.
+# Requests that only exist once an earlier answer is known (repair turns, prompts built from
+# other LLM output) surface in later rounds. Prompts built from other LLM output are only queued
+# once that audit has no unanswered request left, so no one pays for prompts built on placeholders.
+_LLM_BATCH = contextvars.ContextVar("fva_llm_batch", default=None)
+_BATCH_REPLAY = contextvars.ContextVar("fva_batch_replay", default=None)   # per-audit {"waiting", "misses"}
+BATCH_POLL_INTERVAL = float(os.getenv("FVA_BATCH_POLL_INTERVAL", "30"))
+BATCH_MAX_ROUNDS = 4
+BATCH_MAX_REQUESTS = 10_000      # per submitted batch; the API allows up to 100k / 256 MB
+BATCH_REPLAY_WORKERS = int(os.getenv("FVA_BATCH_REPLAY_WORKERS", "8"))
+LLM_DEPENDENT_SCHEMAS = {"advice", "recommendations"}   # prompts that embed other LLM answers
+
+class LLMBatchPending(Exception):
+    """Raised during a collection pass: the request was queued for the next batch"""
+
+class LLMBatchContext:
+    def __init__(self):
+        self.results = {}    # custom_id -> Message, or None when the entry errored/expired
+        self.pending = {}    # custom_id -> request params
+        self.deferred = 0    # dependent requests held back this round
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def request_id(params: dict) -> str:
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:48]
+
+    def lookup(self, params: dict, dependent: bool = False):
+        rid = self.request_id(params)
+        with self.lock:
+            if rid in self.results:
+                return self.results[rid]
+        replay = _BATCH_REPLAY.get()
+        with self.lock:
+            if dependent and replay is not None and replay["waiting"]:
+                # Built from placeholder answers; the real prompt appears in a later round
+                self.deferred += 1
+            else:
+                self.pending[rid] = params
+        if replay is not None:
+            replay["waiting"] = True
+            replay["misses"] += 1
+        raise LLMBatchPending(rid)
+
+    def replay(self, finals: list) -> list:
+        """One pass over every audit, practices in parallel, each with its own replay state"""
+        self.pending, self.deferred = {}, 0
+
+        def _one(final):
+            _BATCH_REPLAY.set({"waiting": False, "misses": 0})
+            return run_audit(final)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, BATCH_REPLAY_WORKERS),
+                                                   thread_name_prefix="batch-replay",
+                                                   initializer=_script_ctx_initializer()) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, _one, final) for final in finals]
+            return [f.result() for f in futures]
+
+class AnthropicBatchBackend:
+    """Message Batches API: half the per-token price, results typically within the hour"""
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests: dict) -> str:
+        batch = self.client.messages.batches.create(
+            requests=[{"custom_id": rid, "params": params} for rid, params in requests.items()]
+        )
+        return batch.id
+
+    def is_done(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+
+    def results(self, batch_id: str) -> dict:
+        return {
+            entry.custom_id: entry.result.message if entry.result.type == "succeeded" else None
+            for entry in self.client.messages.batches.results(batch_id)
+        }
+
+class LocalBatchBackend:
+    """Stand-in that answers every request synchronously with send(params) -> Message; for tests and dry runs"""
+    def __init__(self, send=None):
+        self.send = send or (lambda params: claude_client.messages.create(**params))
+        self._batches = {}
+
+    def submit(self, requests: dict) -> str:
+        batch_id = f"local_batch_{len(self._batches) + 1}"
+        out = {}
+        for rid, params in requests.items():
+            try:
+                out[rid] = self.send(params)
+            except Exception:
+                out[rid] = None
+        self._batches[batch_id] = out
+        return batch_id
+
+    def is_done(self, batch_id: str) -> bool:
+        return True
+
+    def results(self, batch_id: str) -> dict:
+        return self._batches.pop(batch_id, {})
+
+def run_audits_batch(finals: list, backend=None, poll_interval: float = BATCH_POLL_INTERVAL, on_progress=None) -> list:
+    """Audit many practices with all structured LLM calls routed through Message Batches"""
+    backend = backend or AnthropicBatchBackend(claude_client)
+    ctx = LLMBatchContext()
+    token = _LLM_BATCH.set(ctx)
+    try:
+        for round_no in range(1, BATCH_MAX_ROUNDS + 1):
+            audits = ctx.replay(finals)
+            if not ctx.pending:
+                return audits
+
+            items = list(ctx.pending.items())
+            batch_ids = [backend.submit(dict(items[i:i + BATCH_MAX_REQUESTS]))
+                         for i in range(0, len(items), BATCH_MAX_REQUESTS)]
+            if on_progress:
+                held = f", {ctx.deferred} dependent held back" if ctx.deferred else ""
+                on_progress(f"Round {round_no}: submitted {len(items)} requests in {len(batch_ids)} batch(es){held}")
+            waiting = list(batch_ids)
+            while waiting:
+                waiting = [b for b in waiting if not backend.is_done(b)]
+                if waiting:
+                    time.sleep(poll_interval)
+            for batch_id in batch_ids:
+                ctx.results.update(backend.results(batch_id))
+            for rid in ctx.pending:
+                ctx.results.setdefault(rid, None)   # missing from the results: treat as failed
+
+        # Out of rounds: one last replay, anything still unanswered falls back like a failed call
+        return ctx.replay(finals)
     finally:
-        # Ensure alarm is cancelled
-        if hasattr(signal, 'SIGALRM'):
-            signal.alarm(0)
+        _LLM_BATCH.reset(token)
+
+def _clip_words(text: str, max_words: int) -> str:
+    words = (text or "").split()
+    return " ".join(words[:max_words])
+
+def _bullet_text(items, limit: int = 3) -> str:
+    items = [str(i).strip().lstrip("•-* ").strip() for i in (items or []) if str(i).strip()]
+    return "\n".join(f"• {i}" for i in items[:limit])
 
 # one-time session flag so we don't open multiple tabs on reruns
-if "opened_report_id" not in st.session_state:
+if IN_STREAMLIT and "opened_report_id" not in st.session_state:
     st.session_state.opened_report_id = None
 
 # For Saving to Google Sheets (optional)
@@ -439,36 +1142,6 @@ def display_native_report(final, overview, visibility, reputation, marketing, ex
 
     # Display sections in tabs with enhanced styling
     if overview or visibility or reputation or marketing or experience:
-        # Custom CSS for better tab styling
-        st.markdown("""
-        <style>
-        .stTabs [data-baseweb="tab-list"] {
-            gap: 8px;
-            background-color: #f8f9fa;
-            padding: 8px;
-            border-radius: 12px;
-            margin-bottom: 1rem;
-        }
-        .stTabs [data-baseweb="tab"] {
-            background-color: white;
-            border-radius: 8px;
-            padding: 12px 20px;
-            font-weight: 500;
-            border: 2px solid transparent;
-            transition: all 0.2s ease;
-        }
-        .stTabs [aria-selected="true"] {
-            background-color: #1f4e79 !important;
-            color: white !important;
-            border-color: #1f4e79 !important;
-        }
-        .stTabs [data-baseweb="tab"]:hover {
-            background-color: #e8f4fd;
-            border-color: #4a90c2;
-        }
-        </style>
-        """, unsafe_allow_html=True)
-
         tab_names = []
         tab_data = []
 
@@ -602,7 +1275,8 @@ def display_section_data(title, data):
             """, unsafe_allow_html=True)
 
 # ------------------------ Page & Config ------------------------
-st.set_page_config(page_title="Face Value Audit", layout="wide")
+if IN_STREAMLIT:
+    st.set_page_config(page_title="Face Value Audit", layout="wide")
 
 # Modern mobile-first UI styling
 hide_streamlit_style = """
@@ -796,25 +1470,495 @@ hide_streamlit_style = """
     }
     </style>
 """
-st.markdown(hide_streamlit_style, unsafe_allow_html=True)
+
+# Everything below used to be re-sent inline by the functions that need it; it is now part of the
+# one app stylesheet (see "Static assets").
+REPORT_TABS_CSS = """
+    .stTabs [data-baseweb="tab-list"] {
+        gap: 8px;
+        background-color: #f8f9fa;
+        padding: 8px;
+        border-radius: 12px;
+        margin-bottom: 1rem;
+    }
+    .stTabs [data-baseweb="tab"] {
+        background-color: white;
+        border-radius: 8px;
+        padding: 12px 20px;
+        font-weight: 500;
+        border: 2px solid transparent;
+        transition: all 0.2s ease;
+    }
+    .stTabs [aria-selected="true"] {
+        background-color: #1f4e79 !important;
+        color: white !important;
+        border-color: #1f4e79 !important;
+    }
+    .stTabs [data-baseweb="tab"]:hover {
+        background-color: #e8f4fd;
+        border-color: #4a90c2;
+    }
+"""
+
+# Section tiles (vis/rep/mkt/exp share one visual language) + badges + recs boxes
+SECTION_CARDS_CSS = """
+    .vis-card,.rep-card,.mkt-card,.exp-card{border:1px solid #e5e7eb;background:#fff;border-radius:12px;padding:10px 12px;}
+    .mkt-card.empty,.exp-card.empty{visibility:hidden;}
+    .vis-metric,.rep-metric,.mkt-metric,.exp-metric{font-size:12px;color:#6b7280;text-transform:uppercase;letter-spacing:.03em;}
+    .vis-value,.rep-value,.mkt-value,.exp-value{font-size:14px;font-weight:700;color:#111827;line-height:1.4;margin-top:4px;word-break:break-word;}
+    .vis-value-small,.rep-value-small,.mkt-value-small,.exp-value-small{font-size:12.5px;font-weight:500;color:#374151;line-height:1.5;margin-top:4px;word-break:break-word;white-space:pre-wrap;}
+
+    .badge{display:inline-block;font-size:11px;padding:2px 8px;border-radius:999px;margin-left:8px;border:1px solid transparent;vertical-align:middle;}
+    .badge-ok{background:#ecfdf5;color:#065f46;border-color:#a7f3d0;}
+    .badge-warn{background:#fffbeb;color:#92400e;border-color:#fcd34d;}
+    .badge-bad{background:#fef2f2;color:#991b1b;border-color:#fecaca;}
+    .badge-muted{background:#f3f4f6;color:#374151;border-color:#e5e7eb;}
+
+    .vis-recs,.rep-recs,.mkt-recs,.exp-recs{margin-top:12px;border-left:4px solid #2563eb;background:#eff6ff;border-radius:10px;padding:10px 12px;}
+    .vis-recs-title,.rep-recs-title,.mkt-recs-title,.exp-recs-title{font-weight:700;color:#1d4ed8;margin-bottom:6px;}
+    .vis-recs ul,.rep-recs ul,.mkt-recs ul,.exp-recs ul{margin:0;padding-left:18px;}
+    .vis-recs li,.rep-recs li,.mkt-recs li,.exp-recs li{margin:4px 0;}
+"""
+
+REVIEW_CARDS_CSS = """
+    .rev-card{border:1px solid #e5e7eb;background:#fff;border-radius:12px;padding:12px 12px;}
+    .rev-card.empty{visibility:hidden;}
+    .rev-header{display:flex;align-items:center;gap:10px;margin-bottom:6px;}
+    .rev-avatar{
+      width:32px;height:32px;border-radius:999px;display:flex;align-items:center;justify-content:center;
+      background:linear-gradient(135deg,#e0e7ff,#fce7f3);color:#1f2937;font-weight:700;font-size:13px;
+    }
+    .rev-author{font-weight:700;color:#111827;font-size:14px;line-height:1.2;}
+    .rev-time{font-size:12px;color:#6b7280;line-height:1.2;}
+    .rev-stars{margin:4px 0 6px 0;font-size:14px;line-height:1;}
+    .star{color:#f59e0b;} .star-empty{color:#e5e7eb;}
+    .rev-text{font-size:13px;color:#111827;line-height:1.5;word-break:break-word;}
+"""
+
+# Summary cards: card style + progress bars + recs box
+TOP_CARDS_CSS = """
+    .top-card{border:1px solid #e5e7eb;background:#fff;border-radius:12px;padding:10px 12px;margin-bottom:12px;}
+    .top-metric{font-size:12px;color:#6b7280;text-transform:uppercase;letter-spacing:.03em;}
+    .top-big{font-size:18px;font-weight:700;color:#111827;margin-top:4px;}
+    .top-bar{height:8px;border-radius:999px;background:#f3f4f6;margin-top:6px;overflow:hidden;}
+    .top-bar span{display:block;height:100%;background:#2563eb;}
+    .top-recs{margin-top:8px;border-left:4px solid #2563eb;background:#eff6ff;border-radius:10px;padding:10px 12px;}
+    .top-recs-title{font-weight:700;color:#1d4ed8;margin-bottom:6px;}
+    .top-recs ul{margin:0;padding-left:18px;}
+    .top-recs li{margin:4px 0;}
+"""
+
+SPINNER_CSS = """
+    @keyframes spin { 0% { transform: rotate(0deg); } 100% { transform: rotate(360deg); } }
+"""
+
+APP_STYLE_BLOCKS = [hide_streamlit_style, REPORT_TABS_CSS, SECTION_CARDS_CSS, REVIEW_CARDS_CSS,
+                    TOP_CARDS_CSS, SPINNER_CSS]
 
 ASSETS_DIR = os.path.join(os.getcwd(), "assets")
 os.makedirs(ASSETS_DIR, exist_ok=True)
 
+# --- Report store ---
+# Finished reports are content-addressed: the id is a hash of the section data, so identical
+# audit results share one artifact. Each report is two gzip files on disk (data.json.gz and
+# report.html.gz under DATA_DIR/reports) written once and never modified, fronted by a
+# size-bounded in-memory LRU of the same gzip bytes. A session only keeps the report id and a
+# small summary, so an idle session costs a few KB however large its report was. Reports not
+# saved again for FVA_REPORT_RETENTION_DAYS are pruned from disk (0 keeps them forever).
+REPORT_STORE_MAX_BYTES = int(float(os.getenv("FVA_REPORT_STORE_MAX_MB", "64")) * 1024 * 1024)
+REPORTS_DIR = os.getenv("FVA_REPORTS_DIR", os.path.join(os.getcwd(), "data", "reports"))
+REPORT_RETENTION_S = float(os.getenv("FVA_REPORT_RETENTION_DAYS", "30")) * 86400
+REPORT_PRUNE_INTERVAL_S = 3600
+REPORT_SECTIONS = ["final", "overview", "visibility", "reputation", "marketing", "experience", "scores", "reviews"]
+REPORT_ARTIFACTS = {"data": "data.json.gz", "html": "report.html.gz"}
+REPORT_PRIVATE_FIELDS = ("email", "phone")   # "final" contact fields kept out of served reports
+SESSION_REPORT_KEYS = ["report_ready", "report_id", "report_summary"]
+_REPORT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+class ReportStore:
+    """Thread-safe LRU of gzip report artifacts ({"data": bytes, "html": bytes}) bounded by total size"""
+    def __init__(self, max_bytes=REPORT_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = {}
+        self.access_order = []
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def put(self, report_id: str, blobs: dict):
+        size = sum(len(b) for b in blobs.values())
+        with self.lock:
+            self._drop(report_id)
+            while self.access_order and self.total_bytes + size > self.max_bytes:
+                self._drop(self.access_order[0])
+            self.entries[report_id] = blobs
+            self.access_order.append(report_id)
+            self.total_bytes += size
+
+    def get(self, report_id: str, name: str):
+        """Compressed artifact bytes, or None when not in memory"""
+        with self.lock:
+            blobs = self.entries.get(report_id)
+            if blobs is None or name not in blobs:
+                return None
+            self.access_order.remove(report_id)
+            self.access_order.append(report_id)
+            return blobs[name]
+
+    def _drop(self, report_id):
+        blobs = self.entries.pop(report_id, None)
+        if blobs is not None:
+            self.total_bytes -= sum(len(b) for b in blobs.values())
+            self.access_order.remove(report_id)
+
+    def discard(self, report_id: str):
+        with self.lock:
+            self._drop(report_id)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"reports": len(self.entries), "bytes": self.total_bytes, "max_bytes": self.max_bytes}
+
+@st.cache_resource(show_spinner=False)
+def _get_report_store():
+    return ReportStore()
+
+def _report_path(report_id: str, name: str) -> str:
+    return os.path.join(REPORTS_DIR, report_id[:2], report_id, REPORT_ARTIFACTS[name])
+
+def save_report(sections: dict, html: str) -> str:
+    """Store a finished report; returns its id (hash of the section data). Re-saving is a no-op."""
+    data = json.dumps({k: sections.get(k) for k in REPORT_SECTIONS}, sort_keys=True, default=str).encode("utf-8")
+    # The HTML is served as-is at /r/<id>: it must be built from public_final(), and any private
+    # contact value that still made it in is blanked
+    for field in REPORT_PRIVATE_FIELDS:
+        value = str((sections.get("final") or {}).get(field) or "").strip()
+        if value:
+            html = html.replace(escape(value), "—")
+    report_id = hashlib.sha256(data).hexdigest()[:32]
+    blobs = {"data": gzip.compress(data, mtime=0), "html": gzip.compress(html.encode("utf-8"), mtime=0)}
+    try:
+        for name, blob in blobs.items():
+            path = _report_path(report_id, name)
+            if os.path.exists(path):
+                os.utime(path)      # saved again: restart its retention clock
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(blob)
+            os.replace(tmp, path)
+    except OSError as e:
+        st.sidebar.write(f"⚠️ Report could not be written to disk: {str(e)[:60]}")
+    _get_report_store().put(report_id, blobs)
+    maybe_prune_reports()
+    return report_id
+
+@st.cache_resource(show_spinner=False)
+def _report_prune_state():
+    return {"last": 0.0, "lock": threading.Lock()}
+
+def prune_reports(now=None) -> int:
+    """Delete stored reports older than the retention window; returns how many were removed"""
+    if REPORT_RETENTION_S <= 0 or not os.path.isdir(REPORTS_DIR):
+        return 0
+    cutoff = (now or time.time()) - REPORT_RETENTION_S
+    removed = 0
+    for shard in os.listdir(REPORTS_DIR):
+        shard_dir = os.path.join(REPORTS_DIR, shard)
+        if not os.path.isdir(shard_dir):
+            continue
+        for report_id in os.listdir(shard_dir):
+            report_dir = os.path.join(shard_dir, report_id)
+            try:
+                newest = max(os.path.getmtime(os.path.join(report_dir, f)) for f in os.listdir(report_dir))
+            except (OSError, ValueError):
+                continue
+            if newest < cutoff:
+                shutil.rmtree(report_dir, ignore_errors=True)
+                _get_report_store().discard(report_id)
+                removed += 1
+    return removed
+
+def maybe_prune_reports():
+    """Run prune_reports at most once per REPORT_PRUNE_INTERVAL_S per process"""
+    state = _report_prune_state()
+    if time.time() - state["last"] < REPORT_PRUNE_INTERVAL_S or not state["lock"].acquire(blocking=False):
+        return
+    try:
+        state["last"] = time.time()
+        removed = prune_reports()
+        if removed:
+            st.sidebar.write(f"🧹 Pruned {removed} expired report(s)")
+    except OSError:
+        pass
+    finally:
+        state["lock"].release()
+
+def report_blob(report_id: str, name: str):
+    """gzip bytes of one artifact (memory first, then disk), or None"""
+    if not (report_id and _REPORT_ID_RE.match(report_id) and name in REPORT_ARTIFACTS):
+        return None
+    store = _get_report_store()
+    blob = store.get(report_id, name)
+    if blob is not None:
+        return blob
+    try:
+        blobs = {}
+        for artifact in REPORT_ARTIFACTS:
+            with open(_report_path(report_id, artifact), "rb") as fh:
+                blobs[artifact] = fh.read()
+    except OSError:
+        return None
+    store.put(report_id, blobs)
+    return blobs[name]
+
+def load_report(report_id: str):
+    """Section dict for a stored report, or None when unknown"""
+    blob = report_blob(report_id, "data")
+    return json.loads(gzip.decompress(blob)) if blob is not None else None
+
+def report_summary(sections: dict) -> dict:
+    final, scores = sections.get("final") or {}, sections.get("scores") or {}
+    return {"practice_name": final.get("practice_name"), "website": final.get("website"),
+            "overall": scores.get("overall")}
+
+def clear_session_report():
+    for key in SESSION_REPORT_KEYS:
+        if key in st.session_state:
+            del st.session_state[key]
+
+# --- Static report server ---
+# A small threaded HTTP server next to Streamlit serves stored reports at /r/<id> (HTML) and
+# /r/<id>.json. Content never changes for an id, so responses are immutable with the id as ETag;
+# the stored gzip bytes go out as-is to clients that accept gzip. The same server also carries the
+# app's static assets under content-versioned /assets/ URLs (see "Static assets"). It binds to
+# loopback unless FVA_REPORT_HOST says otherwise, and share links are only shown when
+# FVA_REPORT_PUBLIC_URL names the address it is reachable at. Neither the HTML nor the JSON carries
+# the practice's contact fields.
+REPORT_SERVER_HOST = os.getenv("FVA_REPORT_HOST", "127.0.0.1")
+REPORT_SERVER_PORT = int(os.getenv("FVA_REPORT_PORT", "8599"))
+REPORT_PUBLIC_URL = os.getenv("FVA_REPORT_PUBLIC_URL", "").rstrip("/")
+_REPORT_ROUTE_RE = re.compile(r"^/r/([0-9a-f]{32})(\.json)?$")
+_REPORT_TYPES = {"html": "text/html; charset=utf-8", "data": "application/json"}
+_ASSET_ROUTE_RE = re.compile(r"^/assets/([\w-]+)\.([0-9a-f]{12})\.(\w+)$")
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    server_version = "FaceValueAudit"
+
+    def log_message(self, *args):
+        pass
+
+    def _resolve(self):
+        """(body, content type, etag, gzipped) for the request path, or None"""
+        path = self.path.split("?", 1)[0]
+        m = _ASSET_ROUTE_RE.match(path)
+        if m:
+            asset = _static_assets().get(f"{m.group(1)}.{m.group(3)}")
+            if asset is None or asset[2] != m.group(2):
+                return None
+            body, content_type, version, gzipped = asset
+            return body, content_type, f'"{version}"', gzipped
+        m = _REPORT_ROUTE_RE.match(path)
+        if not m:
+            return None
+        name = "data" if m.group(2) else "html"
+        blob = report_blob(m.group(1), name)
+        if blob is None:
+            return None
+        if name == "data":
+            blob = public_report_data(blob)
+        return blob, _REPORT_TYPES[name], f'"{m.group(1)}-{name}"', True
+
+    def _respond(self, head_only=False):
+        found = self._resolve()
+        if found is None:
+            self.send_error(404)
+            return
+        blob, content_type, etag, gzipped = found
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+            self.end_headers()
+            return
+        gzip_ok = gzipped and "gzip" in self.headers.get("Accept-Encoding", "")
+        body = gzip.decompress(blob) if gzipped and not gzip_ok else blob
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if gzip_ok:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond()
+
+    def do_HEAD(self):
+        self._respond(head_only=True)
+
+def public_final(final: dict) -> dict:
+    """The "final" contact details minus the fields that stay out of public reports"""
+    return {k: v for k, v in (final or {}).items() if k not in REPORT_PRIVATE_FIELDS}
+
+def public_report_data(blob: bytes) -> bytes:
+    """gzip report JSON with the contact fields removed from "final" """
+    data = json.loads(gzip.decompress(blob))
+    if isinstance(data.get("final"), dict):
+        data["final"] = public_final(data["final"])
+    return gzip.compress(json.dumps(data, sort_keys=True).encode("utf-8"), mtime=0)
+
+@st.cache_resource(show_spinner=False)
+def _get_report_server():
+    """Start the report server once per process; None if the port is unavailable"""
+    try:
+        server = ThreadingHTTPServer((REPORT_SERVER_HOST, REPORT_SERVER_PORT), ReportRequestHandler)
+    except OSError:
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="report-server", daemon=True).start()
+    return server
+
+def report_share_url(report_id: str):
+    """Public link for a report, only when FVA_REPORT_PUBLIC_URL is configured"""
+    if not REPORT_PUBLIC_URL or _get_report_server() is None:
+        return None
+    return f"{REPORT_PUBLIC_URL}/r/{report_id}"
+
+# --- Static assets ---
+# The app stylesheet and logos are built once per process and served by the report server at
+# /assets/<name>.<version>.<ext>, versioned by content hash so browsers cache them for good. A
+# rerun then carries a one-line @import and plain <img src> URLs instead of ~15 KB of CSS and the
+# base64 logo. The URLs have to be reachable from the viewer's browser, so they are only used when
+# FVA_REPORT_PUBLIC_URL is set. By default the logos go through Streamlit's own static serving
+# (server.enableStaticServing in .streamlit/config.toml): they are copied once per process to
+# static/<name>.<version>.<ext> next to app.py and referenced same-origin as ./app/static/...
+# Streamlit serves only media types there (a .css would arrive as text/plain), so the stylesheet
+# stays inline in that case; with FVA_STATIC_ASSETS=0 everything is inlined as before.
+STATIC_ASSETS_ENABLED = os.getenv("FVA_STATIC_ASSETS", "1") != "0"
+STATIC_IMAGES = {"logo-big.png": "image/png", "logo.png": "image/png"}
+STREAMLIT_STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+def app_stylesheet() -> str:
+    return "\n".join(re.sub(r"</?style>", "", block).strip() for block in APP_STYLE_BLOCKS) + "\n"
+
+@st.cache_resource(show_spinner=False)
+def _static_assets():
+    """name -> (body, content type, version, gzipped), built once per process"""
+    css = app_stylesheet().encode()
+    assets = {"app.css": (gzip.compress(css, mtime=0), "text/css; charset=utf-8",
+                          hashlib.sha256(css).hexdigest()[:12], True)}
+    for name, content_type in STATIC_IMAGES.items():
+        try:
+            with open(os.path.join(ASSETS_DIR, name), "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+        assets[name] = (data, content_type, hashlib.sha256(data).hexdigest()[:12], False)
+    return assets
+
+@st.cache_resource(show_spinner=False)
+def _streamlit_static_urls() -> dict:
+    """name -> ./app/static/ URL for the images published to Streamlit's static folder"""
+    if not st.get_option("server.enableStaticServing"):
+        return {}
+    urls = {}
+    for name in STATIC_IMAGES:
+        asset = _static_assets().get(name)
+        if asset is None:
+            continue
+        stem, ext = name.rsplit(".", 1)
+        filename = f"{stem}.{asset[2]}.{ext}"
+        try:
+            os.makedirs(STREAMLIT_STATIC_DIR, exist_ok=True)
+            for old in os.listdir(STREAMLIT_STATIC_DIR):
+                if old != filename and re.fullmatch(rf"{re.escape(stem)}\.[0-9a-f]{{12}}\.{ext}", old):
+                    os.remove(os.path.join(STREAMLIT_STATIC_DIR, old))
+            path = os.path.join(STREAMLIT_STATIC_DIR, filename)
+            if not os.path.exists(path):
+                tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(asset[0])
+                os.replace(tmp, path)
+        except OSError:
+            continue
+        urls[name] = f"./app/static/{filename}"
+    return urls
+
+def asset_url(name: str):
+    """Versioned URL for a static asset, or None when it has to be inlined"""
+    asset = _static_assets().get(name)
+    if asset is None or not STATIC_ASSETS_ENABLED:
+        return None
+    if REPORT_PUBLIC_URL and _get_report_server() is not None:
+        stem, ext = name.rsplit(".", 1)
+        return f"{REPORT_PUBLIC_URL}/assets/{stem}.{asset[2]}.{ext}"
+    return _streamlit_static_urls().get(name)
+
+@st.cache_resource(show_spinner=False)
+def asset_data_uri(name: str) -> str:
+    """base64 data URI for an image, encoded once (standalone report HTML and the no-server fallback)"""
+    with open(os.path.join(ASSETS_DIR, name), "rb") as f:
+        data = base64.b64encode(f.read()).decode()
+    return f"data:{STATIC_IMAGES.get(name, 'image/png')};base64,{data}"
+
+def image_src(name: str) -> str:
+    return asset_url(name) or asset_data_uri(name)
+
+def inject_app_styles():
+    url = asset_url("app.css")
+    if url:
+        st.markdown(f'<style>@import url("{url}");</style>', unsafe_allow_html=True)
+    else:
+        st.markdown(f"<style>\n{app_stylesheet()}</style>", unsafe_allow_html=True)
+
+if IN_STREAMLIT:
+    inject_app_styles()
+
+# Shared links: ?report=<id> opens a stored report without re-running anything
+_shared_report_id = st.query_params.get("report") if IN_STREAMLIT else None
+if _shared_report_id and _shared_report_id != st.session_state.get("report_id"):
+    _shared = load_report(_shared_report_id)
+    if _shared is not None:
+        st.session_state.report_id = _shared_report_id
+        st.session_state.report_summary = report_summary(_shared)
+        st.session_state.report_ready = True
+        st.session_state.final = _shared.get("final") or {}
+
 # Check if report is ready to display (move this to top)
-if st.session_state.get('report_ready', False):
+if IN_STREAMLIT and st.session_state.get('report_ready', False):
+    report = load_report(st.session_state.get('report_id'))
+    if report is None:
+        # Evicted from the shared store: drop the reference and fall through to the form
+        summary = st.session_state.get('report_summary') or {}
+        clear_session_report()
+        st.session_state.submitted = False
+        st.warning(f"The report for {summary.get('practice_name') or 'this practice'} has expired. Please run the audit again.")
+
+if IN_STREAMLIT and st.session_state.get('report_ready', False):
     # Display the report using native Streamlit elements
-    final_data = st.session_state.get('final', {})
-    overview = st.session_state.get('overview', {})
-    visibility = st.session_state.get('visibility', {})
-    reputation = st.session_state.get('reputation', {})
-    marketing = st.session_state.get('marketing', {})
-    experience = st.session_state.get('experience', {})
-    scores = st.session_state.get('scores', {})
-    reviews = st.session_state.get('reviews', [])
+    final_data = report.get('final') or {}
+    overview = report.get('overview') or {}
+    visibility = report.get('visibility') or {}
+    reputation = report.get('reputation') or {}
+    marketing = report.get('marketing') or {}
+    experience = report.get('experience') or {}
+    scores = report.get('scores') or {}
+    reviews = report.get('reviews') or []
 
     display_native_report(final_data, overview, visibility, reputation, marketing, experience, scores, reviews)
 
+    report_id = st.session_state.get('report_id')
+    if st.query_params.get("report") != report_id:
+        st.query_params["report"] = report_id
+    share_url = report_share_url(report_id)
+    if share_url:
+        st.markdown(f"🔗 Shareable report: [{share_url}]({share_url})")
+
     # Add PDF export button
     col1, col2 = st.columns(2)
 
@@ -824,16 +1968,6 @@ if st.session_state.get('report_ready', False):
                 with st.spinner("Generating PDF..."):
                     website_url = st.session_state.get('last_fetched_website', 'unknown_website')
 
-                    # Get all the data from session state
-                    final_data = st.session_state.get('final', {})
-                    overview = st.session_state.get('overview', {})
-                    visibility = st.session_state.get('visibility', {})
-                    reputation = st.session_state.get('reputation', {})
-                    marketing = st.session_state.get('marketing', {})
-                    experience = st.session_state.get('experience', {})
-                    scores = st.session_state.get('scores', {})
-                    reviews = st.session_state.get('reviews', [])
-
                     pdf_result = generate_pdf_report(
                         final_data, overview, visibility, reputation,
                         marketing, experience, scores, reviews, website_url
@@ -858,9 +1992,10 @@ if st.session_state.get('report_ready', False):
         # Reset button
         if st.button("🔄 Run Another Audit", use_container_width=True):
             # Clear session state to start fresh
-            for key in ['draft', 'final', 'submitted', 'last_fetched_website', 'opened_report_id', 'report_ready', 'report_html', 'overview', 'visibility', 'reputation', 'marketing', 'experience', 'scores', 'reviews']:
+            for key in ['draft', 'final', 'submitted', 'last_fetched_website', 'opened_report_id'] + SESSION_REPORT_KEYS:
                 if key in st.session_state:
                     del st.session_state[key]
+            st.query_params.clear()
             st.rerun()
 
 
@@ -869,17 +2004,15 @@ if st.session_state.get('report_ready', False):
 
 # Show the form only if report is not ready
 # Centered logo and title
-with open("assets/logo-big.png", "rb") as logo_file:
-    logo_base64 = base64.b64encode(logo_file.read()).decode()
-
-st.markdown(f"""
+if IN_STREAMLIT:
+    st.markdown(f"""
 <div style="text-align: center; margin-bottom: 2rem;">
-    <img src="data:image/png;base64,{logo_base64}" width="200" style="margin-bottom: 1rem;">
+    <img src="{image_src('logo-big.png')}" width="200" style="margin-bottom: 1rem;">
     <h1 style="margin: 0; font-size: 3rem; color: #262730;">Face Value Audit</h1>
 </div>
 """, unsafe_allow_html=True)
 
-st.markdown("""
+    st.markdown("""
 <h3 style="text-align: center; color: #666; margin-bottom: 2rem;">
 A free tool to evaluate your practice's online presence & patient experience
 </h3>
@@ -942,7 +2075,7 @@ except Exception as e:
 # Configure Claude if available
 if HAS_CLAUDE and CLAUDE_API_KEY:
     try:
-        claude_client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
+        claude_client = anthropic.Anthropic(api_key=CLAUDE_API_KEY, max_retries=0)  # retries handled by llm_request
         # Test the connection
         st.sidebar.success(f"✅ Claude AI initialized successfully")
     except Exception as e:
@@ -972,6 +2105,112 @@ if CSE_API_KEY:
 
 
 # ------------------------ Utility & API helpers ------------------------
+# --- Local persistent store (sqlite; survives restarts, shared by all sessions) ---
+DATA_DIR = os.path.join(os.getcwd(), "data")
+LOCAL_DB_PATH = os.getenv("FVA_LOCAL_DB", os.path.join(DATA_DIR, "face_value_audit.sqlite3"))
+
+LOCAL_DB_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS place_index (
+        lookup_key  TEXT PRIMARY KEY,
+        domain      TEXT,
+        name        TEXT,
+        address     TEXT,
+        place_id    TEXT NOT NULL,
+        confidence  REAL NOT NULL,
+        source      TEXT,
+        verified_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS place_index_domain ON place_index(domain)",
+    """CREATE TABLE IF NOT EXISTS geocode_cache (
+        norm_key  TEXT PRIMARY KEY,
+        ok        INTEGER NOT NULL,
+        formatted TEXT,
+        status    TEXT,
+        cached_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS serp_cache (
+        query      TEXT NOT NULL,
+        locale     TEXT NOT NULL,
+        start      INTEGER NOT NULL,
+        items      TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        PRIMARY KEY (query, locale, start)
+    )""",
+    """CREATE TABLE IF NOT EXISTS audit_stages (
+        scope       TEXT NOT NULL,
+        stage       TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        result      TEXT NOT NULL,
+        updated_at  REAL NOT NULL,
+        PRIMARY KEY (scope, stage)
+    )""",
+    """CREATE TABLE IF NOT EXISTS portfolio (
+        practice_key  TEXT PRIMARY KEY,
+        final         TEXT NOT NULL,
+        cadence_s     INTEGER NOT NULL,
+        next_due      REAL NOT NULL,
+        place_id      TEXT,
+        etag          TEXT,
+        last_modified TEXT,
+        rating        REAL,
+        ratings_total INTEGER,
+        summary       TEXT,
+        last_checked  REAL,
+        last_audited  REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS portfolio_due ON portfolio(next_due)",
+    """CREATE TABLE IF NOT EXISTS portfolio_changes (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        practice_key TEXT NOT NULL,
+        detected_at  REAL NOT NULL,
+        kind         TEXT NOT NULL,
+        severity     TEXT NOT NULL,
+        detail       TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS portfolio_changes_key ON portfolio_changes(practice_key, detected_at)",
+    """CREATE TABLE IF NOT EXISTS score_sketch (
+        cohort     TEXT NOT NULL,
+        metric     TEXT NOT NULL,
+        n          INTEGER NOT NULL,
+        counts     BLOB NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (cohort, metric)
+    )""",
+    """CREATE TABLE IF NOT EXISTS benchmark_members (
+        practice_key TEXT PRIMARY KEY,
+        cohorts      TEXT NOT NULL,
+        bins         TEXT NOT NULL,
+        updated_at   REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS review_analysis_cache (
+        fingerprint TEXT PRIMARY KEY,
+        result      TEXT NOT NULL,
+        cached_at   REAL NOT NULL
+    )""",
+]
+
+class LocalStore:
+    """Thread-safe sqlite wrapper used by the persistent caches and indexes"""
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        for ddl in LOCAL_DB_SCHEMA:
+            self.conn.execute(ddl)
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            self.conn.execute(sql, params)
+
+@st.cache_resource(show_spinner=False)
+def _get_local_store():
+    return LocalStore(LOCAL_DB_PATH)
+
 def _valid_email(s: str) -> bool:
     return bool(re.match(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", (s or "").strip()))
 
@@ -979,16 +2218,197 @@ def _valid_phone(s: str) -> bool:
     # lenient; require at least 7 digits total
     return bool(re.search(r"\d{7,}", (s or "")))
 
+# --- US address normalization (offline) ---
+US_STATES = {
+    "alabama": "AL", "alaska": "AK", "arizona": "AZ", "arkansas": "AR", "california": "CA",
+    "colorado": "CO", "connecticut": "CT", "delaware": "DE", "district of columbia": "DC",
+    "florida": "FL", "georgia": "GA", "hawaii": "HI", "idaho": "ID", "illinois": "IL",
+    "indiana": "IN", "iowa": "IA", "kansas": "KS", "kentucky": "KY", "louisiana": "LA",
+    "maine": "ME", "maryland": "MD", "massachusetts": "MA", "michigan": "MI", "minnesota": "MN",
+    "mississippi": "MS", "missouri": "MO", "montana": "MT", "nebraska": "NE", "nevada": "NV",
+    "new hampshire": "NH", "new jersey": "NJ", "new mexico": "NM", "new york": "NY",
+    "north carolina": "NC", "north dakota": "ND", "ohio": "OH", "oklahoma": "OK", "oregon": "OR",
+    "pennsylvania": "PA", "puerto rico": "PR", "rhode island": "RI", "south carolina": "SC",
+    "south dakota": "SD", "tennessee": "TN", "texas": "TX", "utah": "UT", "vermont": "VT",
+    "virginia": "VA", "washington": "WA", "west virginia": "WV", "wisconsin": "WI", "wyoming": "WY",
+}
+US_STATE_CODES = set(US_STATES.values())
+
+# USPS Publication 28 style suffix abbreviations (common subset)
+STREET_SUFFIXES = {
+    "street": "St", "st": "St", "str": "St", "avenue": "Ave", "ave": "Ave", "av": "Ave",
+    "road": "Rd", "rd": "Rd", "drive": "Dr", "dr": "Dr", "boulevard": "Blvd", "blvd": "Blvd",
+    "lane": "Ln", "ln": "Ln", "way": "Way", "wy": "Way", "court": "Ct", "ct": "Ct",
+    "circle": "Cir", "cir": "Cir", "place": "Pl", "pl": "Pl", "parkway": "Pkwy", "pkwy": "Pkwy",
+    "highway": "Hwy", "hwy": "Hwy", "terrace": "Ter", "ter": "Ter", "trail": "Trl", "trl": "Trl",
+    "plaza": "Plz", "plz": "Plz", "square": "Sq", "sq": "Sq", "pike": "Pike", "freeway": "Fwy",
+    "fwy": "Fwy", "expressway": "Expy", "expy": "Expy", "center": "Ctr", "ctr": "Ctr",
+    "crossing": "Xing", "xing": "Xing", "loop": "Loop", "alley": "Aly", "aly": "Aly",
+    "point": "Pt", "pt": "Pt", "turnpike": "Tpke", "tpke": "Tpke", "row": "Row", "run": "Run",
+}
+DIRECTIONALS = {
+    "north": "N", "south": "S", "east": "E", "west": "W", "northeast": "NE", "northwest": "NW",
+    "southeast": "SE", "southwest": "SW", "n": "N", "s": "S", "e": "E", "w": "W",
+    "ne": "NE", "nw": "NW", "se": "SE", "sw": "SW",
+}
+UNIT_DESIGNATORS = {
+    "suite": "Ste", "ste": "Ste", "unit": "Unit", "apt": "Apt", "apartment": "Apt",
+    "floor": "Fl", "fl": "Fl", "building": "Bldg", "bldg": "Bldg", "room": "Rm", "rm": "Rm",
+}
+
+ADDRESS_LOCAL_CONFIDENCE = 0.9   # at or above this, an address is accepted without a Geocoding call
+
+_ZIP_RE = re.compile(r"\b(\d{5})(?:[-\s]?(\d{4}))?\s*$")
+_COUNTRY_RE = re.compile(r"[,\s]*\b(?:united states(?: of america)?|u\.?s\.?a\.?|us)\.?\s*$", re.IGNORECASE)
+
+def _canon_word(token: str) -> str:
+    t = token.strip(".").lower()
+    if t and t[0].isdigit():
+        return t          # house numbers, ordinals like "5th"
+    return t.capitalize()
+
+def _split_unit(tokens):
+    """Split trailing unit ('Suite 200', '# 4', 'Ste. B') off a street token list"""
+    for i, tok in enumerate(tokens[1:], start=1):
+        t = tok.strip(".,").lower()
+        if t in UNIT_DESIGNATORS:
+            return tokens[:i], " ".join([UNIT_DESIGNATORS[t]] + [x.strip(".,") for x in tokens[i + 1:i + 2]])
+        if t.startswith("#"):
+            value = t[1:] or (tokens[i + 1] if i + 1 < len(tokens) else "")
+            return tokens[:i], f"# {value.upper()}".strip()
+    return tokens, ""
+
+def _parse_street(tokens):
+    """Canonicalize street tokens -> (number, street_line_without_number, has_suffix)"""
+    tokens = [t.strip(",") for t in tokens if t.strip(",")]
+    number = ""
+    if tokens and re.match(r"^\d+[A-Za-z]?(-\d+)?$", tokens[0]):
+        number = tokens.pop(0).upper()
+
+    suffix_at = None
+    for i in range(len(tokens) - 1, 0, -1):
+        t = tokens[i].strip(".").lower()
+        if t in STREET_SUFFIXES:
+            suffix_at = i
+            break
+        if t not in DIRECTIONALS:
+            break
+
+    out = []
+    for i, tok in enumerate(tokens):
+        t = tok.strip(".").lower()
+        if i == suffix_at:
+            out.append(STREET_SUFFIXES[t])
+        elif t in DIRECTIONALS and len(tokens) > 1 and (
+                (i == 0 and suffix_at != 1)  # leading: only when another name token follows ("West St" stays)
+                or (suffix_at is not None and i > suffix_at) or i == len(tokens) - 1):
+            out.append(DIRECTIONALS[t])
+        else:
+            out.append(_canon_word(tok))
+    return number, " ".join(out), suffix_at is not None
+
+def normalize_us_address(address: str):
+    """
+    Parse a free-form US address into number/street/unit/city/state/ZIP with USPS-style
+    abbreviations. Returns a dict with a 'confidence' in [0, 1], or None for empty input.
+    """
+    if not address or not address.strip():
+        return None
+
+    text = " ".join(address.replace("\n", ", ").split())
+    text = _COUNTRY_RE.sub("", text).strip(" ,")
+
+    zip_code = ""
+    m = _ZIP_RE.search(text)
+    if m:
+        zip_code = m.group(1) + (f"-{m.group(2)}" if m.group(2) else "")
+        text = text[:m.start()].strip(" ,")
+
+    # State: full name (longest first) or a 2-letter code that is clearly in the state slot
+    state = ""
+    lowered = text.lower()
+    for name in sorted(US_STATES, key=len, reverse=True):
+        if lowered.endswith(name) and (len(lowered) == len(name) or not lowered[-len(name) - 1].isalpha()):
+            state = US_STATES[name]
+            text = text[:-len(name)].strip(" ,")
+            break
+    if not state:
+        m = re.search(r"(^|,\s*|\s)([A-Za-z]{2})\.?$", text)
+        if m and m.group(2).upper() in US_STATE_CODES and (zip_code or "," in m.group(1)):
+            state = m.group(2).upper()
+            text = text[:m.start(2)].strip(" ,")
+
+    segments = [s.strip() for s in text.split(",") if s.strip()]
+    city = ""
+    street_tokens = []
+    unit = ""
+
+    if len(segments) >= 2:
+        city = segments[-1]
+        body = segments[:-1]
+        street_seg = next((s for s in body if re.match(r"^\d", s)), body[0])
+        street_tokens, unit = _split_unit(street_seg.split())
+        for s in body:
+            first = s.split()[0].strip(".").lower() if s.split() else ""
+            if s is not street_seg and not unit and (first in UNIT_DESIGNATORS or first.startswith("#")):
+                _, unit = _split_unit(["_"] + s.split())
+        # Any other body segments (district, building names) are dropped as noise
+    elif segments:
+        tokens = segments[0].split()
+        street_tokens, unit = _split_unit(tokens)
+        if unit:
+            # "123 Main St Suite 4 Springfield" -> the words after the unit value are the city
+            consumed = len(street_tokens) + 2
+            city = " ".join(tokens[consumed:])
+        else:
+            suffix_at = None
+            for i, tok in enumerate(tokens[1:], start=1):
+                if tok.strip(".").lower() in STREET_SUFFIXES:
+                    suffix_at = i
+            if suffix_at is not None and suffix_at < len(tokens) - 1:
+                end = suffix_at + 1
+                if end < len(tokens) - 1 and tokens[end].strip(".").lower() in DIRECTIONALS:
+                    end += 1
+                street_tokens, city = tokens[:end], " ".join(tokens[end:])
+
+    number, street, has_suffix = _parse_street(street_tokens)
+    if city and (city.isupper() or city.islower()):
+        city = city.title()
+
+    confidence = (0.2 if number else 0) + (0.2 if street else 0) + (0.1 if has_suffix else 0) \
+        + (0.2 if city else 0) + (0.2 if state else 0) + (0.1 if zip_code else 0)
+
+    street_line = " ".join(p for p in [number, street] if p)
+    region = " ".join(p for p in [state, zip_code] if p)
+    short = ", ".join(p for p in [street_line, city, region] if p)
+    full = ", ".join(p for p in [" ".join(p for p in [street_line, unit] if p), city, region] if p)
+
+    return {
+        "number": number,
+        "street": street,
+        "unit": unit,
+        "city": city,
+        "state": state,
+        "zip": zip_code,
+        "normalized": full,
+        "short": short,
+        "confidence": round(confidence, 2),
+    }
+
 def shorten_address(full_address: str) -> str:
     """
     Shorten a full address to be less descriptive while keeping essential info
     Example: "123 Main Street, Suite 456, Downtown District, Springfield, IL 62701, USA"
-    becomes "123 Main Street, Springfield, IL 62701"
+    becomes "123 Main St, Springfield, IL 62701"
     """
     if not full_address or full_address.strip() == "":
         return full_address
 
-    # Remove common verbose elements
+    parsed = normalize_us_address(full_address)
+    if parsed and parsed["confidence"] >= ADDRESS_LOCAL_CONFIDENCE:
+        return parsed["short"]
+
+    # Non-US or unparseable: fall back to comma-based trimming
     address = full_address.strip()
 
     # Split by commas and process each part
@@ -1016,12 +2436,49 @@ def shorten_address(full_address: str) -> str:
 
     return ', '.join(filtered_parts)
 
-def validate_address_with_geocoding(address: str) -> tuple[bool, str]:
+# --- Geocoding (only for addresses the local normalizer can't settle) ---
+GEOCODE_NEGATIVE_TTL = 7 * 24 * 3600   # retry addresses Google couldn't find after a week
+
+def _address_cache_key(address: str) -> str:
+    parsed = normalize_us_address(address)
+    basis = parsed["normalized"] if parsed and parsed["normalized"] else address
+    return _norm_key_part(basis)
+
+def _geocode_cache_get(key: str):
+    rows = _get_local_store().query("SELECT ok, formatted, cached_at FROM geocode_cache WHERE norm_key = ?", (key,))
+    if not rows:
+        return None
+    ok, formatted, cached_at = rows[0]
+    if not ok and time.time() - cached_at > GEOCODE_NEGATIVE_TTL:
+        return None
+    return bool(ok), formatted
+
+def _geocode_cache_put(key: str, ok: bool, formatted: str, status: str):
+    _get_local_store().execute(
+        "INSERT OR REPLACE INTO geocode_cache (norm_key, ok, formatted, status, cached_at) VALUES (?, ?, ?, ?, ?)",
+        (key, 1 if ok else 0, formatted or "", status or "", time.time())
+    )
+
+def check_address(address: str) -> tuple[bool, str]:
     """
-    Validate an address using Google Geocoding API reverse search
-    Returns (is_valid, validated_address)
+    Returns (ok, formatted_address). ok means the address is either a well-formed US address,
+    settled locally with no network call (its existence is NOT verified), or an ambiguous one
+    that the Google Geocoding API found (through a persistent cache keyed by the normalized form).
     """
-    if not address or not PLACES_API_KEY:
+    if not address:
+        return False, address
+
+    parsed = normalize_us_address(address)
+    if parsed and parsed["confidence"] >= ADDRESS_LOCAL_CONFIDENCE:
+        return True, parsed["short"]
+
+    key = _address_cache_key(address)
+    cached = _geocode_cache_get(key)
+    if cached is not None:
+        ok, formatted = cached
+        return (True, shorten_address(formatted)) if ok else (False, address)
+
+    if not PLACES_API_KEY:
         return False, address
 
     try:
@@ -1037,16 +2494,21 @@ def validate_address_with_geocoding(address: str) -> tuple[bool, str]:
             return False, address
 
         data = response.json()
+        status = data.get("status")
 
-        if data.get("status") == "OK" and data.get("results"):
+        if status == "OK" and data.get("results"):
             # Get the first result (most accurate)
             result = data["results"][0]
             validated_address = result.get("formatted_address", address)
+            _geocode_cache_put(key, True, validated_address, status)
 
             # Shorten the validated address
             shortened = shorten_address(validated_address)
             return True, shortened
         else:
+            # Only definitive misses are cached; quota/permission errors are retried next time
+            if status == "ZERO_RESULTS":
+                _geocode_cache_put(key, False, "", status)
             return False, address
 
     except Exception as e:
@@ -1054,6 +2516,181 @@ def validate_address_with_geocoding(address: str) -> tuple[bool, str]:
         return False, address
 
 
+# --- Page digest for LLM prompts ---
+# One compact, deduplicated, section-labelled text view of a page, shared by all prompts.
+# Navigation, scripts and cookie/consent banners are dropped; header/footer text is kept
+# only where it carries contact details or hours.
+DIGEST_SECTIONS = ["contact", "hours", "services", "insurance", "about", "testimonials", "other"]
+DIGEST_CHARS_PER_TOKEN = 4
+_DIGEST_DROP_TAGS = {"nav", "script", "style", "noscript", "svg", "template", "iframe", "select", "button"}
+_DIGEST_CHROME_TAGS = {"header", "footer", "aside"}
+_DIGEST_BLOCK_TAGS = {"p", "li", "h1", "h2", "h3", "h4", "h5", "h6", "td", "th", "dd", "dt",
+                      "address", "blockquote", "figcaption", "label", "div", "section", "article", "a", "span"}
+# Matched per class/id token as whole words ("-"/"_" separate words), so "site-menu" is chrome
+# but "menuitem" or "fusion-body" is not
+_DIGEST_BOILERPLATE_RE = re.compile(
+    r"(?<![a-z0-9])(?:cookie|consent|gdpr|ccpa|privacy-banner|newsletter|popup|modal|navbar|menu|breadcrumb"
+    r"|skip-link|sr-only|screen-reader)s?(?![a-z0-9])",
+    re.IGNORECASE)
+# Page-level containers carry theme/state classes ("menu-open", "modal-active") that say nothing
+# about the content inside them; the ancestor walk stops here
+_DIGEST_ROOT_TAGS = {"html", "body", "main", "article"}
+_DIGEST_PHONE_RE = re.compile(r"\(?\d{3}\)?[\s.\-]?\d{3}[\s.\-]?\d{4}")
+_DIGEST_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+_DIGEST_ADDRESS_RE = re.compile(
+    r"\b\d{1,6}\s+(?:[\w.]+\s+){0,4}(?:" + "|".join(sorted(STREET_SUFFIXES, key=len, reverse=True)) + r")\b\.?"
+    r"|\b[A-Z]{2}\s+\d{5}(?:-\d{4})?\b", re.IGNORECASE)
+_DIGEST_HOURS_RE = re.compile(
+    r"\b(mon|tue|wed|thu|fri|sat|sun)[a-z]*\b.*\d|\b\d{1,2}(:\d{2})?\s*(am|pm)\b|\bhours\b|\bclosed\b", re.IGNORECASE)
+_DIGEST_KEYWORDS = {
+    "contact": re.compile(r"contact|call us|phone|email|address|directions|located|suite|appointment|book|schedule", re.I),
+    "insurance": re.compile(r"insurance|ppo|hmo|medicaid|medicare|delta dental|aetna|cigna|metlife|guardian|humana|"
+                            r"united ?healthcare|in-network|out-of-network|financing|carecredit|payment|membership plan", re.I),
+    "services": re.compile(r"service|treatment|implant|whitening|crown|bridge|veneer|invisalign|orthodont|braces|"
+                           r"cleaning|root canal|extraction|denture|cosmetic|pediatric|emergency|periodont|"
+                           r"sedation|fillings?|sealant|x-ray|exam", re.I),
+    "testimonials": re.compile(r"testimonial|review|patients say|what our patients|★|stars?\b|highly recommend", re.I),
+    "about": re.compile(r"\bdr\.|\bdoctor\b|\bdds\b|\bdmd\b|meet|about us|our team|our practice|years of experience", re.I),
+}
+_digest_blocks_cache = {}   # id(soup) -> (weakref, blocks)
+
+def _digest_is_boilerplate(tag) -> bool:
+    if tag.name in _DIGEST_DROP_TAGS:
+        return True
+    if tag.get("aria-hidden") == "true" or tag.get("role") in ("navigation", "dialog", "alertdialog"):
+        return True
+    tokens = list(tag.get("class") or []) + (tag.get("id") or "").split()
+    return any(_DIGEST_BOILERPLATE_RE.search(t) for t in tokens)
+
+def _digest_classify(text: str, heading: str, tag_name: str = "") -> str:
+    if _DIGEST_PHONE_RE.search(text) or _DIGEST_EMAIL_RE.search(text) or _DIGEST_ADDRESS_RE.search(text):
+        return "contact"
+    if tag_name == "h1":
+        return "about"   # page title heading usually names the practice
+    if _DIGEST_HOURS_RE.search(text) and len(text) < 160:
+        return "hours"
+    for name in ("insurance", "testimonials", "services", "about", "contact"):
+        if _DIGEST_KEYWORDS[name].search(heading):
+            return name
+    for name in ("insurance", "services", "testimonials", "about", "contact"):
+        if _DIGEST_KEYWORDS[name].search(text):
+            return name
+    return "other"
+
+def _digest_blocks(soup: BeautifulSoup):
+    """Walk the page once -> ordered, deduplicated [(section, text)]"""
+    import weakref
+    entry = _digest_blocks_cache.get(id(soup))
+    if entry and entry[0]() is soup:
+        return entry[1]
+
+    root = soup.body or soup
+    blocks, seen = [], set()
+    heading = ""
+    pending = {}   # block element -> [strings]
+    order = []
+
+    for node in root.find_all(string=True):
+        if type(node).__name__ != "NavigableString":   # comments, CDATA, doctype
+            continue
+        text = " ".join(node.split())
+        if not text:
+            continue
+        block, in_chrome, dropped = None, False, False
+        for anc in node.parents:
+            if anc is None or anc.name in (None, "[document]"):
+                break
+            if anc.name in _DIGEST_ROOT_TAGS:
+                if block is None and anc.name == "article":
+                    block = anc
+                break
+            if _digest_is_boilerplate(anc):
+                dropped = True
+                break
+            if anc.name in _DIGEST_CHROME_TAGS:
+                in_chrome = True
+            if block is None and anc.name in _DIGEST_BLOCK_TAGS and anc.name not in ("a", "span"):
+                block = anc
+        if dropped:
+            continue
+        key = id(block) if block is not None else id(node)
+        if key not in pending:
+            pending[key] = {"parts": [], "chrome": in_chrome, "tag": block.name if block is not None else ""}
+            order.append(key)
+        pending[key]["parts"].append(text)
+
+    for key in order:
+        item = pending[key]
+        text = " ".join(item["parts"]).strip()
+        if len(text) < 3:
+            continue
+        if re.match(r"h[1-6]$", item["tag"]):
+            heading = text
+        norm = re.sub(r"\W+", " ", text.lower()).strip()
+        if not norm or norm in seen:
+            continue
+        seen.add(norm)
+        section = _digest_classify(text, heading, item["tag"])
+        # Header/footer/sidebar chrome only contributes contact details and hours
+        if item["chrome"] and section not in ("contact", "hours"):
+            continue
+        blocks.append((section, text[:400]))
+
+    try:
+        ref = weakref.ref(soup, lambda _r, k=id(soup): _digest_blocks_cache.pop(k, None))
+        _digest_blocks_cache[id(soup)] = (ref, blocks)
+    except TypeError:
+        pass
+    return blocks
+
+def page_digest(soup: BeautifulSoup, max_tokens: int = 500, focus=()) -> str:
+    """
+    Section-labelled digest of a page within a token budget.
+    `focus` sections are filled first; the rest share what is left, in DIGEST_SECTIONS order.
+    """
+    if not soup:
+        return ""
+    blocks = _digest_blocks(soup)
+    budget = max_tokens * DIGEST_CHARS_PER_TOKEN
+    order = list(focus) + [s for s in DIGEST_SECTIONS if s not in focus]
+
+    by_section = {name: [] for name in order}
+    for section, text in blocks:
+        by_section.setdefault(section, []).append(text)
+
+    # Focus sections may take up to half the budget, then every section gets a fair share so one
+    # long section can't starve the others, and the last pass hands out what is left in order.
+    present = [name for name in order if by_section.get(name)]
+    if not present:
+        return ""
+    focused = [name for name in present if name in focus]
+    passes = [(present, budget // len(present)), (present, budget)]
+    if focused:
+        passes.insert(0, (focused, budget // 2 // len(focused)))
+    chosen = {name: [] for name in present}
+    used = 0
+    for names, pass_cap in passes:
+        for name in names:
+            taken = sum(len(t) + 1 for t in chosen[name])
+            for text in by_section[name]:
+                if text in chosen[name]:
+                    continue
+                cost = len(text) + 1
+                if taken + cost > pass_cap or used + cost > budget:
+                    continue
+                chosen[name].append(text)
+                taken += cost; used += cost
+
+    out = []
+    for name in present:
+        if chosen[name]:
+            # keep page order within a section
+            picked = set(chosen[name])
+            lines = [t for t in by_section[name] if t in picked]
+            out.append(f"[{name.upper()}]\n" + "\n".join(lines))
+    return "\n".join(out)
+
+
 # LLM-powered extraction functions
 def extract_practice_name_with_llm(soup: BeautifulSoup, website_url: str):
     """Extract practice name using LLM if traditional methods fail"""
@@ -1062,7 +2699,7 @@ def extract_practice_name_with_llm(soup: BeautifulSoup, website_url: str):
 
     try:
         # Get page content
-        page_text = soup.get_text(" ", strip=True)[:1500]  # Limit for faster processing
+        page_text = page_digest(soup, max_tokens=350, focus=("about", "contact"))
 
         # Create focused prompt for practice name extraction
         prompt = f"""
@@ -1073,22 +2710,18 @@ def extract_practice_name_with_llm(soup: BeautifulSoup, website_url: str):
 
         Instructions:
         - Find the official business/practice name
-        - Return ONLY 3-4 words maximum (e.g., "Smith Family Dental", "Downtown Dentistry")
+        - 3-4 words maximum (e.g., "Smith Family Dental", "Downtown Dentistry")
         - Use proper title case
         - Ignore generic terms like "Dentist" alone
-        - If no clear practice name, return "NOT_FOUND"
-
-        Practice Name (3-4 words max):"""
+        - If no clear practice name, use null"""
 
-        result = call_claude_api(prompt)
+        out = call_claude_structured(prompt, "practice_name")
+        result = ((out or {}).get("practice_name") or "").strip()
         if not result:
             return None
 
-        result = result.strip()
-
         # Validate the result - enforce 3-4 word limit
-        if (result and result != "NOT_FOUND" and
-            len(result) > 2 and len(result) < 50 and
+        if (len(result) > 2 and len(result) < 50 and
             len(result.split()) <= 4 and  # Maximum 4 words
             not result.lower().startswith('http') and
             not result.lower() in ['dentist', 'dental', 'dental services', 'dental office']):
@@ -1107,7 +2740,7 @@ def extract_address_with_llm(soup: BeautifulSoup, website_url: str):
 
     try:
         # Get page content
-        page_text = soup.get_text(" ", strip=True)[:1500]
+        page_text = page_digest(soup, max_tokens=300, focus=("contact",))
 
         # Create focused prompt for address extraction
         prompt = f"""
@@ -1119,36 +2752,32 @@ def extract_address_with_llm(soup: BeautifulSoup, website_url: str):
         Instructions:
         - Find the complete physical address (street, city, state/province, zip/postal code)
         - Look for contact sections, footer, about pages
-        - Return ONLY the full address in standard format
-        - If multiple locations, return the main/primary address
-        - If no physical address exists, return "NOT_FOUND"
-        - Do not include phone numbers or email addresses
-
-        Physical Address:"""
+        - Give the full address in standard format
+        - If multiple locations, use the main/primary address
+        - If no physical address exists, use null
+        - Do not include phone numbers or email addresses"""
 
-        result = call_claude_api(prompt)
+        out = call_claude_structured(prompt, "address")
+        result = ((out or {}).get("address") or "").strip()
         if not result:
             return None
 
-        result = result.strip()
-
         # Validate the result - should contain typical address components
-        if (result and result != "NOT_FOUND" and
-            len(result) > 10 and len(result) < 200 and
+        if (len(result) > 10 and len(result) < 200 and
             not result.lower().startswith('http') and  # Not a URL
             any(word in result.lower() for word in ['street', 'st', 'avenue', 'ave', 'road', 'rd', 'drive', 'dr', 'lane', 'ln', 'blvd', 'suite', 'ste', 'way', 'place', 'circle', 'court']) and
             any(char.isdigit() for char in result)):  # Should contain at least one number
 
             # Shorten and validate the LLM-extracted address with Google Maps
             shortened_address = shorten_address(result.strip())
-            is_valid, validated_address = validate_address_with_geocoding(shortened_address)
+            is_valid, validated_address = check_address(shortened_address)
 
             if is_valid:
-                st.sidebar.write(f"✅ Address validated with Google Maps: {validated_address[:50]}...")
+                st.sidebar.write(f"✅ Address accepted (well-formed or geocoded): {validated_address[:50]}...")
                 return validated_address
             else:
-                # If validation fails, don't return the address - let it be empty
-                st.sidebar.write(f"❌ Address not found in Google Maps: {shortened_address[:50]}...")
+                # If the check fails, don't return the address - let it be empty
+                st.sidebar.write(f"❌ Address not well-formed and not found by Geocoding: {shortened_address[:50]}...")
                 return None
 
         return None
@@ -1164,7 +2793,7 @@ def extract_doctor_name_with_llm(soup: BeautifulSoup, website_url: str):
 
     try:
         # Get page content
-        page_text = soup.get_text(" ", strip=True)[:1500]
+        page_text = page_digest(soup, max_tokens=350, focus=("about",))
 
         # Create focused prompt for doctor name extraction
         prompt = f"""
@@ -1176,21 +2805,15 @@ def extract_doctor_name_with_llm(soup: BeautifulSoup, website_url: str):
         Instructions:
         - Find the primary dentist/doctor's full name
         - Look for "Dr.", "Doctor", "Meet Dr.", "About Dr.", etc.
-        - Return ONLY the doctor's name with title (e.g., "Dr. John Smith")
-        - If multiple doctors, return the main/primary one
-        - If no clear doctor name exists, return "NOT_FOUND"
-
-        Doctor Name:"""
+        - Give the doctor's name with title (e.g., "Dr. John Smith")
+        - If multiple doctors, use the main/primary one
+        - If no clear doctor name exists, use null"""
 
-        result = call_claude_api(prompt)
-        if not result:
-            return None
-
-        result = result.strip()
+        out = call_claude_structured(prompt, "doctor_name")
+        result = ((out or {}).get("doctor_name") or "").strip()
 
         # Validate the result
-        if (result and result != "NOT_FOUND" and
-            len(result) > 3 and len(result) < 100 and
+        if (len(result) > 3 and len(result) < 100 and
             not result.lower().startswith('http')):
             return result
 
@@ -1210,7 +2833,7 @@ def extract_email_with_llm(soup: BeautifulSoup, website_url: str):
 
     try:
         # Get page content
-        page_text = soup.get_text(" ", strip=True)[:1500]
+        page_text = page_digest(soup, max_tokens=300, focus=("contact",))
         st.sidebar.write(f"🔧 Page content length: {len(page_text)}")
 
         # Create focused prompt for email extraction
@@ -1223,25 +2846,21 @@ def extract_email_with_llm(soup: BeautifulSoup, website_url: str):
         Instructions:
         - Find the primary contact email address
         - Look for contact sections, footer, about pages
-        - Return ONLY the email address (e.g., "info@practice.com")
-        - If multiple emails, return the main contact one (avoid personal emails)
-        - If no email exists, return "NOT_FOUND"
-
-        Email Address:"""
+        - Give only the email address (e.g., "info@practice.com")
+        - If multiple emails, use the main contact one (avoid personal emails)
+        - If no email exists, use null"""
 
         st.sidebar.write("🔧 Calling Claude API for email extraction...")
-        result = call_claude_api(prompt)
+        out = call_claude_structured(prompt, "email")
+        result = ((out or {}).get("email") or "").strip()
         st.sidebar.write(f"🔧 Claude API result: {result[:50] if result else 'None'}...")
 
         if not result:
-            st.sidebar.write("❌ No result from Claude API")
+            st.sidebar.write("❌ No email from Claude API")
             return None
 
-        result = result.strip()
-
         # Validate the result with email regex
-        if (result and result != "NOT_FOUND" and
-            _valid_email(result)):
+        if _valid_email(result):
             st.sidebar.write(f"✅ Valid email found: {result}")
             return result
 
@@ -1259,7 +2878,7 @@ def extract_phone_with_llm(soup: BeautifulSoup, website_url: str):
 
     try:
         # Get page content
-        page_text = soup.get_text(" ", strip=True)[:1500]
+        page_text = page_digest(soup, max_tokens=300, focus=("contact",))
 
         # Create focused prompt for phone extraction
         prompt = f"""
@@ -1271,21 +2890,15 @@ def extract_phone_with_llm(soup: BeautifulSoup, website_url: str):
         Instructions:
         - Find the primary contact phone number
         - Look for contact sections, header, footer
-        - Return ONLY the phone number (e.g., "(555) 123-4567" or "555-123-4567")
-        - If multiple phones, return the main office line
-        - If no phone exists, return "NOT_FOUND"
-
-        Phone Number:"""
-
-        result = call_claude_api(prompt)
-        if not result:
-            return None
+        - Give only the phone number (e.g., "(555) 123-4567" or "555-123-4567")
+        - If multiple phones, use the main office line
+        - If no phone exists, use null"""
 
-        result = result.strip()
+        out = call_claude_structured(prompt, "phone")
+        result = ((out or {}).get("phone") or "").strip()
 
         # Validate the result with phone regex
-        if (result and result != "NOT_FOUND" and
-            _valid_phone(result)):
+        if result and _valid_phone(result):
             return result
 
         return None
@@ -1301,7 +2914,7 @@ def extract_appointment_channels_with_llm(soup: BeautifulSoup, website_url: str)
 
     try:
         # Get page content
-        page_text = soup.get_text(" ", strip=True)[:2000]
+        page_text = page_digest(soup, max_tokens=450, focus=("contact", "hours"))
 
         # Create focused prompt for appointment channels
         prompt = f"""
@@ -1312,34 +2925,15 @@ def extract_appointment_channels_with_llm(soup: BeautifulSoup, website_url: str)
 
         Instructions:
         - Identify how patients can book appointments
-        - Be VERY concise - use minimal words
+        - Be VERY concise - use minimal words (channels: max 5 words)
         - Look for: online booking, phone numbers, forms, third-party systems
+        - Score: Phone-only, Phone + Online Form, or Phone + Advanced System"""
 
-        Return in this exact format:
-        CHANNELS: [concise list, max 5 words]
-        SCORE: [Phone-only/Phone + Online Form/Phone + Advanced System]
-
-        Appointment Analysis:"""
-
-        result = call_claude_api(prompt)
-        if not result:
+        out = call_claude_structured(prompt, "appointment_channels")
+        if not out:
             return None, None
 
-        result = result.strip()
-
-        # Parse the result
-        channels = ""
-        score = "Phone-only"
-
-        if "CHANNELS:" in result:
-            channels_line = result.split("CHANNELS:")[1].split("SCORE:")[0].strip()
-            channels = channels_line
-
-        if "SCORE:" in result:
-            score_line = result.split("SCORE:")[1].strip()
-            score = score_line
-
-        return channels, score
+        return _clip_words(out["channels"], 5), out["score"]
 
     except Exception as e:
         st.sidebar.write(f"⚠️ LLM appointment channels extraction failed: {str(e)[:50]}")
@@ -1352,7 +2946,7 @@ def extract_insurance_info_with_llm(soup: BeautifulSoup, website_url: str):
 
     try:
         # Get page content
-        page_text = soup.get_text(" ", strip=True)[:2000]
+        page_text = page_digest(soup, max_tokens=450, focus=("insurance",))
 
         # Create focused prompt for insurance info
         prompt = f"""
@@ -1362,44 +2956,30 @@ def extract_insurance_info_with_llm(soup: BeautifulSoup, website_url: str):
         Content: {page_text}
 
         Requirements:
-        - MAXIMUM 3 lines only
-        - Each line maximum 15 words
+        - status: accepts, does_not_accept, or not_found
+        - lines: MAXIMUM 3 simple sentences, each maximum 15 words, not bullet points
         - Be specific about insurance plans (Delta Dental, Blue Cross, Cigna, etc.)
-        - If no insurance info found, return: "No insurance information found"
-        - If they don't accept insurance, return: "Does not accept insurance"
-        - Format as simple sentences, not bullet points
 
-        Examples:
+        Example lines:
         "Accepts most major insurance plans including Delta Dental and Blue Cross"
         "PPO and HMO plans welcome with payment plans available"
-        "No insurance information found"
         """
 
-        result = call_claude_api(prompt)
-        if not result:
+        out = call_claude_structured(prompt, "insurance")
+        if not out:
             return None
 
-        result = result.strip()
+        if out["status"] == "not_found":
+            return "No insurance information found"
+        if out["status"] == "does_not_accept":
+            return "Does not accept insurance"
+        # Limit to exactly 3 lines maximum
+        lines = [_clip_words(line, 15) for line in out["lines"] if line.strip()][:3]
+        return '\n'.join(lines) if lines else None
 
-        if result and result != "NOT_FOUND" and len(result) > 5:
-            # Limit to exactly 3 lines maximum
-            lines = [line.strip() for line in result.split('\n') if line.strip()]
-
-            # Take only first 3 lines
-            if len(lines) > 3:
-                lines = lines[:3]
-
-            # Join lines with newline for multi-line display, or space for single line
-            if len(lines) > 1:
-                return '\n'.join(lines)
-            else:
-                return lines[0] if lines else result
-
-        return None
-
-    except Exception as e:
-        st.sidebar.write(f"⚠️ LLM insurance extraction failed: {str(e)[:50]}")
-        return None
+    except Exception as e:
+        st.sidebar.write(f"⚠️ LLM insurance extraction failed: {str(e)[:50]}")
+        return None
 
 def guess_practice_name_from_url_with_llm(website_url: str, soup: BeautifulSoup):
     """Guess practice name from URL and validate with LLM (max 3-4 words)"""
@@ -1423,7 +3003,7 @@ def guess_practice_name_from_url_with_llm(website_url: str, soup: BeautifulSoup)
         url_guess = ' '.join(url_guess.split()).title()  # Clean and title case
 
         # Get website content for LLM validation
-        page_text = soup.get_text(" ", strip=True)[:1500] if soup else ""
+        page_text = page_digest(soup, max_tokens=300, focus=("about", "contact")) if soup else ""
 
         prompt = f"""
         Guess and validate the dental practice name from this URL and website content.
@@ -1435,22 +3015,16 @@ def guess_practice_name_from_url_with_llm(website_url: str, soup: BeautifulSoup)
         Instructions:
         - Use the URL domain to guess the practice name
         - Validate the guess against website content
-        - Return ONLY the practice name (3-4 words maximum)
+        - Practice name only (3-4 words maximum)
         - Use proper title case (e.g., "Smith Family Dentistry")
         - If the URL guess doesn't match website content, use content instead
-        - If unclear, return "NOT_FOUND"
+        - If unclear, use null"""
 
-        Practice Name:"""
-
-        result = call_claude_api(prompt)
-        if not result:
-            return ""
-
-        result = result.strip()
+        out = call_claude_structured(prompt, "practice_name")
+        result = ((out or {}).get("practice_name") or "").strip()
 
         # Validate result
-        if (result and result != "NOT_FOUND" and
-            len(result) > 0 and len(result) < 50 and
+        if (len(result) > 0 and len(result) < 50 and
             len(result.split()) <= 4):  # Max 4 words
             return result
 
@@ -1551,9 +3125,9 @@ def basic_address_extraction(soup: BeautifulSoup):
     # Address pattern (number + street + common keywords)
     address_pattern = r'\d+\s+[A-Za-z\s]+(Street|St|Avenue|Ave|Road|Rd|Drive|Dr|Boulevard|Blvd|Lane|Ln|Way|Circle|Cir|Court|Ct)[^,]*,?\s*[A-Za-z\s]+,?\s*[A-Z]{2}\s*\d{5}'
 
-    matches = re.findall(address_pattern, text_content)
-    if matches:
-        return matches[0]
+    match = re.search(address_pattern, text_content)
+    if match:
+        return " ".join(match.group(0).split())
 
     # Look for footer or contact section
     footer = soup.find('footer')
@@ -1566,8 +3140,130 @@ def basic_address_extraction(soup: BeautifulSoup):
 
     return ""
 
+# --- Extraction cascade ---
+# Each contact field gets candidates from cheap deterministic sources, each with a confidence.
+# Only fields whose best candidate stays below the threshold are sent to the LLM, and all of
+# them go in one combined call.
+EXTRACT_MIN_CONFIDENCE = float(os.getenv("FVA_EXTRACT_MIN_CONFIDENCE", "0.75"))
+CONTACT_FIELDS = ("practice_name", "address", "email", "phone")
+
+def _phone_digits(p: str) -> str:
+    d = re.sub(r"\D", "", p or "")
+    return d[1:] if len(d) == 11 and d.startswith("1") else d
+
+def _format_phone(p: str) -> str:
+    d = _phone_digits(p)
+    return f"({d[:3]}) {d[3:6]}-{d[6:]}" if len(d) == 10 else (p or "").strip()
+
+def _link_values(soup: BeautifulSoup, scheme: str) -> list:
+    """Values of tel:/mailto: links, most frequent first"""
+    counts = {}
+    for a in soup.find_all("a", href=True):
+        href = a["href"].strip()
+        if href.lower().startswith(scheme):
+            value = href[len(scheme):].split("?")[0].strip()
+            if value:
+                counts[value] = counts.get(value, 0) + 1
+    return sorted(counts, key=lambda v: -counts[v])
+
+def contact_candidates(soup: BeautifulSoup, website_url: str, head_fields: dict) -> dict:
+    """field -> [(value, confidence, source)] from deterministic extractors"""
+    cands = {f: [] for f in CONTACT_FIELDS}
+    site_domain = get_domain(website_url) if website_url else ""
+
+    # schema.org anywhere in the page (head data may already be in head_fields)
+    schema_fields = practice_fields_from_head({"json_ld": json_ld_items(soup), "meta": {}, "title": ""}) if soup else {}
+    for field, value in schema_fields.items():
+        if field in cands and value:
+            cands[field].append((value, 0.9, "schema.org"))
+    for field, value in (head_fields or {}).items():
+        if field in cands and value and value not in schema_fields.values():
+            cands[field].append((value, 0.85 if field != "practice_name" else 0.8, "head"))
+    if not soup:
+        return cands
+
+    for value in _link_values(soup, "mailto:")[:1]:
+        if _valid_email(value):
+            cands["email"].append((value, 0.95, "mailto"))
+    for value in _link_values(soup, "tel:")[:1]:
+        if _valid_phone(value):
+            cands["phone"].append((_format_phone(value), 0.95, "tel"))
+
+    email = basic_email_extraction(soup)
+    if email:
+        same_site = site_domain and email.lower().endswith("@" + site_domain.lower())
+        cands["email"].append((email, 0.8 if same_site else 0.6, "text"))
+
+    phone = basic_phone_extraction(soup)
+    if phone:
+        repeats = soup.get_text(" ").count(phone[-4:])
+        cands["phone"].append((phone, 0.8 if repeats >= 2 else 0.6, "text"))
+
+    addr = basic_address_extraction(soup)
+    if addr:
+        parsed = normalize_us_address(addr)
+        if parsed and parsed["confidence"] >= ADDRESS_LOCAL_CONFIDENCE:
+            cands["address"].append((parsed["short"], 0.8, "text"))
+        else:
+            cands["address"].append((addr, 0.4, "text"))
+
+    name = basic_practice_name_extraction(soup, website_url)
+    if name:
+        cands["practice_name"].append((name, 0.5, "title"))
+    return cands
+
+def _same_value(field: str, a: str, b: str) -> bool:
+    if field == "phone":
+        return _phone_digits(a) == _phone_digits(b)
+    return (a or "").strip().lower() == (b or "").strip().lower()
+
+def best_candidate(field: str, cands: list):
+    """Highest-confidence candidate; independent sources that agree raise the confidence"""
+    if not cands:
+        return None, 0.0, ""
+    value, conf, source = max(cands, key=lambda c: c[1])
+    agreeing = {src for v, _, src in cands if _same_value(field, v, value)}
+    if len(agreeing) > 1:
+        conf = min(0.99, conf + 0.1)
+    return value, conf, source
+
+def _llm_contact_fields(soup: BeautifulSoup, website_url: str, fields: list) -> dict:
+    """One structured LLM call for the fields the deterministic pass left ambiguous"""
+    page_text = page_digest(soup, max_tokens=400, focus=("contact", "about"))
+    wanted = ", ".join(fields)
+    prompt = f"""
+        Extract these contact details of the dental practice from its website content: {wanted}.
+
+        Website URL: {website_url}
+        Content: {page_text}
+
+        Instructions:
+        - practice_name: the official business name, 3-4 words maximum, title case
+        - address: the main/primary physical address (street, city, state, ZIP), no phone or email
+        - email: the main contact address (avoid personal emails)
+        - phone: the main office line
+        - Use null for anything not present; only fill in: {wanted}"""
+    out = call_claude_structured(prompt, "contact_fields") or {}
+
+    results = {}
+    name = (out.get("practice_name") or "").strip()
+    if "practice_name" in fields and 2 < len(name) < 50 and len(name.split()) <= 4:
+        results["practice_name"] = name
+    email = (out.get("email") or "").strip()
+    if "email" in fields and _valid_email(email):
+        results["email"] = email
+    phone = (out.get("phone") or "").strip()
+    if "phone" in fields and _valid_phone(phone):
+        results["phone"] = phone
+    addr = (out.get("address") or "").strip()
+    if "address" in fields and addr:
+        is_valid, validated = check_address(shorten_address(addr))
+        if is_valid:
+            results["address"] = validated
+    return results
+
 def prefill_from_website(website_url: str):
-    """LLM-only extraction with URL-based practice name guessing"""
+    """Per-field extraction cascade: deterministic sources first, one LLM call for ambiguous fields"""
     if not website_url:
         return
 
@@ -1578,24 +3274,17 @@ def prefill_from_website(website_url: str):
     # Store the last error for better messaging
     st.session_state.last_fetch_error = None
 
-    # Check if LLM is available
-    if not (HAS_CLAUDE and CLAUDE_API_KEY):
-        st.session_state.draft.update({
-            "website": website_url,
-            "email": "",
-            "phone": "",
-            "practice_name": "",
-            "address": "",
-            "maps_link": "",
-            "email_message": "LLM unavailable. Please fill email manually.",
-            "phone_message": "LLM unavailable. Please fill phone manually.",
-            "name_message": "LLM unavailable. Please fill practice name manually.",
-            "address_message": "LLM unavailable. Please fill address manually.",
-        })
-        return
+    # Fetch webpage; <head> metadata is parsed while the body is still streaming, so the
+    # schema.org/meta fields survive even when the body download then fails or times out
+    head_fields = {}
+    def _on_head(head):
+        head_fields.update(practice_fields_from_head(head))
 
-    # Fetch webpage
-    soup, load_time = fetch_html(website_url)
+    soup, load_time = fetch_html(website_url, _on_head=_on_head)
+
+    # Cache hits skip streaming, so derive the same head fields from the parsed page
+    if soup and not head_fields and soup.head:
+        head_fields.update(practice_fields_from_head(parse_head_html(str(soup.head))))
 
     if not soup:
         error_type = st.session_state.get("last_fetch_error", "unknown")
@@ -1612,74 +3301,52 @@ def prefill_from_website(website_url: str):
         }
         error_msg = error_messages.get(error_type, "Couldn't load website")
 
+        # Keep whatever the early <head> parse found before the download broke off
+        early = {
+            "practice_name": head_fields.get("practice_name", ""),
+            "address": head_fields.get("address", ""),
+            "email": head_fields.get("email", "") if _valid_email(head_fields.get("email", "")) else "",
+            "phone": head_fields.get("phone", "") if _valid_phone(head_fields.get("phone", "")) else "",
+        }
+        if any(early.values()):
+            st.sidebar.write(f"⚡ Using page metadata: {', '.join(k for k, v in early.items() if v)}")
+
         st.session_state.draft.update({
             "website": website_url,
-            "email": "",
-            "phone": "",
-            "practice_name": "",
-            "address": "",
+            **early,
             "maps_link": "",
-            "email_message": f"{error_msg}. Please fill email manually.",
-            "phone_message": f"{error_msg}. Please fill phone manually.",
-            "name_message": f"{error_msg}. Please fill practice name manually.",
-            "address_message": f"{error_msg}. Please fill address manually.",
+            "email_message": "" if early["email"] else f"{error_msg}. Please fill email manually.",
+            "phone_message": "" if early["phone"] else f"{error_msg}. Please fill phone manually.",
+            "name_message": "" if early["practice_name"] else f"{error_msg}. Please fill practice name manually.",
+            "address_message": "" if early["address"] else f"{error_msg}. Please fill address manually.",
         })
         return
 
-    # LLM-ONLY extraction approach
-    st.sidebar.write("🤖 Using AI to extract contact details...")
-
-    # Debug: Show Claude status
-    api_key_preview = f"{CLAUDE_API_KEY[:15]}..." if CLAUDE_API_KEY else "None"
-    st.sidebar.write(f"🔧 Debug: HAS_CLAUDE={HAS_CLAUDE}, API_KEY_SET={'Yes' if CLAUDE_API_KEY else 'No'} ({api_key_preview}), CLIENT_READY={'Yes' if claude_client else 'No'}")
-
-    # Test Claude API and determine extraction method
-    use_llm = False
-    if claude_client:
-        st.sidebar.write("🧪 Testing Claude API connection...")
-        test_result = call_claude_api("Say 'test'", timeout=10)
-        if test_result:
-            st.sidebar.success(f"✅ Claude API test successful: {test_result[:20]}...")
-            use_llm = True
-        else:
-            st.sidebar.error("❌ Claude API test failed - using fallback extraction")
-    else:
-        st.sidebar.warning("⚠️ Claude API not available - using fallback extraction")
-
-    # Extract data using LLM or fallback methods
-    if use_llm:
-        st.sidebar.write("🤖 Using AI extraction...")
-        # Step 1: Guess practice name from URL and validate with LLM
-        st.sidebar.write("🏥 Extracting practice name...")
-        practice_name = guess_practice_name_from_url_with_llm(website_url, soup)
-        st.sidebar.write(f"🏥 Practice name result: {practice_name or 'None'}")
-
-        # Step 2: Extract all other fields using ONLY LLM
-        st.sidebar.write("🏠 Extracting address...")
-        addr = extract_address_with_llm(soup, website_url)
-        st.sidebar.write(f"🏠 Address result: {addr or 'None'}")
-
-        st.sidebar.write("📧 Extracting email...")
-        email = extract_email_with_llm(soup, website_url)
-        st.sidebar.write(f"📧 Email result: {email or 'None'}")
-
-        st.sidebar.write("📞 Extracting phone...")
-        phone = extract_phone_with_llm(soup, website_url)
-        st.sidebar.write(f"📞 Phone result: {phone or 'None'}")
-    else:
-        st.sidebar.write("🔍 Using basic web scraping...")
-        # Fallback to basic extraction methods
-        practice_name = basic_practice_name_extraction(soup, website_url)
-        addr = basic_address_extraction(soup)
-        email = basic_email_extraction(soup)
-        phone = basic_phone_extraction(soup)
-
-        st.sidebar.write(f"🏥 Practice name: {practice_name or 'Not found'}")
-        st.sidebar.write(f"🏠 Address: {addr or 'Not found'}")
-        st.sidebar.write(f"📧 Email: {email or 'Not found'}")
-        st.sidebar.write(f"📞 Phone: {phone or 'Not found'}")
-
-    # Step 4: Set messages for missing information and success indicators
+    # Step 1: Deterministic extractors with confidence scores
+    st.sidebar.write("🔍 Extracting contact details from page markup...")
+    cands = contact_candidates(soup, website_url, head_fields)
+    picked = {}
+    for field in CONTACT_FIELDS:
+        value, conf, source = best_candidate(field, cands[field])
+        picked[field] = (value, conf)
+        if value:
+            st.sidebar.write(f"   {field}: {str(value)[:40]} ({source}, {conf:.2f})")
+
+    # Step 2: One LLM call, only for fields still below the confidence threshold
+    ambiguous = [f for f in CONTACT_FIELDS if picked[f][1] < EXTRACT_MIN_CONFIDENCE]
+    if ambiguous and HAS_CLAUDE and CLAUDE_API_KEY and claude_client:
+        st.sidebar.write(f"🤖 Asking AI for: {', '.join(ambiguous)}")
+        for field, value in _llm_contact_fields(soup, website_url, ambiguous).items():
+            picked[field] = (value, 0.8)
+    elif not ambiguous:
+        st.sidebar.write("✅ All contact fields resolved without AI")
+
+    practice_name = picked["practice_name"][0] or ""
+    addr = picked["address"][0] or ""
+    email = picked["email"][0] or ""
+    phone = picked["phone"][0] or ""
+
+    # Step 3: Set messages for missing information and success indicators
     if not email:
         email_message = "Couldn't get the email from website. Please fill it manually."
     else:
@@ -1714,33 +3381,362 @@ def prefill_from_website(website_url: str):
         "address_message": address_message,
     })
 
-@st.cache_data(show_spinner=False, ttl=3600)
-def fetch_html(url: str):
+# --- Website fetching ---
+# Streaming limits so a huge page or an endless stream can't stall the audit.
+# Override via environment when auditing unusually heavy sites.
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", 2_000_000))       # hard cap on body bytes kept in memory
+FETCH_CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", 5))  # seconds to establish the connection
+FETCH_READ_TIMEOUT = float(os.getenv("FETCH_READ_TIMEOUT", 10))       # seconds allowed between received chunks
+FETCH_TOTAL_DEADLINE = float(os.getenv("FETCH_TOTAL_DEADLINE", 15))   # wall-clock budget for the whole download
+FETCH_CHUNK_SIZE = 16 * 1024
+
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1"
+}
+
+_HEAD_END_RE = re.compile(rb"</head\s*>|<body[\s>]", re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+
+def head_encoding(r, head: bytes) -> str:
+    """
+    Charset for decoding the early <head>: an explicit header charset, else <meta charset> /
+    http-equiv from the head bytes, else UTF-8. requests' r.encoding falls back to ISO-8859-1 for
+    text/html without a charset, which turns UTF-8 names into mojibake.
+    """
+    candidates = []
+    if "charset" in r.headers.get("Content-Type", "").lower():
+        candidates.append(r.encoding)
+    m = _META_CHARSET_RE.search(head)
+    if m:
+        candidates.append(m.group(1).decode("ascii", "ignore"))
+    for name in candidates:
+        try:
+            return codecs.lookup(name).name
+        except (LookupError, TypeError):
+            continue
+    return "utf-8"
+
+def parse_head_html(head_html: str) -> dict:
+    """Pull title, meta tags and JSON-LD blocks out of a <head> fragment"""
+    head = BeautifulSoup(head_html or "", "html.parser")
+
+    title_tag = head.find("title")
+    title = title_tag.get_text(" ", strip=True) if title_tag else ""
+
+    meta = {}
+    for tag in head.find_all("meta"):
+        key = tag.get("name") or tag.get("property") or tag.get("itemprop")
+        if key and tag.get("content"):
+            meta.setdefault(key.strip().lower(), tag["content"].strip())
+
+    json_ld = json_ld_items(head)
+    return {"title": title, "meta": meta, "json_ld": json_ld}
+
+def json_ld_items(soup) -> list:
+    """All JSON-LD objects in a document or fragment, with @graph containers flattened"""
+    json_ld = []
+    for script in soup.find_all("script", attrs={"type": "application/ld+json"}):
+        try:
+            data = json.loads(script.string or "")
+        except Exception:
+            continue
+        items = data if isinstance(data, list) else [data]
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("@graph"), list):
+                json_ld.extend(x for x in item["@graph"] if isinstance(x, dict))
+            elif isinstance(item, dict):
+                json_ld.append(item)
+    return json_ld
+
+def practice_fields_from_head(head: dict) -> dict:
+    """Map head metadata (schema.org first, then og:/title) to prefill fields"""
+    fields = {}
+    if not head:
+        return fields
+
+    business_types = ("dentist", "dental", "medical", "localbusiness", "organization", "physician", "clinic")
+    for item in head.get("json_ld", []):
+        types = item.get("@type", "")
+        types = " ".join(types) if isinstance(types, list) else str(types)
+        if not any(t in types.lower() for t in business_types):
+            continue
+
+        if item.get("name") and "practice_name" not in fields:
+            fields["practice_name"] = str(item["name"]).strip()
+        if item.get("telephone") and "phone" not in fields:
+            fields["phone"] = str(item["telephone"]).strip()
+        if item.get("email") and "email" not in fields:
+            fields["email"] = str(item["email"]).replace("mailto:", "").strip()
+
+        addr = item.get("address")
+        if isinstance(addr, list) and addr:
+            addr = addr[0]
+        if isinstance(addr, dict) and "address" not in fields:
+            region_zip = " ".join(p for p in [addr.get("addressRegion"), addr.get("postalCode")] if p)
+            parts = [addr.get("streetAddress"), addr.get("addressLocality"), region_zip]
+            joined = ", ".join(str(p).strip() for p in parts if p)
+            if joined:
+                fields["address"] = joined
+        elif isinstance(addr, str) and addr.strip() and "address" not in fields:
+            fields["address"] = addr.strip()
+
+    if "practice_name" not in fields:
+        site_name = head.get("meta", {}).get("og:site_name")
+        if site_name:
+            fields["practice_name"] = site_name
+
+    return fields
+
+def stream_html(url: str, headers: dict = None, on_head=None):
+    """
+    Stream a page with separate connect/read timeouts, a byte cap and a total deadline.
+    Calls on_head(parse_head_html(...)) as soon as </head> arrives, before the body finishes.
+    Returns (response, body_bytes, elapsed, truncated).
+    """
+    t0 = time.time()
+    body = bytearray()
+    truncated = False
+    head_sent = on_head is None
+
+    r = requests.get(
+        url,
+        headers=headers or FETCH_HEADERS,
+        timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT),
+        allow_redirects=True,
+        stream=True
+    )
+    try:
+        if r.status_code != 200:
+            return r, b"", time.time() - t0, False
+
+        for chunk in r.iter_content(chunk_size=FETCH_CHUNK_SIZE):
+            if not chunk:
+                continue
+            room = FETCH_MAX_BYTES - len(body)
+            if len(chunk) >= room:
+                body.extend(chunk[:room])
+                truncated = True
+            else:
+                body.extend(chunk)
+
+            if not head_sent:
+                # Only rescan the tail so long heads stay O(n)
+                start = max(0, len(body) - len(chunk) - 16)
+                m = _HEAD_END_RE.search(body, start)
+                if m:
+                    head_sent = True
+                    try:
+                        head = bytes(body[:m.start()])
+                        on_head(parse_head_html(head.decode(head_encoding(r, head), errors="replace")))
+                    except Exception as e:
+                        st.sidebar.write(f"⚠️ Early head parse failed: {str(e)[:50]}")
+
+            if truncated or time.time() - t0 > FETCH_TOTAL_DEADLINE:
+                truncated = True
+                break
+    finally:
+        r.close()
+
+    return r, bytes(body), time.time() - t0, truncated
+
+PAGE_CACHE_TTL = 3600        # seconds a fetched page is served without revalidation
+PAGE_CACHE_MAX_SIZE = 200    # pages kept (compressed, with validators) across sessions
+PARSED_PAGE_MAX_SIZE = 8     # live BeautifulSoup trees kept for the pages in active use
+PAGE_ANALYSIS_TTL = int(os.getenv("FVA_PAGE_ANALYSIS_TTL", str(24 * 3600)))   # memoized analyzer results
+
+class PageCache:
+    """
+    Shared URL -> page store that keeps compressed raw HTML, response metadata and
+    HTTP validators. Parsed trees are rebuilt on demand and only a few are kept alive.
+    """
+    def __init__(self, max_size=PAGE_CACHE_MAX_SIZE, ttl=PAGE_CACHE_TTL, parsed_max_size=PARSED_PAGE_MAX_SIZE):
+        self.entries = {}
+        self.access_order = []
+        self.max_size = max_size
+        self.ttl = ttl
+        self.parsed = {}
+        self.parsed_order = []
+        self.parsed_max_size = parsed_max_size
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.access_order.remove(url)
+                self.access_order.append(url)
+            return entry
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry["fetched_at"] < self.ttl
+
+    def put(self, url, body: bytes, elapsed, encoding=None, etag=None, last_modified=None, meta=None):
+        entry = {
+            "html_z": zlib.compress(body, 6),
+            "raw_size": len(body),
+            "encoding": encoding,
+            "elapsed": elapsed,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": hashlib.sha256(body).hexdigest(),
+            "meta": meta or {},
+            "fetched_at": time.time(),
+            "analysis": {},  # name -> (result, stored_at), until the page body changes or PAGE_ANALYSIS_TTL
+        }
+        with self.lock:
+            if url not in self.entries and len(self.entries) >= self.max_size:
+                oldest = self.access_order.pop(0)
+                del self.entries[oldest]
+                self._drop_parsed(oldest)
+            if url in self.access_order:
+                self.access_order.remove(url)
+            self.entries[url] = entry
+            self.access_order.append(url)
+            self._drop_parsed(url)
+        return entry
+
+    def revalidated(self, url):
+        """A 304 came back: the stored body (and everything derived from it) is current again"""
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                entry["fetched_at"] = time.time()
+            return entry
+
+    def html_bytes(self, url):
+        entry = self.get(url)
+        return zlib.decompress(entry["html_z"]) if entry else None
+
+    def soup(self, url, entry=None):
+        """
+        Parsed view of a cached page, rebuilt from the compressed HTML when not already live.
+        Pass the entry from get/put/revalidated to parse it even if it was evicted meanwhile.
+        """
+        with self.lock:
+            current = self.entries.get(url)
+            if url in self.parsed and (entry is None or current is entry):
+                self.parsed_order.remove(url)
+                self.parsed_order.append(url)
+                return self.parsed[url]
+            entry = entry or current
+        if entry is None:
+            return None
+
+        soup = BeautifulSoup(zlib.decompress(entry["html_z"]), "html.parser", from_encoding=entry["encoding"])
+        with self.lock:
+            if url in self.entries and self.entries[url] is entry:
+                if url not in self.parsed and self.parsed_order and len(self.parsed) >= self.parsed_max_size:
+                    self._drop_parsed(self.parsed_order[0])
+                if url not in self.parsed:
+                    self.parsed_order.append(url)
+                self.parsed[url] = soup
+        return soup
+
+    def _drop_parsed(self, url):
+        if url in self.parsed:
+            del self.parsed[url]
+            self.parsed_order.remove(url)
+
+    def memo(self, url, name, fn):
+        """fn() memoized on the page entry; fn returns (result, ok) and only ok results are kept"""
+        entry = self.get(url)
+        if entry is None:
+            return fn()[0]
+        hit = entry["analysis"].get(name)
+        if hit is not None and time.time() - hit[1] < PAGE_ANALYSIS_TTL:
+            return hit[0]
+        result, ok = fn()
+        if ok and result is not None:
+            entry["analysis"][name] = (result, time.time())
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.access_order.clear()
+            self.parsed.clear()
+            self.parsed_order.clear()
+
+@st.cache_resource(show_spinner=False)
+def _get_page_cache():
+    return PageCache()
+
+def memo_page_analysis(url: str, name: str, fn, *args):
+    """
+    Reuse an analyzer result while the cached page is unchanged (including 304 revalidations), for
+    up to PAGE_ANALYSIS_TTL. Runs with a failed LLM call or a fallback result are not kept.
+    """
+    if not url or _LLM_BATCH.get() is not None:
+        # Bulk-mode passes see placeholder LLM answers; don't pin those to the page
+        return fn(*args)
+
+    def _run():
+        failures = []
+        token = _LLM_FAILURES.set(failures)
+        try:
+            result = fn(*args)
+        finally:
+            _LLM_FAILURES.reset(token)
+        return result, not failures and _stage_result_ok(result)
+    return _get_page_cache().memo(url, name, _run)
+
+def fetch_html(url: str, _on_head=None):
     if not url:
         return None, None
 
+    cache = _get_page_cache()
+    cached = cache.get(url)
+    if cache.is_fresh(cached):
+        return cache.soup(url, cached), cached["elapsed"]
+
     st.sidebar.write(f"🌐 Fetching website: {url[:50]}...")
 
     try:
-        # More comprehensive headers to avoid blocking
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.5",
-            "Accept-Encoding": "gzip, deflate",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1"
-        }
+        headers = dict(FETCH_HEADERS)
+        if cached:
+            # Conditional GET: an unchanged page costs one small 304 instead of a full download + parse
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
 
-        t0 = time.time()
-        r = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
-        elapsed = time.time() - t0
+        r, body, elapsed, truncated = stream_html(url, headers, on_head=_on_head)
 
         st.sidebar.write(f"📡 Website Response: {r.status_code} ({elapsed:.2f}s)")
 
+        if r.status_code == 304 and cached:
+            entry = cache.revalidated(url)
+            if entry is not None:
+                st.sidebar.write("♻️ Website unchanged since last audit (304 Not Modified)")
+                # Keep the original full-page load time; a 304 round trip says nothing about page speed
+                return cache.soup(url, entry), entry["elapsed"]
+            # The cached copy was evicted while the request was in flight: fetch the full page
+            r, body, elapsed, truncated = stream_html(url, FETCH_HEADERS, on_head=_on_head)
+
         if r.status_code == 200:
+            if truncated:
+                st.sidebar.write(f"✂️ Page capped at {len(body) // 1024} KB")
             st.sidebar.write("✅ Website fetched successfully")
-            return BeautifulSoup(r.text, "html.parser"), elapsed
+            # Only trust the header charset when it is explicit; otherwise let bs4 sniff <meta charset>
+            declared = r.encoding if "charset" in r.headers.get("Content-Type", "").lower() else None
+            entry = cache.put(
+                url, body, elapsed,
+                encoding=declared,
+                etag=r.headers.get("ETag"),
+                last_modified=r.headers.get("Last-Modified"),
+                meta={
+                    "final_url": r.url,
+                    "status": r.status_code,
+                    "content_type": r.headers.get("Content-Type", ""),
+                    "truncated": truncated,
+                }
+            )
+            return cache.soup(url, entry), elapsed
         elif r.status_code == 403:
             st.sidebar.write("⚠️ Website blocked automated access (403 Forbidden)")
             st.session_state.last_fetch_error = "blocked"
@@ -1779,6 +3775,39 @@ def get_domain(url: str):
 
 
 # --- Google Places ---
+PLACES_ENDPOINTS = {
+    "textsearch": ("https://maps.googleapis.com/maps/api/place/textsearch/json", "results"),
+    "findplace": ("https://maps.googleapis.com/maps/api/place/findplacefromtext/json", "candidates"),
+}
+
+def _places_get(endpoint: str, query: str):
+    """Single Places search request (no Streamlit calls, so it is safe from worker threads)"""
+    url, _ = PLACES_ENDPOINTS[endpoint]
+    if endpoint == "textsearch":
+        params = {"query": query, "key": PLACES_API_KEY}
+    else:
+        params = {
+            "input": query,
+            "inputtype": "textquery",
+            "fields": "place_id,name,formatted_address,website",
+            "key": PLACES_API_KEY
+        }
+    return requests.get(url, params=params, timeout=10)
+
+def _places_json(endpoint: str, query: str):
+    if not PLACES_API_KEY: return None
+    try:
+        r = _places_get(endpoint, query)
+        return r.json() if r.status_code == 200 else None
+    except Exception:
+        return None
+
+def _first_place_id(endpoint: str, js):
+    _, list_key = PLACES_ENDPOINTS[endpoint]
+    if js and js.get("status") == "OK" and js.get(list_key):
+        return js[list_key][0].get("place_id")
+    return None
+
 @st.cache_data(show_spinner=False, ttl=3600)
 def places_text_search(query: str):
     if not PLACES_API_KEY:
@@ -1786,11 +3815,9 @@ def places_text_search(query: str):
         return None
 
     st.sidebar.write(f"🔍 Making Places text search: {query[:50]}...")
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {"query": query, "key": PLACES_API_KEY}
 
     try:
-        r = requests.get(url, params=params, timeout=10)
+        r = _places_get("textsearch", query)
         st.sidebar.write(f"📡 Places API Response Status: {r.status_code}")
 
         if r.status_code == 200:
@@ -1807,14 +3834,7 @@ def places_text_search(query: str):
 @st.cache_data(show_spinner=False, ttl=3600)
 def places_find_place(text_query: str):
     if not PLACES_API_KEY: return None
-    url = "https://maps.googleapis.com/maps/api/place/findplacefromtext/json"
-    params = {
-        "input": text_query,
-        "inputtype": "textquery",
-        "fields": "place_id,name,formatted_address,website",
-        "key": PLACES_API_KEY
-    }
-    r = requests.get(url, params=params, timeout=10)
+    r = _places_get("findplace", text_query)
     return r.json() if r.status_code == 200 else None
 
 @st.cache_data(show_spinner=False, ttl=3600)
@@ -1830,25 +3850,162 @@ def places_details(place_id: str):
     r = requests.get(url, params=params, timeout=10)
     return r.json() if r.status_code == 200 else None
 
-@st.cache_data(show_spinner=False, ttl=3600)
-def find_best_place_id(clinic_name: str, address: str, website: str):
+# --- Place resolution index (persistent) ---
+PLACE_INDEX_REFRESH_AGE = 30 * 24 * 3600   # re-verify entries older than this in the background
+PLACE_INDEX_MIN_CONFIDENCE = 0.6           # domain-only matches below this are ignored
+
+_place_refresh_inflight = set()
+_place_refresh_lock = threading.Lock()
+
+def _norm_key_part(s: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (s or "").lower()).split())
+
+def place_index_key(clinic_name: str, address: str, website: str):
+    """Normalized (domain, name, address) lookup key; returns (key, domain)"""
+    domain = (get_domain(website) if website else "") or ""
+    return "|".join([domain, _norm_key_part(clinic_name), _norm_key_part(address)]), domain
+
+def _index_zip(address: str) -> str:
+    m = _ZIP_RE.search((address or "").strip())
+    return m.group(1) if m else ""
+
+def place_index_lookup(key: str, domain: str, address: str = ""):
+    store = _get_local_store()
+    rows = store.query("SELECT place_id, confidence, source, verified_at FROM place_index WHERE lookup_key = ?", (key,))
+    if not rows and domain:
+        # Same website, different spelling of the name/address. Multi-location groups share one
+        # website, so the domain only identifies the practice when it maps to a single place and
+        # the ZIP (when both sides have one) agrees.
+        candidates = store.query(
+            "SELECT place_id, confidence, source, verified_at, address FROM place_index "
+            "WHERE domain = ? AND confidence >= ? ORDER BY confidence DESC, verified_at DESC",
+            (domain, PLACE_INDEX_MIN_CONFIDENCE)
+        )
+        if len({c[0] for c in candidates}) == 1:
+            zip_new, zip_old = _index_zip(address), _index_zip(candidates[0][4])
+            if not (zip_new and zip_old and zip_new != zip_old):
+                rows = [candidates[0][:4]]
+    if not rows:
+        return None
+    place_id, confidence, source, verified_at = rows[0]
+    return {"place_id": place_id, "confidence": confidence, "source": source, "verified_at": verified_at}
+
+def place_index_put(key: str, domain: str, clinic_name: str, address: str, place_id: str, confidence: float, source: str):
+    _get_local_store().execute(
+        "INSERT OR REPLACE INTO place_index (lookup_key, domain, name, address, place_id, confidence, source, verified_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (key, domain, clinic_name or "", address or "", place_id, confidence, source, time.time())
+    )
+
+def place_query_plan(clinic_name: str, address: str, website: str):
+    """Ordered (endpoint, query, confidence) candidates; earlier entries are more specific"""
     queries = []
-    if clinic_name and address: queries.append(f"{clinic_name} {address}")
-    if clinic_name: queries.append(clinic_name)
+    if clinic_name and address: queries.append((f"{clinic_name} {address}", 0.95))
+    if clinic_name: queries.append((clinic_name, 0.8))
     if website:
         domain = get_domain(website)
-        if domain: queries.append(domain)
+        if domain: queries.append((domain, 0.7))
 
-    for q in queries:
-        js = places_text_search(q)
-        if js and js.get("status") == "OK" and js.get("results"):
-            return js["results"][0].get("place_id")
+    plan = [("textsearch", q, conf) for q, conf in queries]
+    plan += [("findplace", q, round(conf - 0.05, 2)) for q, conf in queries]
+    return plan
 
-    for q in queries:
-        js = places_find_place(q)
-        if js and js.get("status") == "OK" and js.get("candidates"):
-            return js["candidates"][0].get("place_id")
-    return None
+PLACES_FANOUT_WORKERS = 6
+PLACES_HEDGE_DELAY = float(os.getenv("FVA_PLACES_HEDGE_DELAY", "0.8"))   # seconds before the next query starts
+
+def _script_ctx_initializer():
+    """Thread-pool initializer that lets workers use st.cache_data / st.sidebar of the current run"""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    return lambda: add_script_run_ctx(threading.current_thread(), ctx)
+
+def resolve_place_id_live(plan, fetchers: dict):
+    """
+    Hedged walk down the plan; returns (place_id, confidence, source). The top query starts
+    alone and the next one only starts after a miss, or when the query being waited on has not
+    answered within PLACES_HEDGE_DELAY. Results are taken in plan order, so the earliest-priority
+    success always wins no matter which response lands first. A typical resolution costs one or
+    two billed requests.
+    """
+    if not plan:
+        return None, 0.0, None
+
+    def _run(endpoint, q):
+        return _first_place_id(endpoint, fetchers[endpoint](q))
+
+    pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(len(plan), PLACES_FANOUT_WORKERS),
+        thread_name_prefix="places-fanout",
+        initializer=_script_ctx_initializer()
+    )
+    futures = []
+
+    def _launch_next():
+        endpoint, q, _ = plan[len(futures)]
+        futures.append(pool.submit(_run, endpoint, q))
+
+    try:
+        for i, (endpoint, q, conf) in enumerate(plan):
+            if i == len(futures):
+                _launch_next()      # every earlier query missed
+            fut = futures[i]
+            while not fut.done() and len(futures) < len(plan):
+                done, _ = concurrent.futures.wait([fut], timeout=PLACES_HEDGE_DELAY)
+                if not done:
+                    _launch_next()  # slow answer: hedge with the next query
+            try:
+                place_id = fut.result()
+            except Exception:
+                place_id = None
+            if place_id:
+                return place_id, conf, f"{endpoint}:{q}"
+        return None, 0.0, None
+    finally:
+        # Hedges still on the wire finish in the background, unread
+        pool.shutdown(wait=False)
+
+def _refresh_place_in_background(key, domain, clinic_name, address, plan):
+    with _place_refresh_lock:
+        if key in _place_refresh_inflight:
+            return
+        _place_refresh_inflight.add(key)
+
+    def _worker():
+        try:
+            place_id, conf, source = resolve_place_id_live(plan, {
+                "textsearch": lambda q: _places_json("textsearch", q),
+                "findplace": lambda q: _places_json("findplace", q),
+            })
+            # A failed refresh (quota, outage) keeps the previous answer
+            if place_id:
+                place_index_put(key, domain, clinic_name, address, place_id, conf, source)
+        except Exception:
+            pass
+        finally:
+            with _place_refresh_lock:
+                _place_refresh_inflight.discard(key)
+
+    threading.Thread(target=_worker, name="place-index-refresh", daemon=True).start()
+
+def find_best_place_id(clinic_name: str, address: str, website: str):
+    key, domain = place_index_key(clinic_name, address, website)
+    plan = place_query_plan(clinic_name, address, website)
+
+    hit = place_index_lookup(key, domain, address)
+    if hit:
+        st.sidebar.write(f"📇 Place resolved from index (confidence {hit['confidence']:.2f})")
+        if time.time() - hit["verified_at"] > PLACE_INDEX_REFRESH_AGE and PLACES_API_KEY:
+            _refresh_place_in_background(key, domain, clinic_name, address, plan)
+        return hit["place_id"]
+
+    place_id, conf, source = resolve_place_id_live(plan, {
+        "textsearch": places_text_search,
+        "findplace": places_find_place,
+    })
+    if place_id:
+        place_index_put(key, domain, clinic_name, address, place_id, conf, source)
+    return place_id
 
 @st.cache_data(show_spinner=False, ttl=3600)
 def rating_and_reviews(details: dict):
@@ -1862,6 +4019,7 @@ def rating_and_reviews(details: dict):
     for rv in reviews:
         simplified.append({
             "relative_time": rv.get("relative_time_description"),
+            "time": rv.get("time"),
             "rating": rv.get("rating"),
             "author_name": rv.get("author_name"),
             "text": rv.get("text") or ""
@@ -1870,6 +4028,102 @@ def rating_and_reviews(details: dict):
     total_reviews = count if count is not None else "Search limited"
     return rating_str, total_reviews, simplified
 
+# --- Review statistics ---
+# Plain arithmetic over Places reviews (rating + unix `time`), no API calls. Everything is computed
+# over flat arrays with a group id per review, so one audit and a whole portfolio share a code path.
+REVIEW_RECENT_N = 10
+REVIEW_HALF_LIFE_DAYS = float(os.getenv("FVA_REVIEW_HALF_LIFE_DAYS", "180"))
+REVIEW_TREND_MIN = 3            # dated reviews needed before a trend is reported
+
+def review_stats_batch(review_sets, now=None, recent_n: int = REVIEW_RECENT_N,
+                       half_life_days: float = REVIEW_HALF_LIFE_DAYS) -> list:
+    """
+    Rating statistics for many review lists at once. Per list: count, average, recent average
+    (newest `recent_n`; undated reviews rank after dated ones, in input order), 1-5 star
+    distribution, exponentially time-decayed average, and trend in stars per year (least squares).
+    Values that can't be computed are None.
+    """
+    now = time.time() if now is None else float(now)
+    n_sets = len(review_sets)
+    group, ratings, times = [], [], []
+    for g, reviews in enumerate(review_sets):
+        for rv in reviews or []:
+            rating = rv.get("rating")
+            if rating is None:
+                continue
+            group.append(g)
+            ratings.append(float(rating))
+            times.append(float(rv["time"]) if rv.get("time") else np.nan)
+    group = np.asarray(group, dtype=np.int64)
+    ratings = np.asarray(ratings, dtype=float)
+    times = np.asarray(times, dtype=float)
+
+    def _sum(weights=None):
+        return np.bincount(group, weights=weights, minlength=n_sets).astype(float)
+
+    count = _sum()
+    total = _sum(ratings)
+
+    dist = np.zeros((n_sets, 5), dtype=np.int64)
+    np.add.at(dist, (group, np.clip(np.rint(ratings), 1, 5).astype(np.int64) - 1), 1)
+
+    # Recent-N: rank within group, newest first
+    dated = ~np.isnan(times)
+    order = np.lexsort((np.arange(len(group)), np.where(dated, -times, np.inf), group))
+    g_sorted = group[order]
+    rank = np.arange(len(order)) - np.searchsorted(g_sorted, g_sorted, side="left")
+    recent = np.zeros(len(group), dtype=bool)
+    recent[order[rank < recent_n]] = True
+    recent_count = _sum(recent.astype(float))
+    recent_total = _sum(np.where(recent, ratings, 0.0))
+
+    # Time decay: weight halves every half_life_days; undated reviews carry no weight
+    age_days = np.where(dated, np.maximum(now - np.nan_to_num(times), 0.0) / 86400.0, 0.0)
+    weight = np.where(dated, 0.5 ** (age_days / half_life_days), 0.0)
+    w_sum = _sum(weight)
+    wr_sum = _sum(weight * ratings)
+
+    # Trend: OLS slope of rating against age in years, dated reviews only
+    x = np.where(dated, -age_days / 365.25, 0.0)
+    m = dated.astype(float)
+    n_d, sx, sy = _sum(m), _sum(x), _sum(ratings * m)
+    sxx, sxy = _sum(x * x), _sum(x * ratings * m)
+    denom = n_d * sxx - sx * sx
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average = total / count
+        recent_avg = recent_total / recent_count
+        decayed = wr_sum / w_sum
+        slope = (n_d * sxy - sx * sy) / denom
+    slope[(n_d < REVIEW_TREND_MIN) | (denom <= 1e-12)] = np.nan
+
+    def _val(v, digits=2):
+        return None if np.isnan(v) else round(float(v), digits)
+
+    return [
+        {
+            "count": int(count[g]),
+            "average": _val(average[g]),
+            "recent_average": _val(recent_avg[g]),
+            "recent_count": int(recent_count[g]),
+            "distribution": {star: int(dist[g, star - 1]) for star in range(5, 0, -1)},
+            "decayed_average": _val(decayed[g]),
+            "trend_per_year": _val(slope[g], 3),
+            "dated_count": int(n_d[g]),
+        }
+        for g in range(n_sets)
+    ]
+
+def review_stats(reviews, now=None, **kwargs) -> dict:
+    return review_stats_batch([reviews], now=now, **kwargs)[0]
+
+def format_review_trend(stats: dict) -> str:
+    slope = stats.get("trend_per_year")
+    if slope is None:
+        return "Not enough dated reviews"
+    arrow = "▲" if slope > 0.05 else "▼" if slope < -0.05 else "▶"
+    return f"{arrow} {slope:+.2f}★/yr (time-weighted avg {stats['decayed_average']:.1f}/5)"
+
 def calculate_separate_ratings(details: dict):
     """Calculate all-time average and recent 10 ratings separately"""
     if not details or details.get("status") != "OK":
@@ -1877,20 +4131,12 @@ def calculate_separate_ratings(details: dict):
 
     res = details.get("result", {})
     all_time_rating = res.get("rating")
-    reviews = res.get("reviews", []) or []
-
-    # Calculate average of recent 10 ratings
-    recent_ratings = []
-    for rv in reviews[:10]:  # Google typically returns up to 5 recent reviews
-        rating = rv.get("rating")
-        if rating is not None:
-            recent_ratings.append(rating)
+    stats = review_stats(res.get("reviews", []) or [])
 
     all_time_str = f"{all_time_rating}/5" if all_time_rating is not None else "Search limited"
 
-    if recent_ratings:
-        recent_avg = sum(recent_ratings) / len(recent_ratings)
-        recent_str = f"{recent_avg:.1f}/5 (from {len(recent_ratings)} recent reviews)"
+    if stats["recent_average"] is not None:
+        recent_str = f"{stats['recent_average']:.1f}/5 (from {stats['recent_count']} recent reviews)"
     else:
         recent_str = "No recent reviews available"
 
@@ -1910,34 +4156,151 @@ def photos_count_from_places(details: dict):
     return len(details["result"].get("photos", []))
 
 # --- Custom Search ---
-def appears_on_page1_for_dentist_near_me(website: str, clinic_name: str, address: str):
-    if not (CSE_API_KEY and CSE_CX): return "Search limited"
-    try:
-        domain = get_domain(website) if website else None
-        city = None
-        if address and "," in address:
-            parts = [p.strip() for p in address.split(",")]
-            if len(parts) >= 2: city = parts[-2]
-        q = f"dentist near {city}" if city else f"dentist near me {clinic_name or ''}".strip()
-        r = requests.get(
-            "https://www.googleapis.com/customsearch/v1",
-            params={"key": CSE_API_KEY, "cx": CSE_CX, "q": q, "num": 10},
-            timeout=10
-        )
-        if r.status_code != 200:
-            return "Search limited"
-        data = r.json()
-        for it in data.get("items", []):
-            link = it.get("link","")
-            title = it.get("title","")
-            snippet = it.get("snippet","")
-            if domain and get_domain(link) == domain:
-                return "Yes (Page 1)"
-            if clinic_name and (clinic_name.lower() in title.lower() or clinic_name.lower() in snippet.lower()):
-                return "Yes (Page 1)"
-        return "No (Not on Page 1)"
-    except Exception:
-        return "Search limited"
+# SERP pages are identical for every practice in a city, so results are cached per
+# (query, locale, start) in the local store and shared across audits and sessions.
+SERP_CACHE_TTL = int(os.getenv("FVA_SERP_CACHE_TTL", str(24 * 3600)))
+SERP_QUERY_TEMPLATES = [
+    t.strip() for t in os.getenv(
+        "FVA_SERP_QUERIES", "dentist near {city}|emergency dentist {city}|{city} dentist"
+    ).split("|") if t.strip()
+]
+SERP_PAGES = max(1, min(int(os.getenv("FVA_SERP_PAGES", "3")), 10))   # CSE serves at most 100 results
+SERP_LOCALE = os.getenv("FVA_SERP_LOCALE", "us:en")                      # "<gl>:<hl>"
+SERP_FANOUT_WORKERS = 6
+SERP_LOCK_STRIPES = 64
+
+@st.cache_resource(show_spinner=False)
+def _get_serp_locks():
+    """Fixed striped locks so concurrent audits in one city share a single CSE call"""
+    return [threading.Lock() for _ in range(SERP_LOCK_STRIPES)]
+
+def _serp_key_lock(key):
+    # A stripe per hash bucket: bounded memory; unrelated keys rarely share one, and then only wait
+    return _get_serp_locks()[zlib.crc32(repr(key).encode()) % SERP_LOCK_STRIPES]
+
+def _normalize_query(q: str) -> str:
+    return " ".join((q or "").lower().split())
+
+def _cse_page(query: str, start: int, locale: str):
+    """One live CSE page -> list of {link, title, snippet}, or None on failure (never cached)"""
+    gl, _, hl = locale.partition(":")
+    params = {"key": CSE_API_KEY, "cx": CSE_CX, "q": query, "num": 10, "start": start}
+    if gl: params["gl"] = gl
+    if hl: params["hl"] = hl
+    r = requests.get("https://www.googleapis.com/customsearch/v1", params=params, timeout=10)
+    if r.status_code != 200:
+        return None
+    return [
+        {"link": it.get("link", ""), "title": it.get("title", ""), "snippet": it.get("snippet", "")}
+        for it in r.json().get("items", [])
+    ]
+
+def serp_results(query: str, start: int = 1, locale: str = SERP_LOCALE):
+    """Cached SERP page for (query, locale, start); None if CSE is unavailable"""
+    q = _normalize_query(query)
+    store = _get_local_store()
+    sql = "SELECT items, fetched_at FROM serp_cache WHERE query = ? AND locale = ? AND start = ?"
+
+    def _fresh():
+        rows = store.query(sql, (q, locale, start))
+        if rows and time.time() - rows[0][1] < SERP_CACHE_TTL:
+            return json.loads(rows[0][0])
+        return None
+
+    items = _fresh()
+    if items is not None:
+        return items
+    with _serp_key_lock((q, locale, start)):
+        items = _fresh()   # another audit may have filled it while we waited
+        if items is not None:
+            return items
+        items = _cse_page(q, start, locale)
+        if items is not None:
+            store.execute(
+                "INSERT OR REPLACE INTO serp_cache (query, locale, start, items, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (q, locale, start, json.dumps(items), time.time())
+            )
+        return items
+
+def _city_for_search(address: str):
+    parsed = normalize_us_address(address) if address else None
+    if parsed and parsed["city"]:
+        return parsed["city"], parsed["state"]
+    if address and "," in address:
+        parts = [p.strip() for p in address.split(",")]
+        if len(parts) >= 2: return parts[-2], ""
+    return None, ""
+
+def _serp_match(item: dict, domain, clinic_name) -> bool:
+    if domain and get_domain(item.get("link", "")) == domain:
+        return True
+    name = (clinic_name or "").lower()
+    return bool(name) and (name in item.get("title", "").lower() or name in item.get("snippet", "").lower())
+
+def search_rank(website: str, clinic_name: str, address: str):
+    """
+    Rank of the practice for each configured query across SERP pages 1..SERP_PAGES.
+    Returns {"queries": [(query, rank_or_None), ...], "best": (query, rank) or None, "depth": N},
+    or None when search data is unavailable.
+    """
+    if not (CSE_API_KEY and CSE_CX): return None
+    domain = get_domain(website) if website else None
+    city, state = _city_for_search(address)
+    if city:
+        queries = [t.format(city=city, state=state).strip() for t in SERP_QUERY_TEMPLATES]
+    else:
+        queries = [f"dentist near me {clinic_name or ''}".strip()]
+    queries = list(dict.fromkeys(queries))
+    starts = [1 + 10 * p for p in range(SERP_PAGES)]
+
+    pages = {}
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=SERP_FANOUT_WORKERS, initializer=_script_ctx_initializer()
+    ) as pool:
+        futures = {pool.submit(serp_results, q, s): (q, s) for q in queries for s in starts}
+        for fut in concurrent.futures.as_completed(futures):
+            try:
+                pages[futures[fut]] = fut.result()
+            except Exception:
+                pages[futures[fut]] = None
+
+    ranked = []
+    for q in queries:
+        rank = None; seen_any = False
+        for s in starts:
+            items = pages.get((q, s))
+            if items is None:
+                continue
+            seen_any = True
+            hit = next((i for i, it in enumerate(items) if _serp_match(it, domain, clinic_name)), None)
+            if hit is not None:
+                rank = s + hit
+                break
+        if seen_any:
+            ranked.append((q, rank))
+    if not ranked:
+        return None
+
+    found = [(q, r) for q, r in ranked if r is not None]
+    best = min(found, key=lambda x: x[1]) if found else None
+    return {"queries": ranked, "best": best, "depth": 10 * SERP_PAGES}
+
+def format_search_rank(ranks) -> str:
+    if not ranks: return "Search limited"
+    parts = [
+        f"{q}: #{r}" if r is not None else f"{q}: not in top {ranks['depth']}"
+        for q, r in ranks["queries"]
+    ]
+    head = f"Best #{ranks['best'][1]}" if ranks["best"] else f"Not in top {ranks['depth']}"
+    return f"{head} | " + " | ".join(parts)
+
+def appears_on_page1_for_dentist_near_me(website: str, clinic_name: str, address: str, ranks=None):
+    """Page-1 verdict for the primary query (first template)"""
+    if ranks is None:
+        ranks = search_rank(website, clinic_name, address)
+    if not ranks: return "Search limited"
+    _, rank = ranks["queries"][0]
+    return "Yes (Page 1)" if rank is not None and rank <= 10 else "No (Not on Page 1)"
 
 # --- Website checks & parsing ---
 def website_health(url: str, soup: BeautifulSoup, load_time: float):
@@ -1980,7 +4343,7 @@ def comprehensive_llm_analysis(_soup: BeautifulSoup, website_url: str, practice_
 
     try:
         # Prepare all data for single analysis
-        page_text = _soup.get_text(" ", strip=True)[:2500]  # Reduced limit
+        page_text = page_digest(_soup, max_tokens=450)
         links = [a.get("href") or "" for a in _soup.find_all("a", href=True)]
 
 
@@ -1988,63 +4351,20 @@ def comprehensive_llm_analysis(_soup: BeautifulSoup, website_url: str, practice_
         img_count = len(_soup.find_all("img"))
         vid_count = len(_soup.find_all(["video", "source"]))
 
-        # Review text (limit to prevent timeout)
-        review_texts = []
-        for review in (reviews or [])[:5]:  # Reduced to 5 reviews
-            text = review.get("text", "").strip()
-            if text:
-                review_texts.append(text[:200])  # Limit each review text
-
-        reviews_context = " | ".join(review_texts) if review_texts else "No reviews available"
-
         # Single comprehensive prompt
+        # Instructions live in LLM_SYSTEM_PROMPTS["site_analysis"] (system prefix)
         prompt = f"""
-        You are an expert Online Marketing professional specializing in dental practices. Analyze this dental practice website comprehensively and return a JSON response with actionable marketing insights:
-
         Practice: {practice_name or "Dental Practice"}
         Website: {website_url}
-        Content: {page_text[:800]}...
+        Content:
+{page_text}
         Visual Content: {img_count} images, {vid_count} videos
-        Sample Reviews: {reviews_context[:500]}
-
-        Return JSON with ALL sections:
-        {{
-            "reputation": {{
-                "sentiment": "Overall review sentiment summary",
-                "positive_themes": "Top positive themes (comma-separated)",
-                "negative_themes": "Top negative themes or 'None detected'",
-                "advice": "Brief reputation management advice"
-            }},
-            "marketing": {{
-                "content_quality": "Website content assessment",
-                "visual_effectiveness": "Photo/video marketing assessment",
-                "key_recommendations": "Top 3 marketing improvements",
-                "advertising_advice": "Marketing tools recommendation",
-                "visibility_insights": "• Implement local SEO with city + dentist keywords\\n• Create Google My Business posts weekly\\n• Build local directory citations"
-            }}
-        }}
-
-        CRITICAL REQUIREMENTS:
-        1. For visibility_insights: Provide exactly 3 actionable bullet points formatted as "• Point 1\\n• Point 2\\n• Point 3"
-        2. Each bullet point should be specific, actionable advice a dental practice can implement immediately
-        3. Focus on: local SEO, Google My Business, online directories, website optimization
-        4. Act as an expert marketing consultant - give professional, practical advice
-        5. Keep bullet points under 60 characters each for clear display
         """
 
-        response_text = call_claude_api(prompt)
-        if not response_text:
+        result = call_claude_structured(prompt, "site_analysis")
+        if not result:
             return None
 
-        # Parse response
-        response_text = response_text.strip()
-        if "```json" in response_text:
-            json_text = response_text.split("```json")[1].split("```")[0].strip()
-        else:
-            json_text = response_text
-
-        result = json.loads(json_text)
-
         # Store in advanced cache
         _advanced_cache.put(cache_key, result)
 
@@ -2054,59 +4374,9 @@ def comprehensive_llm_analysis(_soup: BeautifulSoup, website_url: str, practice_
         st.sidebar.write(f"⚠️ Comprehensive LLM analysis failed: {str(e)[:100]}")
         return None
 
-# Async LLM processing for improved performance
-async def async_llm_call(prompt: str, model_name: str = 'claude-3-haiku-20240307'):
-    """Async wrapper for LLM API calls"""
-    if not (HAS_CLAUDE and CLAUDE_API_KEY):
-        return None
-
-    try:
-        loop = asyncio.get_event_loop()
-
-        # Run the blocking LLM call in a thread pool
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            response = await loop.run_in_executor(executor, call_claude_api, prompt, model_name)
-            return response
-    except Exception as e:
-        st.sidebar.write(f"⚠️ Async LLM call failed: {str(e)[:100]}")
-        return None
-
-async def batch_llm_analysis(prompts_dict: dict):
-    """Process multiple LLM prompts concurrently"""
-    if not prompts_dict:
-        return {}
-
-    # Create async tasks for all prompts
-    tasks = {}
-    for key, prompt in prompts_dict.items():
-        tasks[key] = asyncio.create_task(async_llm_call(prompt))
-
-    # Wait for all tasks to complete
-    results = {}
-    for key, task in tasks.items():
-        try:
-            results[key] = await task
-        except Exception as e:
-            st.sidebar.write(f"⚠️ Batch analysis failed for {key}: {str(e)[:50]}")
-            results[key] = None
-
-    return results
-
-def run_async_llm_analysis(prompts_dict: dict):
-    """Synchronous wrapper for async batch processing"""
-    try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        return loop.run_until_complete(batch_llm_analysis(prompts_dict))
-    except Exception as e:
-        st.sidebar.write(f"⚠️ Async analysis wrapper failed: {str(e)[:100]}")
-        return {}
-    finally:
-        loop.close()
-
 # Streaming and progress support
-def stream_llm_analysis_with_progress(soup, website_url, practice_name, reviews):
-    """Streamlined LLM analysis with timeout protection"""
+def stream_llm_analysis_with_progress(soup, website_url, practice_name, reviews, on_field=None):
+    """Streamlined LLM analysis with timeout protection; on_field(path, value) sees fields as they stream in"""
     if not (HAS_CLAUDE and CLAUDE_API_KEY and soup):
         return None
 
@@ -2118,49 +4388,24 @@ def stream_llm_analysis_with_progress(soup, website_url, practice_name, reviews)
             return cached_result
 
         # Fast data preparation
-        page_text = soup.get_text(" ", strip=True)[:1500]  # Reduced from 2500
+        page_text = page_digest(soup, max_tokens=250)
 
         # Simplified prompt for faster processing
+        # Same cached instructions as comprehensive_llm_analysis
         prompt = f"""
-        Analyze this dental practice website and return JSON with marketing insights:
-
         Practice: {practice_name or "Dental Practice"}
         Website: {website_url}
-        Content: {page_text[:600]}...
-
-        Return JSON:
-        {{
-            "reputation": {{
-                "sentiment": "Review sentiment summary",
-                "positive_themes": "Top positive themes",
-                "negative_themes": "Top negative themes or 'None detected'",
-                "advice": "Brief reputation management advice"
-            }},
-            "marketing": {{
-                "content_quality": "Website content assessment",
-                "key_recommendations": "Top 3 marketing improvements",
-                "advertising_advice": "Marketing tools recommendation",
-                "visibility_insights": "• Optimize Google My Business\\n• Add location-based keywords\\n• Build online directory listings"
-            }}
-        }}
-
-        Keep it concise and actionable.
+        Content:
+{page_text}
+
+        Keep it concise.
         """
 
-        # Call API with shorter timeout
-        response_text = call_claude_api(prompt, timeout=15)  # Reduced from 30
-        if not response_text:
+        # Stream with shorter timeout; fields are parsed as they complete
+        result = call_claude_structured(prompt, "site_analysis", on_field=on_field, timeout=15)  # Reduced from 30
+        if not result:
             return None
 
-        # Fast JSON parsing
-        response_text = response_text.strip()
-        if "```json" in response_text:
-            json_text = response_text.split("```json")[1].split("```")[0].strip()
-        else:
-            json_text = response_text
-
-        result = json.loads(json_text)
-
         # Cache results
         _advanced_cache.put(cache_key, result)
         return result
@@ -2177,7 +4422,7 @@ def analyze_marketing_signals_with_llm(_soup: BeautifulSoup, website_url: str, p
 
     try:
         # Extract website content and marketing elements
-        page_text = _soup.get_text(" ", strip=True)[:3000]  # Limit context
+        page_text = page_digest(_soup, max_tokens=400, focus=("services", "contact"))
         html_content = str(_soup)[:5000]  # Limited HTML for analysis
 
         # Basic counts
@@ -2188,55 +4433,22 @@ def analyze_marketing_signals_with_llm(_soup: BeautifulSoup, website_url: str, p
         scripts = [script.get("src", "") for script in _soup.find_all("script", src=True)]
         meta_tags = [meta.get("name", "") + ":" + meta.get("content", "") for meta in _soup.find_all("meta", attrs={"name": True, "content": True})]
 
+        # Rubric lives in LLM_SYSTEM_PROMPTS["marketing_signals"] (system prefix)
         prompt = f"""
-        Analyze this dental practice website for marketing effectiveness and provide actionable insights:
-
         Practice: {practice_name or "Dental Practice"}
         Website: {website_url}
 
-        Content Overview: {page_text[:1000]}...
+        Content Overview:
+{page_text}
 
         Technical Elements:
         - Images: {img_count}
         - Videos: {vid_count}
         - Script sources: {scripts[:10]}
         - Meta tags: {meta_tags[:5]}
-
-        Analyze and return JSON with:
-        {{
-            "content_quality": "Assessment of website content effectiveness",
-            "visual_appeal": "Analysis of photos/videos and visual elements",
-            "seo_signals": "SEO optimization status and recommendations",
-            "conversion_optimization": "How easy it is for patients to book appointments from the website",
-            "patient_engagement": "How well the site engages potential patients",
-            "marketing_tools": "Detected marketing/tracking tools analysis",
-            "key_recommendations": "Top 3 actionable marketing improvements"
-        }}
-
-        Focus on dental practice marketing best practices:
-        - Patient testimonials and before/after photos
-        - Clear call-to-actions (book appointment, call now)
-        - Trust signals (certifications, awards, team photos)
-        - Local SEO optimization
-        - Mobile-friendliness
-        - Service descriptions and benefits
-        - Contact information prominence
-        - Emergency dental care messaging
         """
 
-        response_text = call_claude_api(prompt)
-        if not response_text:
-            return None
-
-        # Parse LLM response
-        response_text = response_text.strip()
-        if "```json" in response_text:
-            json_text = response_text.split("```json")[1].split("```")[0].strip()
-        else:
-            json_text = response_text
-
-        result = json.loads(json_text)
-        return result
+        return call_claude_structured(prompt, "marketing_signals")
 
     except Exception as e:
         st.sidebar.write(f"LLM marketing analysis error: {str(e)[:100]}")
@@ -2393,14 +4605,18 @@ def analyze_local_seo_signals(soup: BeautifulSoup, address: str = ""):
 
     return '; '.join(local_signals) if local_signals else "Limited local SEO"
 
+# Shown when the insight helpers return None (no Claude key, API error, empty answer). The helpers
+# never return these themselves, so canned advice is never stored as a stage result.
+MARKETING_INSIGHTS_FALLBACK = "• Optimize Google My Business with more photos\n• Add patient testimonials to build trust\n• Implement clear call-to-action buttons"
+PATIENT_INSIGHTS_FALLBACK = "• Improve online booking convenience\n• Clarify insurance acceptance\n• Optimize office hours for patients"
+
 def generate_marketing_insights(soup: BeautifulSoup, website_url: str, practice_name: str, photos_count: int, advertising_tools: str):
-    """Generate AI-powered marketing insights and recommendations"""
+    """AI marketing recommendations as bullet text, or None when Claude is unavailable or fails"""
     if not (HAS_CLAUDE and CLAUDE_API_KEY and soup):
-        return "Enable Claude AI for detailed insights"
+        return None
 
     try:
         # Gather marketing data
-        text_content = soup.get_text(" ", strip=True)[:2000]
         conversion_elements = analyze_website_conversion_elements(soup)
         content_strategy = analyze_content_marketing(soup, website_url)
         local_seo = analyze_local_seo_signals(soup)
@@ -2415,51 +4631,41 @@ def generate_marketing_insights(soup: BeautifulSoup, website_url: str, practice_
         - Website Features: {conversion_elements}
 
         Requirements:
-        - EXACTLY 3 bullet points only
+        - EXACTLY 3 recommendations only
         - Maximum 15 words per point
         - Straight to the point, no fluff
         - Focus on biggest impact improvements
-        - Format: • [action]
 
         Example:
-        • Add before/after photos to showcase results
-        • Set up online appointment booking system
-        • Create Google My Business posts weekly
+        Add before/after photos to showcase results
+        Set up online appointment booking system
+        Create Google My Business posts weekly
         """
 
-        result = call_claude_api(prompt)
-        if result and result.strip():
-            # Ensure exactly 3 lines
-            lines = [line.strip() for line in result.strip().split('\n') if line.strip()]
-            # Take first 3 lines that start with bullet points
-            bullet_lines = [line for line in lines if line.startswith('•')]
-            if len(bullet_lines) >= 3:
-                return '\n'.join(bullet_lines[:3])
-            else:
-                return result.strip()
-        else:
-            return "• Optimize Google My Business with more photos\n• Add patient testimonials to build trust\n• Implement clear call-to-action buttons"
+        out = call_claude_structured(prompt, "recommendations")
+        return _bullet_text([_clip_words(r, 15) for r in out["recommendations"]]) if out else None
 
     except Exception as e:
         st.sidebar.write(f"⚠️ Marketing insights error: {str(e)[:50]}")
-        return "• Optimize Google My Business profile\n• Add more professional photos\n• Implement online booking system"
+        return None
 
 def format_insights_to_bullets(insights_text):
     """Format marketing insights to exactly 3 concise bullet points"""
     if not insights_text:
         return "• Optimize Google My Business profile\n• Add more professional photos\n• Implement online booking system"
 
-    # Handle both string and list inputs
+    # Structured output already arrives as a list of points
     if isinstance(insights_text, list):
-        insights_text = ' '.join(str(item) for item in insights_text)
-    elif not isinstance(insights_text, str):
-        insights_text = str(insights_text)
+        sentences = [str(item).strip() for item in insights_text if str(item).strip()]
+    else:
+        if not isinstance(insights_text, str):
+            insights_text = str(insights_text)
 
-    # Remove square brackets if present
-    cleaned_text = insights_text.replace('[', '').replace(']', '').strip()
+        # Remove square brackets if present
+        cleaned_text = insights_text.replace('[', '').replace(']', '').strip()
 
-    # Split into sentences and extract key points
-    sentences = [s.strip() for s in cleaned_text.replace('.', '.\n').split('\n') if s.strip()]
+        # Split into sentences and extract key points
+        sentences = [s.strip() for s in cleaned_text.replace('.', '.\n').split('\n') if s.strip()]
 
     # Convert to bullet points
     bullet_points = []
@@ -2498,8 +4704,76 @@ def insurance_from_site(soup: BeautifulSoup):
         return m.group(0) if m else "Mentioned on site"
     return "Unclear"
 
+# Online scheduling vendors, matched against link/iframe/script URLs
+BOOKING_SYSTEMS = {
+    "zocdoc": "Zocdoc", "calendly": "Calendly", "nexhealth": "NexHealth", "localmed": "LocalMed",
+    "solutionreach": "Solutionreach", "lighthouse360": "Lighthouse 360", "flexbook": "Flex",
+    "weavehelp": "Weave", "getweave": "Weave", "squareup.com/appointments": "Square",
+    "setmore": "Setmore", "acuityscheduling": "Acuity", "opencare": "Opencare", "yapiapp": "YAPI",
+    "modento": "Modento", "carestack": "CareStack", "dentrix": "Dentrix",
+}
+INSURANCE_CARRIERS = [
+    "Delta Dental", "Aetna", "Cigna", "MetLife", "Guardian", "Humana", "UnitedHealthcare",
+    "United Concordia", "Blue Cross", "Blue Shield", "Anthem", "Ameritas", "Principal",
+    "Sun Life", "Lincoln Financial", "DentaQuest", "GEHA", "Careington", "Medicaid", "Tricare",
+]
+# Whole-word matches only ("Cigna" must not hit "Cignal"); carriers named after ordinary words
+# ("our principal dentist", "parent or guardian") only count when capitalized
+_CARRIER_COMMON_WORDS = {"Principal", "Guardian", "Anthem"}
+_CARRIER_RES = [
+    (c, re.compile(r"\b" + r"\s+".join(map(re.escape, c.split())) + r"\b",
+                   0 if c in _CARRIER_COMMON_WORDS else re.IGNORECASE))
+    for c in INSURANCE_CARRIERS
+]
+_NO_INSURANCE_RE = re.compile(
+    r"(do(?:es)? not|don't) (?:accept|take|participate (?:in|with)) (?:any )?(?:dental )?insurance|fee[- ]for[- ]service practice"
+    r"|out[- ]of[- ]network (?:with|for) all", re.IGNORECASE)
+
+def appointment_channels_deterministic(soup: BeautifulSoup):
+    """(score, channels, confidence) from booking widgets, forms and tel: links"""
+    urls = [t.get("href") or t.get("src") or "" for t in soup.find_all(["a", "iframe", "script"])]
+    joined = " ".join(urls).lower()
+    vendors = sorted({name for key, name in BOOKING_SYSTEMS.items() if key in joined})
+    has_tel = bool(_link_values(soup, "tel:"))
+    if vendors:
+        return "Phone + Advanced System", f"Online booking via {', '.join(vendors[:2])}", 0.9
+
+    booking_words = ("book", "appointment", "schedule", "request a visit")
+    has_form = any(
+        any(w in form.get_text(" ", strip=True).lower() for w in booking_words)
+        for form in soup.find_all("form")
+    )
+    booking_links = [
+        a for a in soup.find_all("a", href=True)
+        if any(w in a.get_text(" ", strip=True).lower() for w in booking_words)
+        and not a["href"].lower().startswith("tel:")
+    ]
+    if has_form:
+        return "Phone + Online Form", "Phone, online request form", 0.85
+    if booking_links:
+        # A "Book now" link may lead to a form or to a vendor page we haven't fetched
+        return "Phone + Online Form", "Phone, online booking link", 0.6
+    if has_tel:
+        return "Phone-only", "Phone call", 0.8
+    return "Phone-only", "Phone call", 0.5
+
+def insurance_deterministic(soup: BeautifulSoup):
+    """(summary, confidence) from carrier names and explicit insurance statements"""
+    text = soup.get_text(" ", strip=True)
+    if _NO_INSURANCE_RE.search(text):
+        return "Does not accept insurance", 0.85
+    lowered = text.lower()
+    carriers = [c for c, pattern in _CARRIER_RES if pattern.search(text)]
+    if carriers:
+        plan_types = [p for p in ("PPO", "HMO") if re.search(rf"\b{p}\b", text)]
+        extra = f" ({'/'.join(plan_types)})" if plan_types else ""
+        return f"Accepts insurance including {', '.join(carriers[:4])}{extra}", 0.9
+    if "insurance" not in lowered and "ppo" not in lowered:
+        return "No insurance information found", 0.8
+    return "Insurance mentioned - plans not listed", 0.5
+
 def appointment_channels_from_site(soup: BeautifulSoup, website_url: str = ""):
-    """Enhanced appointment booking analysis with LLM support (max 10 words)"""
+    """Appointment booking analysis: deterministic first, LLM only when ambiguous (max 10 words)"""
     if not soup:
         return "Search limited"
 
@@ -2508,28 +4782,24 @@ def appointment_channels_from_site(soup: BeautifulSoup, website_url: str = ""):
         words = text.split()
         return ' '.join(words[:10])
 
-    # Try LLM analysis first
-    if HAS_CLAUDE and CLAUDE_API_KEY and website_url:
-        channels, score = extract_appointment_channels_with_llm(soup, website_url)
-        if channels and score:
-            # Format the response and limit to 10 words
-            full_response = f"{score} - {channels}"
-            return limit_to_10_words(full_response)
+    score, channels, conf = appointment_channels_deterministic(soup)
+    if conf < EXTRACT_MIN_CONFIDENCE and HAS_CLAUDE and CLAUDE_API_KEY and website_url:
+        llm_channels, llm_score = extract_appointment_channels_with_llm(soup, website_url)
+        if llm_channels and llm_score:
+            score, channels = llm_score, llm_channels
 
-    # Fallback to traditional analysis (already under 10 words)
-    t = soup.get_text(" ", strip=True).lower()
-    if any(p in t for p in ["book", "appointment", "schedule", "reserve"]):
-        if "calendly" in t or "zocdoc" in t or "square appointments" in t:
-            return "Phone + Advanced System"
-        return "Phone + Online Form"
-    return "Phone-only"
+    # Format the response and limit to 10 words
+    return limit_to_10_words(f"{score} - {channels}")
 
 def enhanced_insurance_from_site(soup: BeautifulSoup, website_url: str = ""):
-    """Enhanced insurance analysis with LLM support"""
+    """Insurance analysis: carrier/statement matching first, LLM only when ambiguous"""
     if not soup:
         return "Search limited"
 
-    # Try LLM analysis first
+    summary, conf = insurance_deterministic(soup)
+    if conf >= EXTRACT_MIN_CONFIDENCE:
+        return summary
+
     if HAS_CLAUDE and CLAUDE_API_KEY and website_url:
         insurance_info = extract_insurance_info_with_llm(soup, website_url)
         if insurance_info:
@@ -2549,9 +4819,9 @@ def enhanced_insurance_from_site(soup: BeautifulSoup, website_url: str = ""):
     return "No insurance information found"
 
 def generate_patient_experience_insights(appointment_channels: str, insurance_info: str, office_hours: str):
-    """Generate AI insights for patient experience improvements"""
+    """AI patient experience recommendations as bullet text, or None when Claude is unavailable or fails"""
     if not (HAS_CLAUDE and CLAUDE_API_KEY):
-        return "• Improve online booking convenience\n• Clarify insurance acceptance\n• Optimize office hours for patients"
+        return None
 
     try:
         prompt = f"""
@@ -2562,138 +4832,45 @@ def generate_patient_experience_insights(appointment_channels: str, insurance_in
         - Insurance Information: {insurance_info}
         - Office Hours (as mentioned in Website): {office_hours}
 
-        Provide exactly 3 actionable bullet points to improve patient experience. Focus on:
+        Provide exactly 3 actionable recommendations to improve patient experience. Focus on:
         - Appointment booking convenience
-        - Insurance clarity and payment options
-        - Accessibility and communication improvements
-
-        Format as: • Point 1\n• Point 2\n• Point 3
-
-        Keep each point under 60 characters and immediately actionable.
-
-        Patient Experience Insights:"""
-
-        result = call_claude_api(prompt)
-        if not result:
-            return "• Improve online booking convenience\n• Clarify insurance acceptance\n• Optimize office hours for patients"
-
-        result = result.strip()
-
-        # Ensure proper bullet point formatting
-        if "•" in result:
-            return result
-        else:
-            # Convert to bullet points if not formatted properly
-            lines = result.split('\n')[:3]
-            bullet_points = []
-            for line in lines:
-                line = line.strip()
-                if line and len(line) > 5:
-                    if not line.startswith('•'):
-                        line = f"• {line}"
-                    bullet_points.append(line)
-
-            if bullet_points:
-                return '\n'.join(bullet_points)
-
-        return "• Improve online booking convenience\n• Clarify insurance acceptance\n• Optimize office hours for patients"
-
-    except Exception as e:
-        st.sidebar.write(f"⚠️ Patient experience insights failed: {str(e)[:50]}")
-        return "• Improve online booking convenience\n• Clarify insurance acceptance\n• Optimize office hours for patients"
-
-# --- Enhanced LLM-based reputation analysis ---
-def analyze_review_texts(reviews):
-    """Review analysis using ONLY Claude AI LLM - no fallback methods"""
-    if not reviews:
-        return "Search limited", "Search limited", "Search limited"
-
-    # Use ONLY LLM analysis - no fallbacks
-    llm_result = analyze_reviews_with_llm(reviews)
-    if llm_result:
-        sentiment = llm_result.get("sentiment", "Mostly positive feedback")
-        positive_themes = llm_result.get("positive_themes", "Professional staff, clean environment")
-        negative_themes = llm_result.get("negative_themes", "None detected")
-        return sentiment, positive_themes, negative_themes
-
-    # If LLM is not available or fails, return search limited
-    return "Search limited", "Search limited", "Search limited"
-
-def extract_ratings_with_llm(reviews, details):
-    """Extract rating information using ONLY LLM"""
-    if not (HAS_CLAUDE and CLAUDE_API_KEY and reviews):
-        return {
-            "all_time_avg": "Search limited",
-            "recent_avg": "Search limited",
-            "total_count": "Search limited"
-        }
-
-    try:
-        # Prepare review data for LLM
-        review_data = []
-        for review in reviews[:20]:  # Analyze up to 20 reviews
-            rating = review.get("rating", "")
-            text = review.get("text", "").strip()
-            time_desc = review.get("relative_time_description", "")
-            if rating and text:
-                review_data.append(f"Rating: {rating}★, Posted: {time_desc}, Review: {text[:100]}...")
-
-        if not review_data:
-            return {
-                "all_time_avg": "Search limited",
-                "recent_avg": "Search limited",
-                "total_count": "Search limited"
-            }
-
-        reviews_context = "\n\n".join(review_data)
-
-        prompt = f"""
-        Analyze these Google reviews and extract rating statistics:
-
-        {reviews_context}
+        - Insurance clarity and payment options
+        - Accessibility and communication improvements
 
-        Please return a JSON response with:
-        {{
-            "all_time_avg": "Overall average rating (e.g., '4.2 stars')",
-            "recent_avg": "Recent 10 reviews average (e.g., '4.5 stars')",
-            "total_count": "Total number of reviews analyzed (e.g., '25 reviews')"
-        }}
+        Keep each point under 60 characters and immediately actionable."""
 
-        Be concise and specific with the numbers.
-        """
+        out = call_claude_structured(prompt, "recommendations")
+        return _bullet_text(out["recommendations"]) if out else None
 
-        response_text = call_claude_api(prompt)
-        if not response_text:
-            return {
-                "all_time_avg": "Search limited",
-                "recent_avg": "Search limited",
-                "total_count": "Search limited"
-            }
-
-        # Parse LLM response
-        response_text = response_text.strip()
-        if "```json" in response_text:
-            json_text = response_text.split("```json")[1].split("```")[0].strip()
-        else:
-            json_text = response_text
+    except Exception as e:
+        st.sidebar.write(f"⚠️ Patient experience insights failed: {str(e)[:50]}")
+        return None
 
-        import json
-        result = json.loads(json_text)
-        return result
+# --- Reputation analysis ---
+# One call per review set covers sentiment, themes, insights and advice; the numbers (averages,
+# counts) come straight from Places. Results are cached by a fingerprint of the reviews and the
+# instructions, so a re-audit with no new reviews costs nothing.
+REVIEW_ANALYSIS_TTL = int(os.getenv("FVA_REVIEW_ANALYSIS_TTL", str(30 * 24 * 3600)))
 
-    except Exception as e:
-        st.sidebar.write(f"⚠️ LLM rating extraction failed: {str(e)[:50]}")
-        return {
-            "all_time_avg": "Search limited",
-            "recent_avg": "Search limited",
-            "total_count": "Search limited"
-        }
+def review_fingerprint(reviews) -> str:
+    basis = sorted(
+        (str(r.get("author_name", "")), str(r.get("time", "")), str(r.get("rating", "")), (r.get("text") or "").strip())
+        for r in (reviews or [])[:10]
+    )
+    payload = json.dumps([basis, LLM_SYSTEM_PROMPTS["review_analysis"], LLM_SCHEMAS["review_analysis"]], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
 
 def analyze_reviews_with_llm(reviews):
-    """Use Claude AI to analyze dental practice reviews"""
+    """Single reputation pass over the reviews: sentiment, themes, key insights and advice"""
     if not (HAS_CLAUDE and CLAUDE_API_KEY and reviews):
         return None
 
+    fingerprint = review_fingerprint(reviews)
+    store = _get_local_store()
+    rows = store.query("SELECT result, cached_at FROM review_analysis_cache WHERE fingerprint = ?", (fingerprint,))
+    if rows and time.time() - rows[0][1] < REVIEW_ANALYSIS_TTL:
+        return json.loads(rows[0][0])
+
     try:
         # Prepare review texts (limit for context)
         review_texts = []
@@ -2709,44 +4886,19 @@ def analyze_reviews_with_llm(reviews):
 
         reviews_context = "\n\n".join(review_texts)
 
+        # Theme list lives in LLM_SYSTEM_PROMPTS["review_analysis"] (system prefix)
         prompt = f"""
-        Analyze these Google reviews for a dental practice and provide insights:
+        Reviews:
 
         {reviews_context}
-
-        Please analyze and return a JSON response with:
-        {{
-            "sentiment": "Overall sentiment summary (1 line)",
-            "positive_themes": "Top 3 positive themes mentioned (comma-separated)",
-            "negative_themes": "Top 3 negative concerns mentioned (comma-separated, or 'None detected' if none)",
-            "key_insights": "2-3 key insights for practice improvement"
-        }}
-
-        Focus on dental practice specific themes like:
-        - Staff friendliness, professionalism
-        - Pain management, comfort
-        - Cleanliness, hygiene
-        - Wait times, scheduling
-        - Communication, explanations
-        - Billing, insurance issues
-        - Office environment
-        - Treatment quality
-
-        Keep responses concise and actionable.
         """
 
-        response_text = call_claude_api(prompt)
-        if not response_text:
-            return None
-
-        # Parse LLM response
-        response_text = response_text.strip()
-        if "```json" in response_text:
-            json_text = response_text.split("```json")[1].split("```")[0].strip()
-        else:
-            json_text = response_text
-
-        result = json.loads(json_text)
+        result = call_claude_structured(prompt, "review_analysis")
+        if result:
+            store.execute(
+                "INSERT OR REPLACE INTO review_analysis_cache (fingerprint, result, cached_at) VALUES (?, ?, ?)",
+                (fingerprint, json.dumps(result), time.time())
+            )
         return result
 
     except Exception as e:
@@ -2762,32 +4914,88 @@ def to_pct_from_score_str(s):
         pass
     return None
 
-def compute_smile_score(wh_pct, rating, reviews_total, booking, hours_present, insurance_clear, accessibility_present=False):
+# Scores are computed column-wise over a table of normalized features, one row per audit, so a
+# single report and a portfolio rescore run the same arithmetic. Missing values are NaN.
+SCORE_FEATURES = ["wh_pct", "rating", "reviews_total", "booking_pts",
+                  "hours_present", "insurance_clear", "accessibility_present"]
+
+def _booking_points(booking):
+    if booking and "Online booking" in booking: return 80.0
+    if booking and "Phone-only" in booking: return 40.0
+    return np.nan
+
+def _as_number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+def normalize_score_features(wh, rating, reviews_total, booking, hours, insurance, accessibility_present=False) -> dict:
+    """Turn report values ("87/100", "4.6/5", 312, "Search limited", ...) into one numeric feature row"""
+    wh_pct = to_pct_from_score_str(wh) if isinstance(wh, str) else wh
+    if isinstance(rating, str):
+        try:
+            rating = float(rating.split("/")[0]) if rating.endswith("/5") else None
+        except ValueError:
+            rating = None
+    if isinstance(hours, str):
+        hours = hours != "Search limited"
+    if isinstance(insurance, str):
+        insurance = insurance not in ["Search limited", "Unclear"]
+    return {
+        "wh_pct": _as_number(wh_pct),
+        "rating": _as_number(rating),
+        "reviews_total": _as_number(reviews_total),
+        "booking_pts": _booking_points(booking) if isinstance(booking, str) or booking is None else _as_number(booking),
+        "hours_present": bool(hours),
+        "insurance_clear": bool(insurance),
+        "accessibility_present": bool(accessibility_present),
+    }
+
+def _round_half_even(values, digits=1):
+    """np.round with Python round() semantics: exact-looking ties go through round() itself"""
+    out = np.round(values, digits)
+    scaled = np.abs(values) * 10 ** digits
+    tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-9
+    if tie.any():
+        out[tie] = [round(float(v), digits) for v in values[tie]]
+    return out
+
+def score_audits(features: pd.DataFrame) -> pd.DataFrame:
+    """Visibility (30), reputation (40), experience (30) and overall scores for every row of SCORE_FEATURES"""
+    f = features.reindex(columns=SCORE_FEATURES)
+    wh = f["wh_pct"].to_numpy(dtype=float)
+    rating = f["rating"].to_numpy(dtype=float)
+    reviews_total = f["reviews_total"].to_numpy(dtype=float)
+    booking = f["booking_pts"].to_numpy(dtype=float)
+    flags = f[["hours_present", "insurance_clear", "accessibility_present"]].fillna(False).to_numpy(dtype=bool)
+
     # Visibility based only on website health score
-    vis_parts = []
-    if isinstance(wh_pct, (int,float)):
-        vis_parts.append(wh_pct)
-
-    vis_avg = sum(vis_parts)/len(vis_parts) if vis_parts else 0
-    vis_score = (vis_avg/100)*30
-
-    rep_parts = []
-    if isinstance(rating, (int,float)): rep_parts.append((rating/5.0)*100)
-    if isinstance(reviews_total, (int,float)): rep_parts.append(min(1, reviews_total/500)*100)
-    rep_avg = sum(rep_parts)/len(rep_parts) if rep_parts else 0
-    rep_score = (rep_avg/100)*40
-
-    exp_parts = []
-    if booking and "Online booking" in booking: exp_parts.append(80)
-    elif booking and "Phone-only" in booking: exp_parts.append(40)
-    if hours_present: exp_parts.append(70)
-    if insurance_clear: exp_parts.append(80)
-    if accessibility_present: exp_parts.append(70)
-    exp_avg = sum(exp_parts)/len(exp_parts) if exp_parts else 0
-    exp_score = (exp_avg/100)*30
-
-    total = round(vis_score + rep_score + exp_score, 1)
-    return total, round(vis_score,1), round(rep_score,1), round(exp_score,1)
+    vis = (np.where(np.isnan(wh), 0.0, wh) / 100) * 30
+
+    has_rating, has_total = ~np.isnan(rating), ~np.isnan(reviews_total)
+    rep_sum = (np.where(has_rating, (rating / 5.0) * 100, 0.0)
+               + np.where(has_total, np.minimum(1, reviews_total / 500) * 100, 0.0))
+    rep_n = has_rating.astype(int) + has_total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rep = np.where(rep_n > 0, rep_sum / rep_n, 0.0) / 100 * 40
+
+    has_booking = ~np.isnan(booking)
+    exp_parts = np.column_stack([np.where(has_booking, booking, 0.0), flags * np.array([70.0, 80.0, 70.0])])
+    exp_n = has_booking.astype(int) + flags.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exp = np.where(exp_n > 0, exp_parts.sum(axis=1) / exp_n, 0.0) / 100 * 30
+
+    return pd.DataFrame({
+        "overall": _round_half_even(vis + rep + exp),
+        "visibility": _round_half_even(vis),
+        "reputation": _round_half_even(rep),
+        "experience": _round_half_even(exp),
+    }, index=features.index)
+
+def compute_smile_score(wh_pct, rating, reviews_total, booking, hours_present, insurance_clear, accessibility_present=False):
+    row = normalize_score_features(wh_pct, rating, reviews_total, booking, hours_present, insurance_clear,
+                                   accessibility_present)
+    scores = score_audits(pd.DataFrame([row])).iloc[0]
+    return (float(scores["overall"]), float(scores["visibility"]),
+            float(scores["reputation"]), float(scores["experience"]))
 
 # --- Advice (blank when API-limited) ---
 def advise(metric, value):
@@ -2814,6 +5022,11 @@ def advise(metric, value):
     if "search visibility" in metric.lower():
         return "You nailed it" if "yes" in s else "Improve local SEO & citations"
 
+    if "search rank" in metric.lower():
+        m = re.match(r"best #(\d+)", s)
+        if m and int(m.group(1)) <= 3: return "You nailed it"
+        return "Target service + city keywords on key pages and build local links"
+
     if "ai insights" in metric.lower():
         return "AI-generated recommendations based on website analysis"
 
@@ -2856,11 +5069,11 @@ def generate_reputation_advice_with_llm(advice_type, value):
         else:
             return None
 
-        response_text = call_claude_api(prompt)
-        if not response_text:
+        out = call_claude_structured(prompt, "advice", max_tokens=200)
+        if not out:
             return None
 
-        advice = response_text.strip()
+        advice = out["advice"].strip()
         # Clean and truncate if needed
         if len(advice) > 80:
             advice = advice[:77] + "..."
@@ -2986,11 +5199,11 @@ def generate_marketing_advice_with_llm(advice_type, value):
         else:
             return None
 
-        response_text = call_claude_api(prompt)
-        if not response_text:
+        out = call_claude_structured(prompt, "advice", max_tokens=200)
+        if not out:
             return None
 
-        advice = response_text.strip()
+        advice = out["advice"].strip()
         # Clean and truncate if needed
         if len(advice) > 80:
             advice = advice[:77] + "..."
@@ -3429,15 +5642,14 @@ def build_static_report_html(final, overview, visibility, reputation, marketing,
     """
 
 
-    # Encode logo for use in report footer
-    with open("assets/logo-big.png", "rb") as report_logo_file:
-        report_logo_base64 = base64.b64encode(report_logo_file.read()).decode()
+    # Report HTML is standalone, so the footer logo stays inline (encoded once per process)
+    report_logo_src = asset_data_uri("logo-big.png")
 
     footer = f"""
     <div class="footer">
         <div class="footer-content">
             <div class="footer-logo">
-                <img src="data:image/png;base64,{report_logo_base64}" width="40">
+                <img src="{report_logo_src}" width="40">
                 <h3>Powered by NeedleTail AI</h3>
             </div>
             <p>Experience the future of healthcare eligibility verification with AI agents that work 24/7 to automate insurance verification processes.</p>
@@ -3484,6 +5696,1141 @@ def build_static_report_html(final, overview, visibility, reputation, marketing,
     return html
 
 
+# ------------------------ Audit pipeline ------------------------
+# --- Incremental re-audit ---
+# Every expensive stage stores its last result per practice next to a fingerprint of its inputs
+# (normalized page HTML, Places details, review set, upstream stage outputs). A re-audit whose
+# inputs hash the same reuses the stored result instead of re-running the stage.
+STAGE_MAX_AGE = int(os.getenv("FVA_STAGE_MAX_AGE", str(90 * 24 * 3600)))   # refresh advice eventually
+_PLACES_VOLATILE_KEYS = {"relative_time_description", "open_now", "photos", "html_attributions",
+                         "profile_photo_url", "author_url"}
+_STAGE_STATS = contextvars.ContextVar("fva_stage_stats", default=None)
+
+def _fingerprint(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+# Per-request values that change on every fetch without the page changing: CSP nonces and
+# CSRF/anti-forgery tokens in attributes, meta/input tags and inline JS/JSON
+_PAGE_VOLATILE_RES = [
+    re.compile(r"""((?:nonce|csrf|xsrf|token)[\w-]*["']?\s*[:=]\s*["'])[^"']*""", re.IGNORECASE),
+    re.compile(r"""(<(?:meta|input)\b[^>]*(?:nonce|csrf|xsrf|token)[^>]*?\b(?:content|value)=["'])[^"']*""", re.IGNORECASE),
+    re.compile(r"""(<(?:meta|input)\b[^>]*?\b(?:content|value)=["'])[^"']*(?=["'][^>]*(?:nonce|csrf|xsrf|token))""",
+               re.IGNORECASE),
+]
+
+def page_fingerprint(soup) -> str:
+    """Hash of the whole normalized page (markup, inline scripts, meta, JSON-LD), since analyzers
+    read all of it; only whitespace, nonces and CSRF tokens are ignored"""
+    if soup is None:
+        return ""
+    html = str(soup)
+    for pattern in _PAGE_VOLATILE_RES:
+        html = pattern.sub(r"\1", html)
+    return _fingerprint(" ".join(html.split()))
+
+def places_fingerprint(details) -> str:
+    """Hash of the Places details minus fields that change without the listing changing"""
+    def _strip(x):
+        if isinstance(x, dict):
+            return {k: _strip(v) for k, v in x.items() if k not in _PLACES_VOLATILE_KEYS}
+        if isinstance(x, list):
+            return [_strip(v) for v in x]
+        return x
+    res = (details or {}).get("result") or {}
+    return _fingerprint([_strip(res), len(res.get("photos") or [])])
+
+def _stage_result_ok(result) -> bool:
+    if result is None:
+        return False
+    if isinstance(result, str):
+        low = result.lower()
+        return "search limited" not in low and "enable claude" not in low
+    return True
+
+def audit_stage(scope: str, stage: str, inputs, fn, *args):
+    """fn(*args), or its stored result when `inputs` fingerprint the same as on the last run"""
+    stats = _STAGE_STATS.get()
+    if not scope:
+        return fn(*args)
+    fingerprint = _fingerprint(inputs)
+    store = _get_local_store()
+    rows = store.query("SELECT fingerprint, result, updated_at FROM audit_stages WHERE scope = ? AND stage = ?",
+                       (scope, stage))
+    if rows and rows[0][0] == fingerprint and time.time() - rows[0][2] < STAGE_MAX_AGE:
+        if stats is not None:
+            stats["reused"].append(stage)
+        return json.loads(rows[0][1])
+
+    replay = _BATCH_REPLAY.get()
+    misses_before = replay["misses"] if replay else 0
+    result = fn(*args)
+    if stats is not None:
+        stats["recomputed"].append(stage)
+    # Bulk-mode passes with unanswered (queued or held back) requests only hold placeholders;
+    # the pass where every answer is in stores
+    if _stage_result_ok(result) and not (replay and replay["misses"] > misses_before):
+        try:
+            store.execute(
+                "INSERT OR REPLACE INTO audit_stages (scope, stage, fingerprint, result, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (scope, stage, fingerprint, json.dumps(result), time.time())
+            )
+        except (TypeError, ValueError):
+            pass   # not JSON-serializable: recomputed next time
+    return result
+
+def run_audit(final: dict) -> dict:
+    """Run every audit stage for one practice; returns the report sections, scores and reviews"""
+    stage_stats = {"reused": [], "recomputed": []}
+    audit_usage = LLMUsageTracker()
+    stats_token = _STAGE_STATS.set(stage_stats)
+    usage_token = _LLM_USAGE.set(audit_usage)
+    try:
+        return _run_audit(final, stage_stats, audit_usage)
+    finally:
+        _LLM_USAGE.reset(usage_token)
+        _STAGE_STATS.reset(stats_token)
+
+def _run_audit(final: dict, stage_stats: dict, audit_usage: LLMUsageTracker) -> dict:
+    clinic_name = final.get("practice_name")
+    address     = final.get("address")
+    phone       = final.get("phone")
+    website     = final.get("website")
+
+    # Initialize variables with fallback values
+    soup = None
+    load_time = 0
+    place_id = None
+    details = None
+    comprehensive_analysis = None
+
+    # Start timer for timeout protection
+    audit_start_time = time.time()
+    AUDIT_TIMEOUT = 60  # 60 seconds maximum
+
+    scope = (get_domain(website) if website else "") or _norm_key_part(clinic_name)
+    page_fp = None
+
+    def page_stage(name, fn, *args):
+        """Page-derived analyzer, keyed on the page fingerprint plus its other arguments"""
+        extra = [a for a in args if not isinstance(a, BeautifulSoup) and not callable(a)]
+        return audit_stage(scope, name, [page_fp, extra],
+                           lambda: memo_page_analysis(website, name, fn, *args))
+
+    try:
+        # Step 1: Fetch website HTML with timeout
+        with st.spinner("Fetching website..."):
+            soup, load_time = fetch_html(website)
+            page_fp = page_fingerprint(soup)
+
+        # Step 2: Get Google Places data with timeout
+        if time.time() - audit_start_time < AUDIT_TIMEOUT:
+            with st.spinner("Analyzing location..."):
+                place_id = find_best_place_id(clinic_name, address, website)
+                details = places_details(place_id) if place_id else None
+
+        # Step 3: Run LLM analysis with timeout
+        if time.time() - audit_start_time < AUDIT_TIMEOUT and HAS_CLAUDE and CLAUDE_API_KEY and soup:
+            with st.spinner("Running AI analysis..."):
+                live_insights = st.empty()
+                streamed_fields = {}
+
+                def _show_field(path, value):
+                    # Surface each insight as soon as its JSON field closes
+                    streamed_fields[path] = value
+                    lines = [f"- **{[k for k in p.split('.') if not k.isdigit()][-1].replace('_', ' ').title()}**: {escape(str(v))[:160]}"
+                             for p, v in streamed_fields.items()]
+                    live_insights.markdown("🧠 **AI insights so far**\n" + "\n".join(lines))
+
+                try:
+                    comprehensive_analysis = page_stage(
+                        f"comprehensive:{clinic_name}",
+                        stream_llm_analysis_with_progress, soup, website, clinic_name, [], _show_field
+                    )
+                except Exception as e:
+                    st.warning(f"AI analysis failed: {str(e)[:100]}. Continuing with basic analysis...")
+                finally:
+                    live_insights.empty()
+        elif time.time() - audit_start_time >= AUDIT_TIMEOUT:
+            st.warning("⚠️ Analysis timeout reached. Generating report with available data...")
+
+    except Exception as e:
+        st.error(f"Error during analysis: {str(e)[:100]}. Generating report with available data...")
+        # Continue with fallback values
+
+    # 1) Overview
+    overview = {
+        "Practice Name": clinic_name or "Search limited",
+        "Address": address or "Search limited",
+        "Phone": phone or "Search limited",
+        "Website": website or "Search limited",
+    }
+
+    # 2) Visibility
+    wh_str, wh_checks = website_health(website, soup, load_time)
+    ranks = search_rank(website, clinic_name, address)
+    appears = appears_on_page1_for_dentist_near_me(website, clinic_name, address, ranks=ranks)
+    search_rank_str = format_search_rank(ranks)
+
+    gbp_score = "Search limited"; gbp_signals = "Search limited"
+    if details and details.get("status") == "OK":
+            res = details["result"]; score = 0; checks = []
+            if res.get("opening_hours"): score += 20; checks.append("Hours ✅")
+            else: checks.append("Hours ❌")
+            if res.get("photos"): score += 20; checks.append(f"Photos ✅ ({len(res.get('photos',[]))})")
+            else: checks.append("Photos ❌ (0)")
+            if res.get("website"): score += 15; checks.append("Website ✅")
+            else: checks.append("Website ❌")
+            if res.get("international_phone_number"): score += 15; checks.append("Phone ✅")
+            else: checks.append("Phone ❌")
+            if res.get("rating") and res.get("user_ratings_total",0)>0: score += 10; checks.append("Reviews ✅")
+            else: checks.append("Reviews ❌")
+            if "dentist" in res.get("types", []) or "dental_clinic" in res.get("types", []):
+                score += 10; checks.append("Category ✅")
+            else:
+                checks.append("Category ❌")
+            if res.get("formatted_address"): score += 10; checks.append("Address ✅")
+            else:
+                checks.append("Address ❌")
+            gbp_score = f"{min(score,100)}/100"
+            gbp_signals = " | ".join(checks)
+
+    # Get AI insights for online visibility
+    visibility_ai_insights = ""
+    if comprehensive_analysis and comprehensive_analysis.get("marketing", {}).get("visibility_insights"):
+        insights = comprehensive_analysis["marketing"]["visibility_insights"]
+        # Format as bullet points for dataframe display
+        if isinstance(insights, list):
+            visibility_ai_insights = _bullet_text(insights)
+        elif isinstance(insights, str):
+                # Clean up the insights string and ensure proper bullet point formatting
+                insights = insights.strip()
+
+                # If insights already contain bullet points, use them directly
+                if "•" in insights and "\\n" in insights:
+                    # Replace escaped newlines with actual newlines
+                    visibility_ai_insights = insights.replace("\\n", "\n")
+                elif "•" in insights:
+                    # Split by bullet points and rejoin with newlines
+                    bullet_parts = insights.split("•")
+                    bullet_points = []
+                    for part in bullet_parts:
+                        part = part.strip()
+                        if part and len(part) > 5:
+                            bullet_points.append(f"• {part}")
+                    visibility_ai_insights = "\n".join(bullet_points[:3])
+                else:
+                    # Split by common delimiters and format as bullets
+                    bullet_points = []
+                    if "-" in insights:
+                        lines = insights.split("-")
+                    elif "." in insights:
+                        lines = insights.split(".")
+                    else:
+                        lines = [insights]
+
+                    for line in lines:
+                        line = line.strip()
+                        if line and len(line) > 5:  # Skip very short fragments
+                            bullet_points.append(f"• {line}")
+
+                    visibility_ai_insights = "\n".join(bullet_points[:3])  # Limit to 3 points
+
+                # Fallback to default insights if nothing was extracted
+                if not visibility_ai_insights.strip():
+                    visibility_ai_insights = "• Optimize Google My Business profile\n• Build local SEO citations\n• Improve website mobile experience"
+
+    visibility = {
+        "Google Business Profile Completeness (estimate)": gbp_score,
+        "Google Business Profile Signals": gbp_signals,
+        "Search Visibility (Page 1?)": appears,
+        "Search Rank (Top Queries)": search_rank_str,
+        "Website Health Score": wh_str,
+        "Website Health Checks": wh_checks,
+        "AI Insights": visibility_ai_insights if visibility_ai_insights else "• Optimize Google My Business profile\n• Build local SEO citations\n• Improve website mobile experience"
+    }
+
+    # 3) Reputation
+    rating_str, review_count_out, reviews = rating_and_reviews(details)
+    # Numbers come from Places; the text fields from one cached review-analysis call
+    all_time_rating, recent_rating = calculate_separate_ratings(details)
+    review_analysis = analyze_reviews_with_llm(reviews) if reviews else None
+    if review_analysis:
+        sentiment_summary = review_analysis.get("sentiment", "Search limited")
+        top_pos_str = review_analysis.get("positive_themes", "Search limited")
+        top_neg_str = review_analysis.get("negative_themes", "None detected")
+        key_insights = review_analysis.get("advice") or review_analysis.get("key_insights", "")
+    else:
+        sentiment_summary, top_pos_str, top_neg_str = "Search limited", "Search limited", "Search limited"
+        key_insights = "Search limited"
+
+    reputation = {
+        "Google Reviews (All-time Avg)": all_time_rating,
+        "Google Reviews (Recent 10 Avg)": recent_rating,
+        "Total Google Reviews": review_count_out,
+        "Sentiment Highlights": sentiment_summary,
+        "Top Positive Themes": top_pos_str,
+        "Top Negative Themes": top_neg_str,
+    }
+    if reviews:
+        reputation["Rating Trend"] = format_review_trend(review_stats(reviews))
+
+    # Add key insights if available
+    if key_insights:
+        reputation["AI Insights"] = key_insights
+
+    # 4) Marketing - Enhanced comprehensive analysis
+    # Get comprehensive LLM marketing analysis from cached result
+    marketing_insights = ""
+    if comprehensive_analysis and comprehensive_analysis.get("marketing"):
+        marketing_data = comprehensive_analysis["marketing"]
+        marketing_insights = marketing_data.get("key_recommendations", "") or marketing_data.get("advertising_advice", "")
+
+    # Enhanced marketing analysis
+    # Page-derived analyzers are memoized on the cached page, so a 304 revalidation reuses them
+    photos_on_website = page_stage("media_count", media_count_from_site, soup) if soup else "Search limited"
+    photos_in_google = photos_count_from_places(details) if details else "Search limited"
+    advertising_tools = page_stage("advertising", advertising_signals, soup) if soup else "Search limited"
+
+    # New comprehensive marketing metrics
+    conversion_analysis = page_stage("conversion", analyze_website_conversion_elements, soup) if soup else "Search limited"
+    content_strategy = page_stage("content", analyze_content_marketing, soup, website) if soup else "Search limited"
+    local_seo_status = page_stage(
+        f"local_seo:{final.get('address', '')}", analyze_local_seo_signals, soup, final.get('address', '')
+    ) if soup else "Search limited"
+
+    # Generate AI-powered marketing insights
+    photos_in_google_n = photos_in_google if isinstance(photos_in_google, int) else 0
+    ai_insights = page_stage(
+        f"marketing_insights:{final.get('practice_name', '')}:{photos_in_google_n}:{advertising_tools}",
+        generate_marketing_insights, soup, website, final.get('practice_name', ''), photos_in_google_n, advertising_tools
+    ) if soup else None
+    if ai_insights is None:
+        ai_insights = (MARKETING_INSIGHTS_FALLBACK if HAS_CLAUDE and CLAUDE_API_KEY and soup
+                       else "Enable Claude AI for detailed marketing insights")
+
+    marketing = {
+        "Website Content Strategy": content_strategy,
+        "Conversion Optimization": conversion_analysis,
+        "Local SEO Signals": local_seo_status,
+        "Photos/Videos on Website": photos_on_website,
+        "Google My Business Photos": photos_in_google,
+        "Marketing & Analytics Tools": advertising_tools,
+        "AI Marketing Strategy Insights": ai_insights
+    }
+
+    # Add legacy LLM insights if available (fallback) - formatted as concise bullet points
+    if marketing_insights and not ai_insights.startswith("Enable Claude"):
+        # Process marketing_insights to ensure it's short and crisp (max 3 bullet points)
+        formatted_insights = format_insights_to_bullets(marketing_insights)
+        marketing["Additional Insights"] = formatted_insights
+
+    # 5) Experience - Enhanced with LLM analysis
+    appointment_channels = page_stage("appointment_channels", appointment_channels_from_site, soup, website) if soup else "Search limited"
+    hours = office_hours_from_places(details)
+    insurance_info = page_stage("insurance", enhanced_insurance_from_site, soup, website) if soup else "Search limited"
+
+    # Generate AI insights for patient experience (inputs are the upstream stage outputs)
+    patient_insights = audit_stage(scope, "patient_insights", [appointment_channels, insurance_info, hours],
+                                   generate_patient_experience_insights, appointment_channels, insurance_info, hours) \
+        or PATIENT_INSIGHTS_FALLBACK
+
+    experience = {
+        "Appointment Options Available": appointment_channels,
+        "Office Hours (as mentioned in Website)": hours,
+        "Insurance Acceptance": insurance_info,
+        "AI Insights": patient_insights,
+    }
+
+    # ------------------------ Scoring ------------------------
+    features = normalize_score_features(wh_str, rating_str, review_count_out, appointment_channels,
+                                        hours, insurance_info, accessibility_present=False)
+    scores = {k: float(v) for k, v in score_audits(pd.DataFrame([features])).iloc[0].items()}
+
+    parsed_address = normalize_us_address(address or "") or {}
+    overview["Peer Benchmark"] = format_benchmark(
+        benchmark_percentiles(parsed_address.get("state"), parsed_address.get("city"), scores)
+    )
+
+    if stage_stats["reused"]:
+        total_stages = len(stage_stats["reused"]) + len(stage_stats["recomputed"])
+        st.sidebar.write(f"♻️ Re-audit: reused {len(stage_stats['reused'])}/{total_stages} stages with unchanged inputs")
+
+    usage = audit_usage.summary()
+    if usage["calls"]:
+        cached = (f", cache {usage['cache_read_input_tokens']} read / {usage['cache_creation_input_tokens']} written"
+                  if usage["cache_read_input_tokens"] or usage["cache_creation_input_tokens"] else "")
+        st.sidebar.write(f"🧠 LLM usage this audit: {usage['calls']} calls, {usage['input_tokens']} in / "
+                         f"{usage['output_tokens']} out tokens{cached}")
+
+    return {
+        "overview": overview,
+        "visibility": visibility,
+        "reputation": reputation,
+        "marketing": marketing,
+        "experience": experience,
+        "scores": scores,
+        "features": features,
+        "reviews": reviews,
+        "review_stats": review_stats(reviews),
+        "search_ranks": ranks,
+        "place_id": place_id,
+        "timings": {"total_s": round(time.time() - audit_start_time, 3), "page_load_s": load_time},
+        "fingerprints": {"page": page_fp or "", "places": places_fingerprint(details) if details else "",
+                         "reviews": review_fingerprint(reviews) if reviews else ""},
+        "stages": stage_stats,
+    }
+
+# ------------------------ Audit store ------------------------
+# Completed audits are appended to a Parquet dataset, hive-partitioned by month and state
+# (data/audits/audit_month=2026-10/state=TX/<uuid>.parquet). Numeric metrics are flat typed columns
+# so filters push down to row-group statistics; the display strings of each report section are kept
+# as map<string,string> columns, which keeps the schema fixed as tiles come and go. Interactive
+# audits arrive one at a time, so once a partition holds AUDIT_COMPACT_FILES files they are merged
+# into one, sorted by time. The Streamlit server, --bulk and --monitor are separate processes, so a
+# compaction holds an OS lock on the partition's .compact.lock and is skipped while another holds it.
+AUDIT_STORE_DIR = os.getenv("FVA_AUDIT_STORE", os.path.join(DATA_DIR, "audits"))
+AUDIT_PARTITION_COLS = ["audit_month", "state"]
+AUDIT_COMPACT_FILES = int(os.getenv("FVA_AUDIT_COMPACT_FILES", "32"))
+_audit_compact_lock = threading.Lock()
+AUDIT_SECTIONS = ["overview", "visibility", "reputation", "marketing", "experience"]
+
+if HAS_PYARROW:
+    _STR_MAP = pa.map_(pa.string(), pa.string())
+    AUDIT_SCHEMA = pa.schema([
+        ("audit_id", pa.string()),
+        ("audited_at", pa.timestamp("ms", tz="UTC")),
+        ("practice_name", pa.string()),
+        ("website", pa.string()),
+        ("domain", pa.string()),
+        ("address", pa.string()),
+        ("phone", pa.string()),
+        ("email", pa.string()),
+        ("doctor_name", pa.string()),
+        ("city", pa.string()),
+        ("zip", pa.string()),
+        ("place_id", pa.string()),
+        ("score_overall", pa.float64()),
+        ("score_visibility", pa.float64()),
+        ("score_reputation", pa.float64()),
+        ("score_experience", pa.float64()),
+        ("wh_pct", pa.float64()),
+        ("rating", pa.float64()),
+        ("reviews_total", pa.float64()),
+        ("booking_pts", pa.float64()),
+        ("hours_present", pa.bool_()),
+        ("insurance_clear", pa.bool_()),
+        ("accessibility_present", pa.bool_()),
+        ("review_count", pa.int32()),
+        ("recent_average", pa.float64()),
+        ("decayed_average", pa.float64()),
+        ("trend_per_year", pa.float64()),
+        ("search_best_rank", pa.int32()),
+        ("search_best_query", pa.string()),
+        ("page_load_s", pa.float64()),
+        ("duration_s", pa.float64()),
+    ] + [(section, _STR_MAP) for section in AUDIT_SECTIONS] + [
+        ("audit_month", pa.string()),
+        ("state", pa.string()),
+    ])
+
+def audit_record(final: dict, audit: dict, audited_at=None) -> dict:
+    """Flatten one run_audit() result into an AUDIT_SCHEMA row"""
+    audited_at = audited_at or datetime.now(ZoneInfo("UTC"))
+    parsed = normalize_us_address(final.get("address") or "") or {}
+    features, stats = audit.get("features") or {}, audit.get("review_stats") or {}
+    best = (audit.get("search_ranks") or {}).get("best")
+    timings = audit.get("timings") or {}
+
+    def _num(v):
+        return None if v is None or (isinstance(v, float) and np.isnan(v)) else float(v)
+
+    row = {
+        "audit_id": uuid.uuid4().hex,
+        "audited_at": audited_at,
+        "practice_name": final.get("practice_name") or None,
+        "website": final.get("website") or None,
+        "domain": get_domain(final["website"]) if final.get("website") else None,
+        "address": final.get("address") or None,
+        "phone": final.get("phone") or None,
+        "email": final.get("email") or None,
+        "doctor_name": final.get("doctor_name") or None,
+        "city": parsed.get("city") or None,
+        "zip": parsed.get("zip") or None,
+        "place_id": audit.get("place_id"),
+        "review_count": stats.get("count"),
+        "recent_average": stats.get("recent_average"),
+        "decayed_average": stats.get("decayed_average"),
+        "trend_per_year": stats.get("trend_per_year"),
+        "search_best_rank": best[1] if best else None,
+        "search_best_query": best[0] if best else None,
+        "page_load_s": _num(timings.get("page_load_s")),
+        "duration_s": _num(timings.get("total_s")),
+        "audit_month": audited_at.strftime("%Y-%m"),
+        "state": parsed.get("state") or "unknown",
+    }
+    row.update({f"score_{k}": _num(audit["scores"].get(k)) for k in ("overall", "visibility", "reputation", "experience")})
+    row.update({k: (_num(features.get(k)) if k not in ("hours_present", "insurance_clear", "accessibility_present")
+                    else bool(features.get(k))) for k in SCORE_FEATURES})
+    for section in AUDIT_SECTIONS:
+        row[section] = [(str(k), "" if v is None else str(v)) for k, v in (audit.get(section) or {}).items()]
+    return row
+
+def store_audits(records: list, root: str = None) -> int:
+    """Append audit_record() rows to the dataset; each call writes new files and never rewrites old ones"""
+    if not (HAS_PYARROW and records):
+        return 0
+    root = root or AUDIT_STORE_DIR
+    table = pa.Table.from_pylist(records, schema=AUDIT_SCHEMA)
+    pq.write_to_dataset(table, root_path=root, partition_cols=AUDIT_PARTITION_COLS,
+                        basename_template=f"{uuid.uuid4().hex}-{{i}}.parquet")
+    for month, state in {(r["audit_month"], r["state"]) for r in records}:
+        path = os.path.join(root, f"audit_month={month}", f"state={state}")
+        if os.path.isdir(path) and sum(f.endswith(".parquet") for f in os.listdir(path)) >= AUDIT_COMPACT_FILES:
+            try:
+                compact_audit_partition(path)
+            except OSError as e:
+                # The audits are already stored; compaction is retried on a later write
+                st.sidebar.write(f"⚠️ Audit store compaction skipped: {str(e)[:60]}")
+    return table.num_rows
+
+def _try_lock_file(fh) -> bool:
+    """Non-blocking exclusive OS lock on an open file; released when the file is closed"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def compact_audit_partition(path: str) -> int:
+    """Merge a partition directory's files into one; returns how many files were merged"""
+    # Dot-prefixed names (the lock, temp files) are invisible to dataset discovery
+    with _audit_compact_lock, open(os.path.join(path, ".compact.lock"), "a+b") as lock:
+        if not _try_lock_file(lock):
+            return 0    # another process is compacting this partition
+        tables, merged_files = [], []
+        for f in sorted(f for f in os.listdir(path) if f.endswith(".parquet")):
+            try:
+                tables.append(pq.read_table(os.path.join(path, f)))
+            except FileNotFoundError:
+                continue
+            merged_files.append(f)
+        if len(merged_files) < 2:
+            return 0
+        tmp = os.path.join(path, f".compact-{uuid.uuid4().hex}.tmp")
+        pq.write_table(pa.concat_tables(tables).sort_by("audited_at"), tmp)
+        os.replace(tmp, os.path.join(path, f"compacted-{uuid.uuid4().hex}.parquet"))
+        for f in merged_files:
+            try:
+                os.remove(os.path.join(path, f))
+            except FileNotFoundError:
+                pass
+        return len(merged_files)
+
+def compact_audit_store(root: str = None) -> int:
+    """Compact every partition (e.g. after a bulk import); returns the number of files merged"""
+    root = root or AUDIT_STORE_DIR
+    merged = 0
+    for dirpath, _, filenames in os.walk(root):
+        if sum(f.endswith(".parquet") for f in filenames) > 1:
+            merged += compact_audit_partition(dirpath)
+    return merged
+
+def query_audits(filters=None, columns=None, root: str = None) -> pd.DataFrame:
+    """
+    Read audits back with partition pruning and predicate pushdown, e.g.
+    query_audits([("state", "=", "TX"), ("score_overall", "<", 50)], columns=["website", "score_overall"]).
+    `filters` takes the pyarrow DNF tuple form or a pyarrow.compute expression.
+    """
+    root = root or AUDIT_STORE_DIR
+    if not (HAS_PYARROW and os.path.isdir(root)):
+        return pd.DataFrame(columns=columns or [])
+    for attempt in range(3):
+        try:
+            table = pq.read_table(root, columns=columns, filters=filters, schema=AUDIT_SCHEMA, partitioning="hive")
+            return table.to_pandas()
+        except FileNotFoundError:
+            # A concurrent compaction removed files after discovery listed them; list again
+            if attempt == 2:
+                raise
+            time.sleep(0.05)
+
+# --- Audit diff ---
+# Two runs are compared metric by metric after flattening every section into long rows
+# (key, section, metric, value). Works on run_audit() results and on audit-store rows alike, and
+# on whole frames at once: thousands of practice pairs are one merge plus vectorized parsing.
+# Search ranks are diffed from the structured search_ranks (best and per query), not from the
+# formatted "Search Rank (Top Queries)" tile.
+DIFF_SECTIONS = ["visibility", "search", "reputation", "marketing", "experience", "scores"]
+DIFF_LOWER_IS_BETTER_SECTIONS = {"search"}
+DIFF_CATEGORICAL_MAX_LEN = 40     # longer strings are free text (AI insights, check lists)
+_DIFF_NUMBER_RE = r"^\s*(-?\d+(?:\.\d+)?)(?:\s*/\s*\d+)?(?:\s|$|\()"
+
+def _search_items(ranks) -> list:
+    """[(metric, rank or "Not in top N")] from a search_rank() result"""
+    if not isinstance(ranks, dict):
+        return []
+    miss = f"Not in top {ranks.get('depth') or 10 * SERP_PAGES}"
+    best = ranks.get("best")
+    items = [("Best rank", best[1] if best else miss)]
+    items += [(f"Rank for \"{q}\"", r if r is not None else miss) for q, r in ranks.get("queries") or []]
+    return items
+
+def _audit_long(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    parts = []
+    structured_search = "search_ranks" in df.columns or "search_best_rank" in df.columns
+    for section in DIFF_SECTIONS:
+        if section == "search":
+            if "search_ranks" in df.columns:
+                items = df["search_ranks"].map(_search_items)
+            elif "search_best_rank" in df.columns:
+                # Audit-store rows only keep the best rank (null when unavailable or not found)
+                items = df["search_best_rank"].map(lambda r: [("Best rank", r)] if pd.notna(r) else [])
+            else:
+                continue
+            exploded = pd.DataFrame({"key": df[key].to_numpy(), "item": items.to_numpy()}).explode("item").dropna(subset=["item"])
+            if not exploded.empty:
+                pairs = pd.DataFrame(exploded["item"].tolist(), columns=["metric", "value"], index=exploded.index)
+                parts.append(pd.DataFrame({"key": exploded["key"], "section": section,
+                                           "metric": pairs["metric"].astype(str), "value": pairs["value"]}))
+            continue
+        if section == "scores" and section not in df.columns and "score_overall" in df.columns:
+            # Audit-store rows carry the scores as typed columns
+            melted = df[[key] + [f"score_{m}" for m in BENCHMARK_METRICS]].melt(id_vars=key, var_name="metric")
+            parts.append(pd.DataFrame({"key": melted[key], "section": section,
+                                       "metric": melted["metric"].str[len("score_"):], "value": melted["value"]}))
+            continue
+        if section not in df.columns:
+            continue
+        items = df[section].map(lambda v: list(v.items()) if isinstance(v, dict) else list(v) if v is not None else [])
+        exploded = pd.DataFrame({"key": df[key].to_numpy(), "item": items.to_numpy()}).explode("item").dropna(subset=["item"])
+        if exploded.empty:
+            continue
+        pairs = pd.DataFrame(exploded["item"].tolist(), columns=["metric", "value"], index=exploded.index)
+        if section == "visibility" and structured_search:
+            keep = pairs["metric"].astype(str) != "Search Rank (Top Queries)"
+            exploded, pairs = exploded[keep], pairs[keep]
+        parts.append(pd.DataFrame({"key": exploded["key"], "section": section,
+                                   "metric": pairs["metric"].astype(str), "value": pairs["value"]}))
+    if not parts:
+        return pd.DataFrame(columns=["key", "section", "metric", "value"])
+    return pd.concat(parts, ignore_index=True)
+
+def _diff_numbers(values: pd.Series) -> pd.Series:
+    as_num = pd.to_numeric(values, errors="coerce")
+    parsed = pd.to_numeric(values.astype(str).str.extract(_DIFF_NUMBER_RE, expand=False), errors="coerce")
+    return as_num.fillna(parsed)
+
+def diff_audit_frames(old: pd.DataFrame, new: pd.DataFrame, key: str = "domain") -> pd.DataFrame:
+    """
+    Changed metrics for every practice present in `old` and/or `new` (matched on `key`).
+    Columns: key, section, metric, kind (numeric/categorical/text/added/removed), old, new, delta, direction.
+    """
+    merged = _audit_long(old, key).merge(_audit_long(new, key), on=["key", "section", "metric"],
+                                         how="outer", suffixes=("_old", "_new"))
+    old_v, new_v = merged["value_old"], merged["value_new"]
+    old_n, new_n = _diff_numbers(old_v), _diff_numbers(new_v)
+    old_s, new_s = old_v.astype(str), new_v.astype(str)
+
+    numeric = old_n.notna() & new_n.notna()
+    missing_old, missing_new = old_v.isna(), new_v.isna()
+    # A value that stops (or starts) being a number, e.g. "#3" -> "Not in top 20", is a move of its
+    # own: categorical, never free text, and lost numbers count as a regression
+    lost_number = old_n.notna() & new_n.isna() & ~missing_new
+    gained_number = old_n.isna() & new_n.notna() & ~missing_old
+    changed = np.where(numeric, (new_n - old_n).abs() > 1e-9, old_s != new_s) | (missing_old != missing_new)
+    long_text = ((old_s.str.len() > DIFF_CATEGORICAL_MAX_LEN) | (new_s.str.len() > DIFF_CATEGORICAL_MAX_LEN)) \
+        & ~lost_number & ~gained_number
+
+    kind = np.select([missing_old, missing_new, numeric, long_text],
+                     ["added", "removed", "numeric", "text"], default="categorical")
+    delta = (new_n - old_n).where(numeric)
+    sign = np.sign(delta) * np.where(merged["section"].isin(DIFF_LOWER_IS_BETTER_SECTIONS), -1, 1)
+    direction = np.select([sign > 0, sign < 0, lost_number, gained_number], ["better", "worse", "worse", "better"],
+                          default="")
+
+    out = pd.DataFrame({
+        "key": merged["key"], "section": merged["section"], "metric": merged["metric"], "kind": kind,
+        "old": old_v, "new": new_v, "delta": delta, "direction": direction,
+    })[changed]
+    order = {s: i for i, s in enumerate(DIFF_SECTIONS)}
+    return out.sort_values(["key", "section", "metric"], key=lambda c: c.map(order) if c.name == "section" else c,
+                           kind="stable").reset_index(drop=True)
+
+def diff_audits(old_audit: dict, new_audit: dict) -> pd.DataFrame:
+    """Diff two run_audit() results for the same practice"""
+    def _frame(audit):
+        sections = {s: audit.get(s) or {} for s in DIFF_SECTIONS if s != "search"}
+        return pd.DataFrame([{"key": "practice", **sections, "search_ranks": audit.get("search_ranks")}])
+    return diff_audit_frames(_frame(old_audit), _frame(new_audit), key="key")
+
+def format_audit_diff(diff: pd.DataFrame, include_text: bool = False) -> str:
+    """Compact change report: numeric and categorical moves first, free-text changes counted"""
+    if diff.empty:
+        return "No changes"
+    lines = []
+    for key, group in diff.groupby("key", sort=False):
+        if diff["key"].nunique() > 1:
+            lines.append(f"## {key}")
+        text_changes = 0
+        for r in group.itertuples(index=False):
+            if r.kind == "text" and not include_text:
+                text_changes += 1
+                continue
+            label = f"{r.section.title()} › {r.metric}"
+            if r.kind == "numeric":
+                arrow = {"better": "▲", "worse": "▼"}.get(r.direction, "•")
+                lines.append(f"{arrow} {label}: {r.old} → {r.new} ({r.delta:+g})")
+            elif r.kind == "added":
+                lines.append(f"+ {label}: {r.new}")
+            elif r.kind == "removed":
+                lines.append(f"- {label} (was {r.old})")
+            else:
+                arrow = {"better": "▲", "worse": "▼"}.get(r.direction, "•")
+                lines.append(f"{arrow} {label}: {r.old} → {r.new}")
+        if text_changes:
+            lines.append(f"  ({text_changes} narrative field{'s' if text_changes > 1 else ''} reworded)")
+    return "\n".join(lines)
+
+# --- Peer benchmarks ---
+# Each cohort (national, state, city) keeps a histogram of every score with one bin per 0.1 point,
+# the resolution scores are rounded to, so percentiles read from it are exact. Histograms live in
+# sqlite and count practices, not audits: benchmark_members remembers each practice's cohorts and
+# bins, and a re-audit moves its one sample instead of adding another. Practices are identified by
+# place_id, then domain, then name, so a re-worded or changed address still moves the same sample.
+# A lookup reads at most 3 cohorts x 4 rows.
+BENCHMARK_METRICS = {"overall": 100, "visibility": 30, "reputation": 40, "experience": 30}
+BENCHMARK_BINS = 1001           # 0.0 .. 100.0 in 0.1 steps
+BENCHMARK_MIN_PEERS = int(os.getenv("FVA_BENCHMARK_MIN_PEERS", "5"))
+
+@st.cache_resource(show_spinner=False)
+def _get_benchmark_lock():
+    return threading.Lock()
+
+def benchmark_cohorts(state, city) -> list:
+    """[(label, cohort_key)] from narrowest to broadest"""
+    cohorts = []
+    state = state.upper() if isinstance(state, str) else ""
+    city = city if isinstance(city, str) else ""
+    if state and state != "UNKNOWN":
+        if city:
+            cohorts.append((f"{city}, {state}", f"city:{state}:{city.lower()}"))
+        cohorts.append((state, f"state:{state}"))
+    cohorts.append(("US", "us"))
+    return cohorts
+
+def _score_bins(values) -> np.ndarray:
+    return np.clip(np.rint(np.asarray(values, dtype=float) * 10), 0, BENCHMARK_BINS - 1).astype(np.int64)
+
+def _sketch_rows(cohorts: list) -> dict:
+    if not cohorts:
+        return {}
+    marks = ",".join("?" * len(cohorts))
+    rows = _get_local_store().query(f"SELECT cohort, metric, counts FROM score_sketch WHERE cohort IN ({marks})", tuple(cohorts))
+    return {(c, m): np.frombuffer(zlib.decompress(blob), dtype="<i4").astype(np.int64) for c, m, blob in rows}
+
+def _sketch_write(sketches: dict):
+    store, now = _get_local_store(), time.time()
+    for (cohort, metric), counts in sketches.items():
+        store.execute(
+            "INSERT OR REPLACE INTO score_sketch (cohort, metric, n, counts, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (cohort, metric, int(counts.sum()), zlib.compress(counts.astype("<i4").tobytes()), now)
+        )
+
+def _benchmark_members(keys: list) -> dict:
+    """practice_key -> (cohorts, {metric: bin}) for practices already counted"""
+    store, out = _get_local_store(), {}
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        rows = store.query(f"SELECT practice_key, cohorts, bins FROM benchmark_members WHERE practice_key IN "
+                           f"({','.join('?' * len(chunk))})", tuple(chunk))
+        out.update({k: (json.loads(c), json.loads(b)) for k, c, b in rows})
+    return out
+
+def _benchmark_member_key(record: dict) -> str:
+    """Stable practice identity for an audit_record(): place_id, else domain, else normalized name"""
+    def _text(k):
+        v = record.get(k)
+        return v.strip() if isinstance(v, str) else ""
+    if _text("place_id"):
+        return f"place:{_text('place_id')}"
+    domain = _text("domain") or (get_domain(_text("website")) if _text("website") else "")
+    if domain:
+        return f"domain:{domain}"
+    if _norm_key_part(_text("practice_name")):
+        return f"name:{_norm_key_part(_text('practice_name'))}"
+    return f"audit:{_text('audit_id') or uuid.uuid4().hex}"   # no identity: count once
+
+def benchmark_add(records: list, replace: bool = False):
+    """
+    Fold audit_record() rows into the cohort histograms, one sample per practice: a practice
+    seen before has its previous sample replaced. replace=True rebuilds everything from these rows.
+    """
+    if not records:
+        return
+    df = pd.DataFrame(records)
+    if "audited_at" in df:
+        df = df.sort_values("audited_at", kind="stable")
+    df["practice_key"] = [_benchmark_member_key(r) for r in df.to_dict("records")]
+    df = df.drop_duplicates("practice_key", keep="last").reset_index(drop=True)
+    keys = [[key for _, key in benchmark_cohorts(st_, city)] for st_, city in zip(df["state"], df["city"])]
+    bins = {metric: np.full(len(df), -1, dtype=np.int64) for metric in BENCHMARK_METRICS}
+    for metric in BENCHMARK_METRICS:
+        values = df[f"score_{metric}"].to_numpy(dtype=float)
+        ok = ~np.isnan(values)
+        bins[metric][ok] = _score_bins(values[ok])
+
+    with _get_benchmark_lock():
+        previous = {} if replace else _benchmark_members(df["practice_key"].tolist())
+        cohorts = sorted({k for ks in keys for k in ks} | {c for cs, _ in previous.values() for c in cs})
+        col = {c: i for i, c in enumerate(cohorts)}
+        existing = {} if replace else _sketch_rows(cohorts)
+        grid = {metric: np.zeros((len(cohorts), BENCHMARK_BINS), dtype=np.int64) for metric in BENCHMARK_METRICS}
+        for old_cohorts, old_bins in previous.values():
+            for metric, b in old_bins.items():
+                if metric in grid and b >= 0:
+                    grid[metric][[col[c] for c in old_cohorts], b] -= 1
+        row_idx = np.repeat(np.arange(len(df)), [len(ks) for ks in keys])
+        cohort_idx = np.array([col[k] for ks in keys for k in ks], dtype=np.int64)
+        for metric in BENCHMARK_METRICS:
+            b = bins[metric][row_idx]
+            ok = b >= 0
+            np.add.at(grid[metric], (cohort_idx[ok], b[ok]), 1)
+        out = {}
+        for metric in BENCHMARK_METRICS:
+            for i, cohort in enumerate(cohorts):
+                prev = existing.get((cohort, metric))
+                out[(cohort, metric)] = np.maximum(grid[metric][i] + (prev if prev is not None else 0), 0)
+        store, now = _get_local_store(), time.time()
+        if replace:
+            store.execute("DELETE FROM score_sketch")
+            store.execute("DELETE FROM benchmark_members")
+        _sketch_write(out)
+        for i, key in enumerate(df["practice_key"]):
+            store.execute(
+                "INSERT OR REPLACE INTO benchmark_members (practice_key, cohorts, bins, updated_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(keys[i]), json.dumps({m: int(bins[m][i]) for m in BENCHMARK_METRICS}), now)
+            )
+
+def benchmark_percentiles(state, city, scores: dict) -> list:
+    """[{"cohort", "n", "percentiles": {metric: pct}}] for each cohort with enough peers"""
+    cohorts = benchmark_cohorts(state, city)
+    sketches = _sketch_rows([key for _, key in cohorts])
+    out = []
+    for label, key in cohorts:
+        pcts, n = {}, 0
+        for metric in BENCHMARK_METRICS:
+            counts = sketches.get((key, metric))
+            if counts is None or scores.get(metric) is None:
+                continue
+            n = int(counts.sum())
+            if n < BENCHMARK_MIN_PEERS:
+                continue
+            b = int(_score_bins([scores[metric]])[0])
+            pcts[metric] = round(100.0 * (counts[:b].sum() + 0.5 * counts[b]) / n)
+        if pcts:
+            out.append({"cohort": label, "n": n, "percentiles": pcts})
+    return out
+
+def format_benchmark(benchmarks: list) -> str:
+    if not benchmarks:
+        return "Not enough audited peers yet"
+    def _ord(p):
+        return f"{p}{'th' if 10 <= p % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(p % 10, 'th')}"
+    return " | ".join(
+        f"{_ord(b['percentiles']['overall'])} percentile in {b['cohort']} (n={b['n']})"
+        for b in benchmarks if "overall" in b["percentiles"]
+    ) or "Not enough audited peers yet"
+
+def rebuild_benchmarks(root: str = None) -> int:
+    """Recompute every cohort histogram from the audit store in one pass (latest audit per practice)"""
+    df = query_audits(columns=["audited_at", "practice_name", "address", "website", "state", "city"]
+                      + [f"score_{m}" for m in BENCHMARK_METRICS], root=root)
+    if df.empty:
+        return 0
+    df["state"] = df["state"].astype(str)
+    benchmark_add(df.to_dict("records"), replace=True)
+    return len(df)
+
+def save_audit(final: dict, audit: dict):
+    record = audit_record(final, audit)
+    try:
+        store_audits([record])
+    except Exception as e:
+        st.sidebar.write(f"⚠️ Audit store write failed: {str(e)[:80]}")
+    try:
+        benchmark_add([record])
+    except Exception as e:
+        st.sidebar.write(f"⚠️ Benchmark update failed: {str(e)[:80]}")
+
+# ------------------------ Portfolio monitoring ------------------------
+# Practices in the portfolio are re-checked on a cadence. A cheap probe runs first: a conditional
+# GET of the homepage (304 = unchanged) and a Places details call limited to the rating fields.
+# Only when one of them moved does the full audit run, and even then stages whose inputs are
+# unchanged are reused. Each full audit is compared with the previous summary and meaningful
+# changes are written to portfolio_changes.
+MONITOR_CADENCE_DAYS = float(os.getenv("FVA_MONITOR_CADENCE_DAYS", "7"))
+MONITOR_WORKERS = int(os.getenv("FVA_MONITOR_WORKERS", "4"))
+MONITOR_AUDITS_PER_MINUTE = float(os.getenv("FVA_MONITOR_AUDITS_PER_MINUTE", "20"))
+MONITOR_FULL_AUDIT_MAX_AGE = 30 * 24 * 3600    # run a full audit at least this often regardless of probes
+MONITOR_RATING_DROP = 0.1
+MONITOR_HEALTH_DROP = 10
+MONITOR_SCORE_DROP = 5.0
+
+class RateLimiter:
+    """Spaces calls at least 60/per_minute seconds apart across threads"""
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def _practice_key(final: dict) -> str:
+    return place_index_key(final.get("practice_name"), final.get("address"), final.get("website"))[0]
+
+def portfolio_add(final: dict, cadence_days: float = MONITOR_CADENCE_DAYS, due_now: bool = True) -> str:
+    key = _practice_key(final)
+    _get_local_store().execute(
+        """INSERT INTO portfolio (practice_key, final, cadence_s, next_due) VALUES (?, ?, ?, ?)
+           ON CONFLICT(practice_key) DO UPDATE SET final = excluded.final, cadence_s = excluded.cadence_s""",
+        (key, json.dumps(final), int(cadence_days * 86400), time.time() if due_now else time.time() + cadence_days * 86400)
+    )
+    return key
+
+def portfolio_changes(practice_key: str = None, since: float = 0) -> pd.DataFrame:
+    sql = "SELECT practice_key, detected_at, kind, severity, detail FROM portfolio_changes WHERE detected_at >= ?"
+    params = [since]
+    if practice_key:
+        sql += " AND practice_key = ?"
+        params.append(practice_key)
+    rows = _get_local_store().query(sql + " ORDER BY detected_at", tuple(params))
+    return pd.DataFrame(rows, columns=["practice_key", "detected_at", "kind", "severity", "detail"])
+
+def _probe_page(url: str, etag: str, last_modified: str):
+    """
+    Conditional GET; returns (changed, etag, last_modified). Errors count as changed. Sites that
+    send no validators are compared by page fingerprint instead, stored as an "fp:<hash>" etag.
+    """
+    headers = dict(FETCH_HEADERS)
+    if etag and not etag.startswith("fp:"):
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    try:
+        with requests.get(url, headers=headers, timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT),
+                          stream=True, allow_redirects=True) as r:
+            if r.status_code == 304:
+                return False, etag, last_modified
+            new_etag, new_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+            if r.status_code != 200:
+                return True, new_etag, new_modified
+            if new_etag or new_modified:
+                # Some servers ignore conditional requests but still send stable validators
+                unchanged = (new_etag or None) == (etag or None) and (new_modified or None) == (last_modified or None)
+                return not unchanged, new_etag, new_modified
+            body = bytearray()
+            for chunk in r.iter_content(chunk_size=FETCH_CHUNK_SIZE):
+                body.extend(chunk)
+                if len(body) >= FETCH_MAX_BYTES:
+                    break
+    except requests.RequestException:
+        return True, etag, last_modified
+    fingerprint = "fp:" + page_fingerprint(BeautifulSoup(bytes(body[:FETCH_MAX_BYTES]), "html.parser"))
+    return fingerprint != etag, fingerprint, None
+
+def _probe_rating(place_id: str):
+    """(rating, user_ratings_total) from a details call restricted to those fields"""
+    if not (PLACES_API_KEY and place_id):
+        return None, None
+    try:
+        r = requests.get("https://maps.googleapis.com/maps/api/place/details/json",
+                         params={"place_id": place_id, "fields": "rating,user_ratings_total", "key": PLACES_API_KEY},
+                         timeout=10)
+        res = (r.json() or {}).get("result", {}) if r.status_code == 200 else {}
+        return res.get("rating"), res.get("user_ratings_total")
+    except (requests.RequestException, ValueError):
+        return None, None
+
+def audit_summary(audit: dict) -> dict:
+    """The handful of values change detection compares between runs"""
+    features = audit.get("features") or {}
+    best = (audit.get("search_ranks") or {}).get("best")
+
+    def _num(v):
+        return None if v is None or (isinstance(v, float) and np.isnan(v)) else float(v)
+
+    return {
+        "rating": _num(features.get("rating")),
+        "reviews_total": _num(features.get("reviews_total")),
+        "wh_pct": _num(features.get("wh_pct")),
+        "page1": str(audit["visibility"].get("Search Visibility (Page 1?)", "")).startswith("Yes"),
+        "page1_known": "search limited" not in str(audit["visibility"].get("Search Visibility (Page 1?)", "")).lower(),
+        "best_rank": best[1] if best else None,
+        "negative_themes": audit["reputation"].get("Top Negative Themes", ""),
+        "overall": _num(audit["scores"].get("overall")),
+    }
+
+def _themes(text) -> set:
+    if not isinstance(text, str) or text.strip().lower() in ("", "none detected", "search limited"):
+        return set()
+    return {t.strip().lower() for t in re.split(r"[,;]", text) if t.strip()}
+
+def detect_changes(prev: dict, cur: dict) -> list:
+    """[(kind, severity, detail)] for meaningful moves between two audit_summary() dicts"""
+    if not prev:
+        return []
+    changes = []
+    drop = round(prev["rating"] - cur["rating"], 2) if None not in (prev.get("rating"), cur.get("rating")) else 0
+    if drop >= MONITOR_RATING_DROP:
+        changes.append(("rating_drop", "high" if drop >= 0.3 else "medium",
+                        f"Google rating {prev['rating']:.1f} → {cur['rating']:.1f}"))
+    new_negative = _themes(cur.get("negative_themes")) - _themes(prev.get("negative_themes"))
+    if new_negative:
+        changes.append(("new_negative_themes", "medium", "New complaints: " + ", ".join(sorted(new_negative))))
+    if prev.get("wh_pct") is not None and cur.get("wh_pct") is not None \
+            and prev["wh_pct"] - cur["wh_pct"] >= MONITOR_HEALTH_DROP:
+        changes.append(("website_health_regression", "medium",
+                        f"Website health {prev['wh_pct']:.0f} → {cur['wh_pct']:.0f}/100"))
+    if prev.get("page1") and cur.get("page1_known") and not cur.get("page1"):
+        changes.append(("lost_page1", "high", f"Dropped off page 1 (best rank was #{prev.get('best_rank')})"))
+    if prev.get("overall") is not None and cur.get("overall") is not None \
+            and prev["overall"] - cur["overall"] >= MONITOR_SCORE_DROP:
+        changes.append(("score_drop", "medium", f"Overall score {prev['overall']:.1f} → {cur['overall']:.1f}"))
+    return changes
+
+def monitor_practice(row: dict, limiter: RateLimiter = None, force: bool = False) -> dict:
+    """Probe one portfolio practice and, when something moved, re-audit it and record changes"""
+    store, now = _get_local_store(), time.time()
+    final = json.loads(row["final"])
+    page_changed, etag, last_modified = (_probe_page(final["website"], row["etag"], row["last_modified"])
+                                         if final.get("website") else (True, None, None))
+    rating, ratings_total = _probe_rating(row["place_id"])
+    stale = not row["last_audited"] or now - row["last_audited"] > MONITOR_FULL_AUDIT_MAX_AGE
+    places_changed = rating is not None and (rating, ratings_total) != (row["rating"], row["ratings_total"])
+
+    outcome = {"practice_key": row["practice_key"], "audited": False, "changes": []}
+    if force or stale or page_changed or places_changed:
+        if limiter:
+            limiter.wait()
+        audit = run_audit(final)
+        save_audit(final, audit)
+        summary = audit_summary(audit)
+        changes = detect_changes(json.loads(row["summary"]) if row["summary"] else None, summary)
+        for kind, severity, detail in changes:
+            store.execute(
+                "INSERT INTO portfolio_changes (practice_key, detected_at, kind, severity, detail) VALUES (?, ?, ?, ?, ?)",
+                (row["practice_key"], now, kind, severity, detail)
+            )
+        store.execute(
+            "UPDATE portfolio SET place_id = ?, summary = ?, last_audited = ? WHERE practice_key = ?",
+            (audit.get("place_id") or row["place_id"], json.dumps(summary), now, row["practice_key"])
+        )
+        if rating is None and summary["rating"] is not None:
+            rating, ratings_total = summary["rating"], summary["reviews_total"]
+        outcome.update(audited=True, changes=changes)
+
+    store.execute(
+        """UPDATE portfolio SET etag = ?, last_modified = ?, rating = ?, ratings_total = ?,
+           last_checked = ?, next_due = ? WHERE practice_key = ?""",
+        (etag, last_modified, rating, ratings_total, now, now + row["cadence_s"], row["practice_key"])
+    )
+    return outcome
+
+def run_portfolio_cycle(now: float = None, limit: int = None, workers: int = MONITOR_WORKERS,
+                        audits_per_minute: float = MONITOR_AUDITS_PER_MINUTE) -> list:
+    """Check every practice that is due, `workers` at a time, full audits rate-limited"""
+    now = time.time() if now is None else now
+    cols = ["practice_key", "final", "cadence_s", "place_id", "etag", "last_modified",
+            "rating", "ratings_total", "summary", "last_audited"]
+    rows = _get_local_store().query(
+        f"SELECT {', '.join(cols)} FROM portfolio WHERE next_due <= ? ORDER BY next_due LIMIT ?",
+        (now, limit if limit else -1)
+    )
+    limiter = RateLimiter(audits_per_minute)
+    outcomes = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers),
+                                               initializer=_script_ctx_initializer()) as pool:
+        futures = {pool.submit(monitor_practice, dict(zip(cols, r)), limiter): r[0] for r in rows}
+        for fut in concurrent.futures.as_completed(futures):
+            try:
+                outcomes.append(fut.result())
+            except Exception as e:
+                outcomes.append({"practice_key": futures[fut], "audited": False, "changes": [], "error": str(e)[:200]})
+    return outcomes
+
+# ------------------------ Bulk mode (headless) ------------------------
+# python app.py --bulk practices.csv results.csv [--local]
+# python app.py --monitor [practices.csv] [--loop]
+# Input columns: website, practice_name, address, phone (email, doctor_name optional).
+def _finals_from_csv(in_path: str) -> list:
+    df = pd.read_csv(in_path, dtype=str).fillna("")
+    return [
+        {
+            "website": _normalize_url(r.get("website", "")),
+            "practice_name": r.get("practice_name", ""),
+            "address": r.get("address", ""),
+            "phone": r.get("phone", ""),
+            "email": r.get("email", ""),
+            "doctor_name": r.get("doctor_name", ""),
+        }
+        for r in df.to_dict("records")
+    ]
+
+def run_bulk_csv(in_path: str, out_path: str, backend=None) -> int:
+    finals = _finals_from_csv(in_path)
+    audits = run_audits_batch(finals, backend=backend, on_progress=print)
+    records = [audit_record(final, audit) for final, audit in zip(finals, audits)]
+    store_audits(records)
+    benchmark_add(records)
+    rows = []
+    for final, audit in zip(finals, audits):
+        row = {"practice_name": final["practice_name"], "website": final["website"]}
+        row.update({f"score_{k}": v for k, v in audit["scores"].items()})
+        for section in ("visibility", "reputation", "marketing", "experience"):
+            row[section] = json.dumps(audit[section], ensure_ascii=False, default=str)
+        rows.append(row)
+    pd.DataFrame(rows).to_csv(out_path, index=False)
+    return len(rows)
+
+def cli_main(argv: list) -> int:
+    """python app.py --bulk in.csv out.csv [--local] | --monitor [practices.csv] [--loop]"""
+    if "--bulk" in argv:
+        i = argv.index("--bulk")
+        n = run_bulk_csv(argv[i + 1], argv[i + 2], backend=LocalBatchBackend() if "--local" in argv else None)
+        print(f"Audited {n} practices -> {argv[i + 2]}")
+        return 0
+    if "--monitor" in argv:
+        i = argv.index("--monitor")
+        if len(argv) > i + 1 and argv[i + 1].endswith(".csv"):
+            for final in _finals_from_csv(argv[i + 1]):
+                portfolio_add(final)
+        while True:
+            for o in run_portfolio_cycle():
+                print(f"{o['practice_key']}: {'audited' if o['audited'] else 'unchanged'}"
+                      + "".join(f"\n  [{sev}] {detail}" for _, sev, detail in o["changes"])
+                      + (f"\n  error: {o['error']}" if o.get("error") else ""))
+            if "--loop" not in argv:
+                break
+            next_due = _get_local_store().query("SELECT MIN(next_due) FROM portfolio")[0][0]
+            time.sleep(min(3600, max(60, (next_due or time.time() + 3600) - time.time())))
+        return 0
+    print(cli_main.__doc__)
+    return 2
+
+# Command line (`python app.py ...`, not `streamlit run`): everything above only defined the
+# engine, so exit here before the page UI below
+if __name__ == "__main__" and not IN_STREAMLIT:
+    sys.exit(cli_main(sys.argv[1:]))
+
 # ------------------------ UI form ------------------------
 
 # ------------------------ UI: inputs + auto-fill ------------------------
@@ -3583,9 +6930,6 @@ if website and website != st.session_state.get("last_prefill_website", ""):
                     <span style="color: #333; font-weight: 600;">🔍 Analyzing website...</span>
                 </div>
             </div>
-            <style>
-                @keyframes spin { 0% { transform: rotate(0deg); } 100% { transform: rotate(360deg); } }
-            </style>
             """, unsafe_allow_html=True)
 
         prefill_from_website(normalized_website)
@@ -3709,37 +7053,14 @@ def show_table(title, data_dict):
 def show_visibility_cards(visibility: dict):
     st.markdown("### Online Presence & Visibility")
 
-    # Minimal CSS to style each tile like your overview cards
-    st.markdown(
-        """
-        <style>
-        .vis-card{border:1px solid #e5e7eb;background:#fff;border-radius:12px;padding:10px 12px;}
-        .vis-metric{font-size:12px;color:#6b7280;text-transform:uppercase;letter-spacing:.03em;}
-        .vis-value{font-size:14px;font-weight:700;color:#111827;line-height:1.4;margin-top:4px;word-break:break-word;}
-        .vis-value-small{font-size:12.5px;font-weight:500;color:#374151;line-height:1.5;margin-top:4px;word-break:break-word;white-space:pre-wrap;}
-
-        .badge{display:inline-block;font-size:11px;padding:2px 8px;border-radius:999px;margin-left:8px;border:1px solid transparent;vertical-align:middle;}
-        .badge-ok{background:#ecfdf5;color:#065f46;border-color:#a7f3d0;}
-        .badge-warn{background:#fffbeb;color:#92400e;border-color:#fcd34d;}
-        .badge-bad{background:#fef2f2;color:#991b1b;border-color:#fecaca;}
-        .badge-muted{background:#f3f4f6;color:#374151;border-color:#e5e7eb;}
-
-        .vis-recs{margin-top:12px;border-left:4px solid #2563eb;background:#eff6ff;border-radius:10px;padding:10px 12px;}
-        .vis-recs-title{font-weight:700;color:#1d4ed8;margin-bottom:6px;}
-        .vis-recs ul{margin:0;padding-left:18px;}
-        .vis-recs li{margin:4px 0;}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
-
-    # Five metrics now
+    # Six metrics now
     order = [
         "Google Business Profile Completeness (estimate)",
         "Website Health Score",
         "Search Visibility (Page 1?)",
         "Google Business Profile Signals",
         "Website Health Checks",
+        "Search Rank (Top Queries)",
     ]
     items = [(k, visibility.get(k, "—")) for k in order if k in visibility]
     items6 = items[:6] + [("", "")] * (6 - len(items))  # pad to 6
@@ -3777,6 +7098,13 @@ def show_visibility_cards(visibility: dict):
             if "yes" in s: return ("Page 1", "badge-ok")
             if "no"  in s: return ("Not on Page 1", "badge-bad")
             return ("Unknown", "badge-muted")
+        if "search rank" in label.lower():
+            m = re.match(r"best #(\d+)", s)
+            if not m: return ("Unranked", "badge-bad")
+            rank = int(m.group(1))
+            if rank <= 3: return (f"#{rank}", "badge-ok")
+            if rank <= 10: return (f"#{rank}", "badge-warn")
+            return (f"#{rank}", "badge-bad")
         if "social media presence" in label.lower():
             # Handle new format - count platforms from HTML or platform count
             platform_count = 0
@@ -3849,30 +7177,6 @@ def show_visibility_cards(visibility: dict):
 def show_reputation_cards(reputation: dict):
     st.markdown("### Patient Reputation & Feedback")
 
-    # CSS for tiles + badges + recs box
-    st.markdown(
-        """
-        <style>
-        .rep-card{border:1px solid #e5e7eb;background:#fff;border-radius:12px;padding:10px 12px;}
-        .rep-metric{font-size:12px;color:#6b7280;text-transform:uppercase;letter-spacing:.03em;}
-        .rep-value{font-size:14px;font-weight:700;color:#111827;line-height:1.4;margin-top:4px;word-break:break-word;}
-        .rep-value-small{font-size:12.5px;font-weight:500;color:#374151;line-height:1.5;margin-top:4px;word-break:break-word;white-space:pre-wrap;}
-
-        .badge{display:inline-block;font-size:11px;padding:2px 8px;border-radius:999px;margin-left:8px;border:1px solid transparent;vertical-align:middle;}
-        .badge-ok{background:#ecfdf5;color:#065f46;border-color:#a7f3d0;}
-        .badge-warn{background:#fffbeb;color:#92400e;border-color:#fcd34d;}
-        .badge-bad{background:#fef2f2;color:#991b1b;border-color:#fecaca;}
-        .badge-muted{background:#f3f4f6;color:#374151;border-color:#e5e7eb;}
-
-        .rep-recs{margin-top:12px;border-left:4px solid #2563eb;background:#eff6ff;border-radius:10px;padding:10px 12px;}
-        .rep-recs-title{font-weight:700;color:#1d4ed8;margin-bottom:6px;}
-        .rep-recs ul{margin:0;padding-left:18px;}
-        .rep-recs li{margin:4px 0;}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
-
     # Choose 6 metrics for 3x2
     order = [
         "Google Reviews (Avg)",
@@ -3994,27 +7298,6 @@ def show_reviews_cards(reviews: list):
     Each card shows author, time, star rating, and a hard-trimmed (~5 lines) preview.
     No 'Read more' or modal.
     """
-    # ---- minimal card CSS ----
-    st.markdown(
-        """
-        <style>
-        .rev-card{border:1px solid #e5e7eb;background:#fff;border-radius:12px;padding:12px 12px;}
-        .rev-card.empty{visibility:hidden;}
-        .rev-header{display:flex;align-items:center;gap:10px;margin-bottom:6px;}
-        .rev-avatar{
-          width:32px;height:32px;border-radius:999px;display:flex;align-items:center;justify-content:center;
-          background:linear-gradient(135deg,#e0e7ff,#fce7f3);color:#1f2937;font-weight:700;font-size:13px;
-        }
-        .rev-author{font-weight:700;color:#111827;font-size:14px;line-height:1.2;}
-        .rev-time{font-size:12px;color:#6b7280;line-height:1.2;}
-        .rev-stars{margin:4px 0 6px 0;font-size:14px;line-height:1;}
-        .star{color:#f59e0b;} .star-empty{color:#e5e7eb;}
-        .rev-text{font-size:13px;color:#111827;line-height:1.5;word-break:break-word;}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
-
     # ---- helpers ----
     def _initials(name: str) -> str:
         s = (name or "").strip()
@@ -4091,31 +7374,6 @@ def show_reviews_cards(reviews: list):
 def show_marketing_cards(marketing: dict):
     st.markdown("### Marketing Signals")
 
-    # CSS for tiles + badges + recs box (matches your other sections)
-    st.markdown(
-        """
-        <style>
-        .mkt-card{border:1px solid #e5e7eb;background:#fff;border-radius:12px;padding:10px 12px;}
-        .mkt-card.empty{visibility:hidden;}
-        .mkt-metric{font-size:12px;color:#6b7280;text-transform:uppercase;letter-spacing:.03em;}
-        .mkt-value{font-size:14px;font-weight:700;color:#111827;line-height:1.4;margin-top:4px;word-break:break-word;}
-        .mkt-value-small{font-size:12.5px;font-weight:500;color:#374151;line-height:1.5;margin-top:4px;word-break:break-word;white-space:pre-wrap;}
-
-        .badge{display:inline-block;font-size:11px;padding:2px 8px;border-radius:999px;margin-left:8px;border:1px solid transparent;vertical-align:middle;}
-        .badge-ok{background:#ecfdf5;color:#065f46;border-color:#a7f3d0;}
-        .badge-warn{background:#fffbeb;color:#92400e;border-color:#fcd34d;}
-        .badge-bad{background:#fef2f2;color:#991b1b;border-color:#fecaca;}
-        .badge-muted{background:#f3f4f6;color:#374151;border-color:#e5e7eb;}
-
-        .mkt-recs{margin-top:12px;border-left:4px solid #2563eb;background:#eff6ff;border-radius:10px;padding:10px 12px;}
-        .mkt-recs-title{font-weight:700;color:#1d4ed8;margin-bottom:6px;}
-        .mkt-recs ul{margin:0;padding-left:18px;}
-        .mkt-recs li{margin:4px 0;}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
-
     # choose up to 6 metrics → fixed 3x2 grid (keys that exist in your file)
     order = [
         "Photos/Videos on Website",
@@ -4232,31 +7490,6 @@ def show_marketing_cards(marketing: dict):
 def show_experience_cards(experience: dict):
     st.markdown("### Patient Experience & Accessibility")
 
-    # Tile + badge + recs styles (same visual language as Reputation)
-    st.markdown(
-        """
-        <style>
-        .exp-card{border:1px solid #e5e7eb;background:#fff;border-radius:12px;padding:10px 12px;}
-        .exp-card.empty{visibility:hidden;}
-        .exp-metric{font-size:12px;color:#6b7280;text-transform:uppercase;letter-spacing:.03em;}
-        .exp-value{font-size:14px;font-weight:700;color:#111827;line-height:1.4;margin-top:4px;word-break:break-word;}
-        .exp-value-small{font-size:12.5px;font-weight:500;color:#374151;line-height:1.5;margin-top:4px;word-break:break-word;white-space:pre-wrap;}
-
-        .badge{display:inline-block;font-size:11px;padding:2px 8px;border-radius:999px;margin-left:8px;border:1px solid transparent;vertical-align:middle;}
-        .badge-ok{background:#ecfdf5;color:#065f46;border-color:#a7f3d0;}
-        .badge-warn{background:#fffbeb;color:#92400e;border-color:#fcd34d;}
-        .badge-bad{background:#fef2f2;color:#991b1b;border-color:#fecaca;}
-        .badge-muted{background:#f3f4f6;color:#374151;border-color:#e5e7eb;}
-
-        .exp-recs{margin-top:12px;border-left:4px solid #2563eb;background:#eff6ff;border-radius:10px;padding:10px 12px;}
-        .exp-recs-title{font-weight:700;color:#1d4ed8;margin-bottom:6px;}
-        .exp-recs ul{margin:0;padding-left:18px;}
-        .exp-recs li{margin:4px 0;}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
-
     # Choose up to 6 metrics -> fixed 3x2
     order = [
         "Appointment Booking",
@@ -4363,24 +7596,6 @@ def show_experience_cards(experience: dict):
         )
 
 # =================== Summary cards: Smile + 3 Buckets (4 columns) ===================
-# Minimal CSS for card style + progress bars + recs box
-st.markdown(
-    """
-    <style>
-    .top-card{border:1px solid #e5e7eb;background:#fff;border-radius:12px;padding:10px 12px;margin-bottom:12px;}
-    .top-metric{font-size:12px;color:#6b7280;text-transform:uppercase;letter-spacing:.03em;}
-    .top-big{font-size:18px;font-weight:700;color:#111827;margin-top:4px;}
-    .top-bar{height:8px;border-radius:999px;background:#f3f4f6;margin-top:6px;overflow:hidden;}
-    .top-bar span{display:block;height:100%;background:#2563eb;}
-    .top-recs{margin-top:8px;border-left:4px solid #2563eb;background:#eff6ff;border-radius:10px;padding:10px 12px;}
-    .top-recs-title{font-weight:700;color:#1d4ed8;margin-bottom:6px;}
-    .top-recs ul{margin:0;padding-left:18px;}
-    .top-recs li{margin:4px 0;}
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
 def _pct(score, denom):
     try:
         return max(0, min(100, int(round(float(score) / float(denom) * 100))))
@@ -4405,10 +7620,7 @@ def bucket_card(col, label, score, denom):
 
 # plumb the values used downstream
 if st.session_state.submitted:
-    clinic_name = st.session_state.final.get("practice_name")
-    address     = st.session_state.final.get("address")
-    phone       = st.session_state.final.get("phone")
-    website     = st.session_state.final.get("website")
+    final = st.session_state.final
 
     # Clear the page and show top-positioned progress indicator
     st.empty()
@@ -4433,270 +7645,24 @@ if st.session_state.submitted:
                 </div>
             </div>
         </div>
-        <style>
-            @keyframes spin { 0% { transform: rotate(0deg); } 100% { transform: rotate(360deg); } }
-        </style>
         """, unsafe_allow_html=True)
 
-    # Initialize variables with fallback values
-    soup = None
-    load_time = 0
-    place_id = None
-    details = None
-    comprehensive_analysis = None
-    final = st.session_state.final
-
-    # Start timer for timeout protection
-    audit_start_time = time.time()
-    AUDIT_TIMEOUT = 60  # 60 seconds maximum
-
-    try:
-        # Step 1: Fetch website HTML with timeout
-        with st.spinner("Fetching website..."):
-            soup, load_time = fetch_html(website)
-
-        # Step 2: Get Google Places data with timeout
-        if time.time() - audit_start_time < AUDIT_TIMEOUT:
-            with st.spinner("Analyzing location..."):
-                place_id = find_best_place_id(clinic_name, address, website)
-                details = places_details(place_id) if place_id else None
-
-        # Step 3: Run LLM analysis with timeout
-        if time.time() - audit_start_time < AUDIT_TIMEOUT and HAS_CLAUDE and CLAUDE_API_KEY and soup:
-            with st.spinner("Running AI analysis..."):
-                try:
-                    comprehensive_analysis = stream_llm_analysis_with_progress(soup, website, clinic_name, [])
-                except Exception as e:
-                    st.warning(f"AI analysis failed: {str(e)[:100]}. Continuing with basic analysis...")
-        elif time.time() - audit_start_time >= AUDIT_TIMEOUT:
-            st.warning("⚠️ Analysis timeout reached. Generating report with available data...")
-
-    except Exception as e:
-        st.error(f"Error during analysis: {str(e)[:100]}. Generating report with available data...")
-        # Continue with fallback values
-
     try:
-        # 1) Overview
-        overview = {
-            "Practice Name": clinic_name or "Search limited",
-            "Address": address or "Search limited",
-            "Phone": phone or "Search limited",
-            "Website": website or "Search limited",
-        }
-
-        # 2) Visibility
-        wh_str, wh_checks = website_health(website, soup, load_time)
-        appears = appears_on_page1_for_dentist_near_me(website, clinic_name, address)
-
-        gbp_score = "Search limited"; gbp_signals = "Search limited"
-        if details and details.get("status") == "OK":
-                res = details["result"]; score = 0; checks = []
-                if res.get("opening_hours"): score += 20; checks.append("Hours ✅")
-                else: checks.append("Hours ❌")
-                if res.get("photos"): score += 20; checks.append(f"Photos ✅ ({len(res.get('photos',[]))})")
-                else: checks.append("Photos ❌ (0)")
-                if res.get("website"): score += 15; checks.append("Website ✅")
-                else: checks.append("Website ❌")
-                if res.get("international_phone_number"): score += 15; checks.append("Phone ✅")
-                else: checks.append("Phone ❌")
-                if res.get("rating") and res.get("user_ratings_total",0)>0: score += 10; checks.append("Reviews ✅")
-                else: checks.append("Reviews ❌")
-                if "dentist" in res.get("types", []) or "dental_clinic" in res.get("types", []):
-                    score += 10; checks.append("Category ✅")
-                else:
-                    checks.append("Category ❌")
-                if res.get("formatted_address"): score += 10; checks.append("Address ✅")
-                else:
-                    checks.append("Address ❌")
-                gbp_score = f"{min(score,100)}/100"
-                gbp_signals = " | ".join(checks)
-
-        # Get AI insights for online visibility
-        visibility_ai_insights = ""
-        if comprehensive_analysis and comprehensive_analysis.get("marketing", {}).get("visibility_insights"):
-            insights = comprehensive_analysis["marketing"]["visibility_insights"]
-            # Format as bullet points for dataframe display
-            if isinstance(insights, str):
-                    # Clean up the insights string and ensure proper bullet point formatting
-                    insights = insights.strip()
-
-                    # If insights already contain bullet points, use them directly
-                    if "•" in insights and "\\n" in insights:
-                        # Replace escaped newlines with actual newlines
-                        visibility_ai_insights = insights.replace("\\n", "\n")
-                    elif "•" in insights:
-                        # Split by bullet points and rejoin with newlines
-                        bullet_parts = insights.split("•")
-                        bullet_points = []
-                        for part in bullet_parts:
-                            part = part.strip()
-                            if part and len(part) > 5:
-                                bullet_points.append(f"• {part}")
-                        visibility_ai_insights = "\n".join(bullet_points[:3])
-                    else:
-                        # Split by common delimiters and format as bullets
-                        bullet_points = []
-                        if "-" in insights:
-                            lines = insights.split("-")
-                        elif "." in insights:
-                            lines = insights.split(".")
-                        else:
-                            lines = [insights]
-
-                        for line in lines:
-                            line = line.strip()
-                            if line and len(line) > 5:  # Skip very short fragments
-                                bullet_points.append(f"• {line}")
-
-                        visibility_ai_insights = "\n".join(bullet_points[:3])  # Limit to 3 points
-
-                    # Fallback to default insights if nothing was extracted
-                    if not visibility_ai_insights.strip():
-                        visibility_ai_insights = "• Optimize Google My Business profile\n• Build local SEO citations\n• Improve website mobile experience"
-
-        visibility = {
-            "Google Business Profile Completeness (estimate)": gbp_score,
-            "Google Business Profile Signals": gbp_signals,
-            "Search Visibility (Page 1?)": appears,
-            "Website Health Score": wh_str,
-            "Website Health Checks": wh_checks,
-            "AI Insights": visibility_ai_insights if visibility_ai_insights else "• Optimize Google My Business profile\n• Build local SEO citations\n• Improve website mobile experience"
-        }
-
-        # 3) Reputation
-        rating_str, review_count_out, reviews = rating_and_reviews(details)
-        # Use ONLY LLM for ALL reputation data extraction
-        if HAS_CLAUDE and CLAUDE_API_KEY and reviews:
-            sentiment_summary, top_pos_str, top_neg_str = analyze_review_texts(reviews)
-
-            # Use LLM to extract rating information
-            llm_ratings = extract_ratings_with_llm(reviews, details)
-            all_time_rating = llm_ratings.get("all_time_avg", "Search limited")
-            recent_rating = llm_ratings.get("recent_avg", "Search limited")
-            review_count_llm = llm_ratings.get("total_count", "Search limited")
-
-            # Get additional LLM insights from comprehensive analysis
-            key_insights = ""
-            if comprehensive_analysis and comprehensive_analysis.get("reputation"):
-                reputation_data = comprehensive_analysis["reputation"]
-                key_insights = reputation_data.get("advice", "") or reputation_data.get("sentiment", "")
-        else:
-            # If LLM not available, all fields show search limited
-            sentiment_summary, top_pos_str, top_neg_str = "Search limited", "Search limited", "Search limited"
-            all_time_rating = recent_rating = review_count_llm = "Search limited"
-            key_insights = "Search limited"
-
-        reputation = {
-            "Google Reviews (All-time Avg)": all_time_rating,
-            "Google Reviews (Recent 10 Avg)": recent_rating,
-            "Total Google Reviews": review_count_llm,
-            "Sentiment Highlights": sentiment_summary,
-            "Top Positive Themes": top_pos_str,
-            "Top Negative Themes": top_neg_str,
-        }
-
-        # Add key insights if available
-        if key_insights:
-            reputation["AI Insights"] = key_insights
-
-        # 4) Marketing - Enhanced comprehensive analysis
-        # Get comprehensive LLM marketing analysis from cached result
-        marketing_insights = ""
-        if comprehensive_analysis and comprehensive_analysis.get("marketing"):
-            marketing_data = comprehensive_analysis["marketing"]
-            marketing_insights = marketing_data.get("key_recommendations", "") or marketing_data.get("advertising_advice", "")
-
-        # Enhanced marketing analysis
-        photos_on_website = media_count_from_site(soup) if soup else "Search limited"
-        photos_in_google = photos_count_from_places(details) if details else "Search limited"
-        advertising_tools = advertising_signals(soup) if soup else "Search limited"
-
-        # New comprehensive marketing metrics
-        conversion_analysis = analyze_website_conversion_elements(soup) if soup else "Search limited"
-        content_strategy = analyze_content_marketing(soup, website) if soup else "Search limited"
-        local_seo_status = analyze_local_seo_signals(soup, final.get('address', '')) if soup else "Search limited"
-
-        # Generate AI-powered marketing insights
-        ai_insights = generate_marketing_insights(
-            soup,
-            website,
-            final.get('practice_name', ''),
-            photos_in_google if isinstance(photos_in_google, int) else 0,
-            advertising_tools
-        ) if soup else "Enable Claude AI for detailed marketing insights"
-
-        marketing = {
-            "Website Content Strategy": content_strategy,
-            "Conversion Optimization": conversion_analysis,
-            "Local SEO Signals": local_seo_status,
-            "Photos/Videos on Website": photos_on_website,
-            "Google My Business Photos": photos_in_google,
-            "Marketing & Analytics Tools": advertising_tools,
-            "AI Marketing Strategy Insights": ai_insights
-        }
-
-        # Add legacy LLM insights if available (fallback) - formatted as concise bullet points
-        if marketing_insights and not ai_insights.startswith("Enable Claude"):
-            # Process marketing_insights to ensure it's short and crisp (max 3 bullet points)
-            formatted_insights = format_insights_to_bullets(marketing_insights)
-            marketing["Additional Insights"] = formatted_insights
-
-        # 5) Experience - Enhanced with LLM analysis
-        appointment_channels = appointment_channels_from_site(soup, website)
-        hours = office_hours_from_places(details)
-        insurance_info = enhanced_insurance_from_site(soup, website)
-
-        # Generate AI insights for patient experience
-        patient_insights = generate_patient_experience_insights(appointment_channels, insurance_info, hours)
-
-        experience = {
-            "Appointment Options Available": appointment_channels,
-            "Office Hours (as mentioned in Website)": hours,
-            "Insurance Acceptance": insurance_info,
-            "AI Insights": patient_insights,
-        }
-
-        # ------------------------ Scoring ------------------------
-        wh_pct = to_pct_from_score_str(wh_str)
-        rating_val = None
-        try:
-            if isinstance(rating_str, str) and rating_str.endswith("/5"):
-                rating_val = float(rating_str.split("/")[0])
-        except Exception:
-            pass
-
-        reviews_total = review_count_out if isinstance(review_count_out, (int, float)) else None
-        hours_present = isinstance(hours, str) and hours != "Search limited"
-        insurance_clear = isinstance(insurance_info, str) and insurance_info not in ["Search limited", "Unclear"]
-
-        smile, vis_score, rep_score, exp_score = compute_smile_score(
-            wh_pct, rating_val, reviews_total, appointment_channels, hours_present, insurance_clear, accessibility_present=False
-        )
-
-        # Build scores dictionary for report
-        scores = {
-            "overall": smile,
-            "visibility": vis_score,
-            "reputation": rep_score,
-            "experience": exp_score,
-        }
+        audit = run_audit(final)
+        save_audit(final, audit)
 
         # Generate the static HTML report
         report_html = build_static_report_html(
-            final, overview, visibility, reputation, marketing, experience, scores, reviews
+            public_final(final), audit["overview"], audit["visibility"], audit["reputation"], audit["marketing"],
+            audit["experience"], audit["scores"], audit["reviews"]
         )
 
-        # Set a flag to indicate report is ready and store all data components
+        # The report goes to the shared store; the session keeps a reference and a summary
+        sections = {"final": final, **{k: audit[k] for k in REPORT_SECTIONS if k != "final"}}
+        st.session_state.report_id = save_report(sections, report_html)
+        st.session_state.report_summary = report_summary(sections)
         st.session_state.report_ready = True
-        st.session_state.report_html = report_html
         st.session_state.final = final
-        st.session_state.overview = overview
-        st.session_state.visibility = visibility
-        st.session_state.reputation = reputation
-        st.session_state.marketing = marketing
-        st.session_state.experience = experience
-        st.session_state.scores = scores
-        st.session_state.reviews = reviews
 
         # Trigger a rerun to display the report at the top
         st.rerun()